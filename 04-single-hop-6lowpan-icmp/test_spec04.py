@@ -6,7 +6,8 @@ from riotctrl_shell.gnrc import GNRCICMPv6Echo, GNRCPktbufStats
 from riotctrl_shell.netif import Ifconfig
 
 from testutils.asyncio import wait_for_futures
-from testutils.shell import ping6, lladdr, check_pktbuf
+from testutils.shell import ping6, check_pktbuf, set_channel
+from testutils.stats import ping6_stats
 
 APP = 'examples/networking/gnrc/networking'
 TASK10_APP = 'tests/net/gnrc_udp'
@@ -23,17 +24,14 @@ class Shell(Ifconfig, GNRCICMPv6Echo, GNRCPktbufStats):
 @pytest.mark.parametrize(
     'nodes', [pytest.param(['iotlab-m3', 'iotlab-m3'])], indirect=['nodes']
 )
-def test_task01(riot_ctrl):
+def test_task01(riot_ctrl, radio_channel):
     pinger, pinged = (
         riot_ctrl(0, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
         riot_ctrl(1, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
     )
 
-    pinged_netif, pinged_addr = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_set(pinged_netif, "channel", 26)
+    (_, pinged_addr), _ = set_channel((pinged, pinger), radio_channel)
     assert pinged_addr.startswith("fe80::")
-    pinger_netif, _ = lladdr(pinger.ifconfig_list())
-    pinger.ifconfig_set(pinger_netif, "channel", 26)
 
     res = ping6(pinger, pinged_addr, count=1000, interval=20, packet_size=0)
     assert res['stats']['packet_loss'] < 10
@@ -41,22 +39,20 @@ def test_task01(riot_ctrl):
     check_pktbuf(pinged, pinger)
 
 
+@pytest.mark.radio_channel(17)
 @pytest.mark.flaky(reruns=3, reruns_delay=30)
 @pytest.mark.iotlab_creds
 # nodes passed to riot_ctrl fixture
 @pytest.mark.parametrize(
     'nodes', [pytest.param(['samr21-xpro', 'iotlab-m3'])], indirect=['nodes']
 )
-def test_task02(riot_ctrl):
+def test_task02(riot_ctrl, radio_channel):
     pinger, pinged = (
         riot_ctrl(0, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
         riot_ctrl(1, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
     )
 
-    pinged_netif, _ = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_set(pinged_netif, "channel", 17)
-    pinger_netif, _ = lladdr(pinger.ifconfig_list())
-    pinger.ifconfig_set(pinger_netif, "channel", 17)
+    set_channel((pinged, pinger), radio_channel)
 
     res = ping6(pinger, "ff02::1", count=1000, interval=100, packet_size=50)
     assert res['stats']['packet_loss'] < 10
@@ -70,17 +66,14 @@ def test_task02(riot_ctrl):
 @pytest.mark.parametrize(
     'nodes', [pytest.param(['iotlab-m3', 'iotlab-m3'])], indirect=['nodes']
 )
-def test_task03(riot_ctrl):
+def test_task03(riot_ctrl, radio_channel):
     pinger, pinged = (
         riot_ctrl(0, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
         riot_ctrl(1, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
     )
 
-    pinged_netif, pinged_addr = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_set(pinged_netif, "channel", 26)
+    (_, pinged_addr), _ = set_channel((pinged, pinger), radio_channel)
     assert pinged_addr.startswith("fe80::")
-    pinger_netif, _ = lladdr(pinger.ifconfig_list())
-    pinger.ifconfig_set(pinger_netif, "channel", 26)
 
     res = ping6(pinger, pinged_addr, count=500, interval=300, packet_size=1024)
     assert res['stats']['packet_loss'] < 10
@@ -94,29 +87,28 @@ def test_task03(riot_ctrl):
 @pytest.mark.parametrize(
     'nodes', [pytest.param(['samr21-xpro', 'iotlab-m3'])], indirect=['nodes']
 )
-def test_task04(riot_ctrl):
+def test_task04(riot_ctrl, radio_channel, record_stats):
     pinger, pinged = (
         riot_ctrl(0, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
         riot_ctrl(1, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
     )
 
-    pinged_netif, pinged_addr = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_set(pinged_netif, "channel", 26)
+    (_, pinged_addr), _ = set_channel((pinged, pinger), radio_channel)
     assert pinged_addr.startswith("fe80::")
-    pinger_netif, _ = lladdr(pinger.ifconfig_list())
-    pinger.ifconfig_set(pinger_netif, "channel", 26)
 
     # enforce reconnect to pinged's terminal as connection to it in the IoT-LAB
     # sometimes get's lost silently in the CI after the 15 min of pinging
     # see https://github.com/RIOT-OS/Release-Specs/issues/189
     pinged.stop_term()
     res = ping6(pinger, pinged_addr, count=10000, interval=100, packet_size=100)
+    record_stats("ping6", ping6_stats(res, count=10000))
     assert res['stats']['packet_loss'] < 10
 
     pinged.start_term()
-    check_pktbuf(pinged, pinger)
+    record_stats("pktbuf", {"drain_time": check_pktbuf(pinged, pinger)})
 
 
+@pytest.mark.radio_channel(17)
 @pytest.mark.flaky(reruns=3, reruns_delay=30)
 @pytest.mark.iotlab_creds
 # nodes and iotlab_site passed to riot_ctrl fixture
@@ -125,7 +117,7 @@ def test_task04(riot_ctrl):
     [pytest.param(['iotlab-m3', 'openmote-b'], "strasbourg")],
     indirect=['nodes', 'iotlab_site'],
 )
-def test_task05(riot_ctrl):
+def test_task05(riot_ctrl, radio_channel):
     try:
         pinger, pinged = (
             riot_ctrl(0, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
@@ -137,10 +129,7 @@ def test_task05(riot_ctrl):
             # pylint: disable=C0301
             "https://github.com/RIOT-OS/Release-Specs/pull/198#issuecomment-756756109"  # noqa: E501
         )
-    pinged_netif, _ = lladdr(pinged.ifconfig_list(), ignore_chan_0=True)
-    pinged.ifconfig_set(pinged_netif, "channel", 17)
-    pinger_netif, _ = lladdr(pinger.ifconfig_list(), ignore_chan_0=True)
-    pinger.ifconfig_set(pinger_netif, "channel", 17)
+    set_channel((pinged, pinger), radio_channel, ignore_chan_0=True)
 
     res = ping6(pinger, "ff02::1", count=1000, interval=100, packet_size=50)
     assert res['stats']['packet_loss'] < 10
@@ -156,7 +145,7 @@ def test_task05(riot_ctrl):
     [pytest.param(['iotlab-m3', 'openmote-b'], "strasbourg")],
     indirect=['nodes', 'iotlab_site'],
 )
-def test_task06(riot_ctrl):
+def test_task06(riot_ctrl, radio_channel):
     try:
         pinger, pinged = (
             riot_ctrl(0, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
@@ -168,11 +157,10 @@ def test_task06(riot_ctrl):
             # pylint: disable=C0301
             "https://github.com/RIOT-OS/Release-Specs/pull/198#issuecomment-758522278"  # noqa: E501
         )
-    pinged_netif, pinged_addr = lladdr(pinged.ifconfig_list(), ignore_chan_0=True)
-    pinged.ifconfig_set(pinged_netif, "channel", 26)
+    (_, pinged_addr), _ = set_channel(
+        (pinged, pinger), radio_channel, ignore_chan_0=True
+    )
     assert pinged_addr.startswith("fe80::")
-    pinger_netif, _ = lladdr(pinger.ifconfig_list(), ignore_chan_0=True)
-    pinger.ifconfig_set(pinger_netif, "channel", 26)
 
     res = ping6(pinger, pinged_addr, count=1000, interval=100, packet_size=100)
     assert res['stats']['packet_loss'] < 10
@@ -180,21 +168,19 @@ def test_task06(riot_ctrl):
     check_pktbuf(pinged, pinger)
 
 
+@pytest.mark.radio_channel(17)
 @pytest.mark.local_only
 # nodes passed to riot_ctrl fixture
 @pytest.mark.parametrize(
     'nodes', [pytest.param(['samr21-xpro', 'arduino-zero'])], indirect=['nodes']
 )
-def test_task07(riot_ctrl):
+def test_task07(riot_ctrl, radio_channel):
     pinger, pinged = (
         riot_ctrl(0, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
         riot_ctrl(1, APP, Shell, modules=["shell_cmd_gnrc_pktbuf", "xbee"]),
     )
 
-    pinged_netif, _ = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_set(pinged_netif, "channel", 17)
-    pinger_netif, _ = lladdr(pinger.ifconfig_list())
-    pinger.ifconfig_set(pinger_netif, "channel", 17)
+    set_channel((pinged, pinger), radio_channel)
 
     res = ping6(pinger, "ff02::1", count=1000, interval=100, packet_size=50)
     assert res['stats']['packet_loss'] < 10
@@ -207,17 +193,14 @@ def test_task07(riot_ctrl):
 @pytest.mark.parametrize(
     'nodes', [pytest.param(['samr21-xpro', 'arduino-zero'])], indirect=['nodes']
 )
-def test_task08(riot_ctrl):
+def test_task08(riot_ctrl, radio_channel):
     pinger, pinged = (
         riot_ctrl(0, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
         riot_ctrl(1, APP, Shell, modules=["shell_cmd_gnrc_pktbuf", "xbee"]),
     )
 
-    pinged_netif, pinged_addr = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_set(pinged_netif, "channel", 26)
+    (_, pinged_addr), _ = set_channel((pinged, pinger), radio_channel)
     assert pinged_addr.startswith("fe80::")
-    pinger_netif, _ = lladdr(pinger.ifconfig_list())
-    pinger.ifconfig_set(pinger_netif, "channel", 26)
 
     res = ping6(pinger, pinged_addr, count=1000, interval=350, packet_size=100)
     assert res['stats']['packet_loss'] < 10
@@ -230,22 +213,15 @@ def test_task08(riot_ctrl):
 @pytest.mark.parametrize(
     'nodes', [pytest.param(['iotlab-m3', 'iotlab-m3', 'iotlab-m3'])], indirect=['nodes']
 )
-def test_task09(riot_ctrl):
+def test_task09(riot_ctrl, radio_channel):
     nodes = (
         riot_ctrl(0, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
         riot_ctrl(1, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
         riot_ctrl(2, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
     )
 
-    pinged = nodes[0]
-    pingers = nodes[1:]
-
-    pinged_netif, pinged_addr = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_set(pinged_netif, "channel", 26)
+    (_, pinged_addr), *_ = set_channel(nodes, radio_channel)
     assert pinged_addr.startswith("fe80::")
-    for pinger in pingers:
-        pinger_netif, _ = lladdr(pinger.ifconfig_list())
-        pinger.ifconfig_set(pinger_netif, "channel", 26)
 
     futures = []
     for pinger in nodes[1:]:
@@ -263,17 +239,14 @@ def test_task09(riot_ctrl):
 @pytest.mark.parametrize(
     'nodes', [pytest.param(['iotlab-m3', 'iotlab-m3'])], indirect=['nodes']
 )
-def test_task10(riot_ctrl):
+def test_task10(riot_ctrl, radio_channel):
     pinger, pinged = (
         riot_ctrl(0, TASK10_APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
         riot_ctrl(1, TASK10_APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
     )
 
-    pinged_netif, pinged_addr = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_set(pinged_netif, "channel", 26)
+    (_, pinged_addr), _ = set_channel((pinged, pinger), radio_channel)
     assert pinged_addr.startswith("fe80::")
-    pinger_netif, _ = lladdr(pinger.ifconfig_list())
-    pinger.ifconfig_set(pinger_netif, "channel", 26)
 
     res = ping6(pinger, pinged_addr, count=200, interval=600, packet_size=2048)
     if 10 < res['stats']['packet_loss'] <= 100:
@@ -294,7 +267,7 @@ def test_task10(riot_ctrl):
     [pytest.param(['nrf52840dk', 'iotlab-m3', 'iotlab-m3'])],
     indirect=['nodes'],
 )
-def test_task11(riot_ctrl):
+def test_task11(riot_ctrl, radio_channel):
     try:
         nodes = (
             riot_ctrl(0, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
@@ -308,15 +281,8 @@ def test_task11(riot_ctrl):
             "https://github.com/RIOT-OS/Release-Specs/pull/198#issuecomment-758522278"  # noqa: E501
         )
 
-    pinged = nodes[0]
-    pingers = nodes[1:]
-
-    pinged_netif, pinged_addr = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_set(pinged_netif, "channel", 26)
+    (_, pinged_addr), *_ = set_channel(nodes, radio_channel)
     assert pinged_addr.startswith("fe80::")
-    for pinger in pingers:
-        pinger_netif, _ = lladdr(pinger.ifconfig_list())
-        pinger.ifconfig_set(pinger_netif, "channel", 26)
 
     futures = []
     for pinger in nodes[1:]:
@@ -329,13 +295,14 @@ def test_task11(riot_ctrl):
     check_pktbuf(*nodes)
 
 
+@pytest.mark.radio_channel(17)
 @pytest.mark.flaky(reruns=3, reruns_delay=30)
 @pytest.mark.iotlab_creds
 # nodes passed to riot_ctrl fixture
 @pytest.mark.parametrize(
     'nodes', [pytest.param(['iotlab-m3', 'nrf52840dk'])], indirect=['nodes']
 )
-def test_task12(riot_ctrl):
+def test_task12(riot_ctrl, radio_channel):
     try:
         pinger, pinged = (
             riot_ctrl(0, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
@@ -347,10 +314,7 @@ def test_task12(riot_ctrl):
             # pylint: disable=C0301
             "https://github.com/RIOT-OS/Release-Specs/pull/198#issuecomment-758522278"  # noqa: E501
         )
-    pinged_netif, _ = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_set(pinged_netif, "channel", 17)
-    pinger_netif, _ = lladdr(pinger.ifconfig_list())
-    pinger.ifconfig_set(pinger_netif, "channel", 17)
+    set_channel((pinged, pinger), radio_channel)
 
     res = ping6(pinger, "ff02::1", count=1000, interval=100, packet_size=50)
     assert res['stats']['packet_loss'] < 10
@@ -364,7 +328,7 @@ def test_task12(riot_ctrl):
 @pytest.mark.parametrize(
     'nodes', [pytest.param(['iotlab-m3', 'nrf52840dk'])], indirect=['nodes']
 )
-def test_task13(riot_ctrl):
+def test_task13(riot_ctrl, radio_channel):
     try:
         pinger, pinged = (
             riot_ctrl(0, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
@@ -376,11 +340,8 @@ def test_task13(riot_ctrl):
             # pylint: disable=C0301
             "https://github.com/RIOT-OS/Release-Specs/pull/198#issuecomment-758522278"  # noqa: E501
         )
-    pinged_netif, pinged_addr = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_set(pinged_netif, "channel", 26)
+    (_, pinged_addr), _ = set_channel((pinged, pinger), radio_channel)
     assert pinged_addr.startswith("fe80::")
-    pinger_netif, _ = lladdr(pinger.ifconfig_list())
-    pinger.ifconfig_set(pinger_netif, "channel", 26)
 
     res = ping6(pinger, pinged_addr, count=1000, interval=100, packet_size=100)
     assert res['stats']['packet_loss'] < 10
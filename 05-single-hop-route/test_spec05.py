@@ -4,7 +4,7 @@ from riotctrl_shell.gnrc import GNRCICMPv6Echo, GNRCIPv6NIB, GNRCPktbufStats
 from riotctrl_shell.netif import Ifconfig
 
 from testutils.native import bridged
-from testutils.shell import ping6, lladdr, check_pktbuf
+from testutils.shell import ping6, lladdr, check_pktbuf, fan_out
 
 APP = 'examples/networking/gnrc/networking'
 pytestmark = pytest.mark.rc_only()
@@ -14,6 +14,34 @@ class Shell(Ifconfig, GNRCICMPv6Echo, GNRCPktbufStats, GNRCIPv6NIB):
     pass
 
 
+def _route_to_each_other(pinged, pinger, addrs, route, rtr_adv=True):
+    """
+    Configures `pinged` and `pinger` concurrently, adding `addrs` to them and
+    a `route` via the other node to each
+    """
+
+    def init_node(node_addr):
+        node, addr = node_addr
+        netif, node_lladdr = lladdr(node.ifconfig_list())
+        if not rtr_adv:
+            node.ifconfig_flag(netif, "rtr_adv", False)
+        if addr is not None:
+            node.ifconfig_add(netif, addr)
+        return netif, node_lladdr
+
+    def add_route(node_netif_via):
+        node, netif, via = node_netif_via
+        node.nib_route_add(netif, route, via)
+
+    (pinged_netif, pinged_lladdr), (pinger_netif, pinger_lladdr) = fan_out(
+        list(zip((pinged, pinger), addrs)), init_node
+    )
+    fan_out(
+        [(pinged, pinged_netif, pinger_lladdr), (pinger, pinger_netif, pinged_lladdr)],
+        add_route,
+    )
+
+
 @pytest.mark.skipif(not bridged(["tap0", "tap1"]), reason="tap0 and tap1 not bridged")
 # nodes passed to riot_ctrl fixture
 @pytest.mark.parametrize(
@@ -25,15 +53,9 @@ def test_task01(riot_ctrl):
         riot_ctrl(1, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"], port="tap1"),
     )
 
-    pinged_netif, pinged_lladdr = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_flag(pinged_netif, "rtr_adv", False)
-    pinged.ifconfig_add(pinged_netif, "beef::1/64")
-    pinger_netif, pinger_lladdr = lladdr(pinger.ifconfig_list())
-    pinger.ifconfig_flag(pinger_netif, "rtr_adv", False)
-    pinger.ifconfig_add(pinger_netif, "beef::2/64")
-
-    pinged.nib_route_add(pinged_netif, "::", pinger_lladdr)
-    pinger.nib_route_add(pinger_netif, "::", pinged_lladdr)
+    _route_to_each_other(
+        pinged, pinger, ("beef::1/64", "beef::2/64"), "::", rtr_adv=False
+    )
 
     res = ping6(pinger, "beef::1", count=100, interval=10, packet_size=1024)
     assert res['stats']['packet_loss'] < 1
@@ -41,6 +63,9 @@ def test_task01(riot_ctrl):
     check_pktbuf(pinged, pinger)
 
 
+# on RIOT's default channel
+@pytest.mark.radio_channel(26)
+@pytest.mark.usefixtures("radio_channel")
 @pytest.mark.flaky(reruns=3, reruns_delay=30)
 @pytest.mark.iotlab_creds
 @pytest.mark.parametrize(
@@ -52,13 +77,7 @@ def test_task02(riot_ctrl):
         riot_ctrl(1, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"]),
     )
 
-    pinged_netif, pinged_lladdr = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_add(pinged_netif, "beef::1/64")
-    pinger_netif, pinger_lladdr = lladdr(pinger.ifconfig_list())
-    pinger.ifconfig_add(pinger_netif, "affe::1/120")
-
-    pinged.nib_route_add(pinged_netif, "::", pinger_lladdr)
-    pinger.nib_route_add(pinger_netif, "::", pinged_lladdr)
+    _route_to_each_other(pinged, pinger, ("beef::1/64", "affe::1/120"), "::")
 
     res = ping6(pinger, "beef::1", count=100, interval=300, packet_size=1024)
     assert res['stats']['packet_loss'] < 10
@@ -76,15 +95,9 @@ def test_task03(riot_ctrl):
         riot_ctrl(1, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"], port="tap1"),
     )
 
-    pinged_netif, pinged_lladdr = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_flag(pinged_netif, "rtr_adv", False)
-    pinged.ifconfig_add(pinged_netif, "beef::1/64")
-    pinger_netif, pinger_lladdr = lladdr(pinger.ifconfig_list())
-    pinger.ifconfig_flag(pinger_netif, "rtr_adv", False)
-    pinger.ifconfig_add(pinger_netif, "beef::2/64")
-
-    pinged.nib_route_add(pinged_netif, "beef::/64", pinger_lladdr)
-    pinger.nib_route_add(pinger_netif, "beef::/64", pinged_lladdr)
+    _route_to_each_other(
+        pinged, pinger, ("beef::1/64", "beef::2/64"), "beef::/64", rtr_adv=False
+    )
 
     res = ping6(pinger, "beef::1", count=10, interval=10, packet_size=1024)
     assert res['stats']['packet_loss'] < 1
@@ -102,14 +115,7 @@ def test_task04(riot_ctrl):
         riot_ctrl(1, APP, Shell, modules=["shell_cmd_gnrc_pktbuf"], port="tap1"),
     )
 
-    pinged_netif, pinged_lladdr = lladdr(pinged.ifconfig_list())
-    pinged.ifconfig_flag(pinged_netif, "rtr_adv", False)
-    pinged.ifconfig_add(pinged_netif, "beef::1/64")
-    pinger_netif, pinger_lladdr = lladdr(pinger.ifconfig_list())
-    pinger.ifconfig_flag(pinger_netif, "rtr_adv", False)
-
-    pinged.nib_route_add(pinged_netif, "::", pinger_lladdr)
-    pinger.nib_route_add(pinger_netif, "::", pinged_lladdr)
+    _route_to_each_other(pinged, pinger, ("beef::1/64", None), "::", rtr_adv=False)
 
     res = ping6(pinger, "beef::1", count=10, interval=300, packet_size=1024)
     assert res['stats']['packet_loss'] < 1
@@ -4,7 +4,7 @@ from riotctrl_shell.gnrc import GNRCPktbufStats
 from riotctrl_shell.netif import Ifconfig
 
 from testutils.native import bridged
-from testutils.shell import lladdr, GNRCUDP, check_pktbuf
+from testutils.shell import lladdr, set_channel, GNRCUDP, check_pktbuf
 
 APP = 'tests/net/gnrc_udp'
 pytestmark = pytest.mark.rc_only()
@@ -20,18 +20,15 @@ class Shell(Ifconfig, GNRCPktbufStats, GNRCUDP):
 @pytest.mark.parametrize(
     'nodes', [pytest.param(['iotlab-m3', 'iotlab-m3'])], indirect=['nodes']
 )
-def test_task01(riot_ctrl):
+def test_task01(riot_ctrl, radio_channel):
     nodes = (
         riot_ctrl(0, APP, Shell),
         riot_ctrl(1, APP, Shell),
     )
 
     for client, server in zip(nodes, reversed(nodes)):
-        server_netif, server_addr = lladdr(server.ifconfig_list())
-        server.ifconfig_set(server_netif, "channel", 26)
+        (_, server_addr), _ = set_channel((server, client), radio_channel)
         assert server_addr.startswith("fe80::")
-        client_netif, _ = lladdr(client.ifconfig_list())
-        client.ifconfig_set(client_netif, "channel", 26)
 
         server.udp_server_start(1337)
 
@@ -51,18 +48,15 @@ def test_task01(riot_ctrl):
 @pytest.mark.parametrize(
     'nodes', [pytest.param(['iotlab-m3', 'iotlab-m3'])], indirect=['nodes']
 )
-def test_task02(riot_ctrl):
+def test_task02(riot_ctrl, radio_channel):
     nodes = (
         riot_ctrl(0, APP, Shell),
         riot_ctrl(1, APP, Shell),
     )
 
     for client, server in zip(nodes, reversed(nodes)):
-        server_netif, server_addr = lladdr(server.ifconfig_list())
-        server.ifconfig_set(server_netif, "channel", 26)
+        (_, server_addr), _ = set_channel((server, client), radio_channel)
         assert server_addr.startswith("fe80::")
-        client_netif, _ = lladdr(client.ifconfig_list())
-        client.ifconfig_set(client_netif, "channel", 26)
 
         server.udp_server_start(61616)
 
@@ -84,6 +78,9 @@ def test_task03(riot_ctrl):
     check_pktbuf(node)
 
 
+# on RIOT's default channel
+@pytest.mark.radio_channel(26)
+@pytest.mark.usefixtures("radio_channel")
 @pytest.mark.iotlab_creds
 @pytest.mark.parametrize('nodes', [pytest.param(['iotlab-m3'])], indirect=['nodes'])
 def test_task04(riot_ctrl):
@@ -121,18 +118,15 @@ def test_task05(riot_ctrl):
 @pytest.mark.parametrize(
     'nodes', [pytest.param(['iotlab-m3', 'iotlab-m3'])], indirect=['nodes']
 )
-def test_task06(riot_ctrl):
+def test_task06(riot_ctrl, radio_channel):
     nodes = (
         riot_ctrl(0, APP, Shell),
         riot_ctrl(1, APP, Shell),
     )
 
     for client, server in zip(nodes, reversed(nodes)):
-        server_netif, server_addr = lladdr(server.ifconfig_list())
-        server.ifconfig_set(server_netif, "channel", 26)
+        (_, server_addr), _ = set_channel((server, client), radio_channel)
         assert server_addr.startswith("fe80::")
-        client_netif, _ = lladdr(client.ifconfig_list())
-        client.ifconfig_set(client_netif, "channel", 26)
 
         server.udp_server_start(1337)
 
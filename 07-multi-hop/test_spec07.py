@@ -5,7 +5,15 @@ import pytest
 from riotctrl_shell.gnrc import GNRCICMPv6Echo, GNRCIPv6NIB, GNRCPktbufStats
 from riotctrl_shell.netif import Ifconfig
 
-from testutils.shell import lladdr, global_addr, ping6, GNRCUDP, PARSERS, check_pktbuf
+from testutils.shell import (
+    lladdr,
+    global_addr,
+    ping6,
+    GNRCUDP,
+    PARSERS,
+    check_pktbuf,
+    fan_out,
+)
 
 APP = 'tests/net/gnrc_udp'
 TO_ADDR = "affe::1"  # address for the first statically routed node
@@ -26,19 +34,26 @@ def statically_routed_nodes(riot_ctrl):
         riot_ctrl(3, APP, Shell),
     )
     lladdrs = [
-        dict(zip(("netif", "lladdr"), lladdr(node.ifconfig_list()))) for node in nodes
+        dict(zip(("netif", "lladdr"), res))
+        for res in fan_out(nodes, lambda node: lladdr(node.ifconfig_list()))
     ]
     from_addr = FROM_ADDR + "/64"
     to_addr = TO_ADDR + "/64"
-    nodes[0].ifconfig_add(lladdrs[0]["netif"], from_addr)
-    nodes[-1].ifconfig_add(lladdrs[-1]["netif"], to_addr)
-    for i, node in enumerate(nodes):
+
+    def init_routes(i):
+        node = nodes[i]
+        if i == 0:
+            node.ifconfig_add(lladdrs[i]["netif"], from_addr)
+        if i == (len(nodes) - 1):
+            node.ifconfig_add(lladdrs[i]["netif"], to_addr)
         if i < (len(nodes) - 1):
             # set to-route
             node.nib_route_add(lladdrs[i]["netif"], to_addr, lladdrs[i + 1]["lladdr"])
         if i > 0:
             # set from-route
             node.nib_route_add(lladdrs[i]["netif"], from_addr, lladdrs[i - 1]["lladdr"])
+
+    fan_out(range(len(nodes)), init_routes)
     return nodes
 
 
@@ -49,26 +64,25 @@ def netif_parser():
 
 # pylint: disable=W0621
 def _get_nodes_netifs(nodes, netif_parser):
-    nodes_netifs = []
-    for node in nodes:
+    def get_netif(node):
         netifs = netif_parser.parse(node.ifconfig_list())
         key = next(iter(netifs))
-        nodes_netifs.append(
-            {
-                "netif": key,
-                "hwaddr": netifs[key]["long_hwaddr"],
-                "lladdr": [
-                    addr["addr"]
-                    for addr in netifs[key]["ipv6_addrs"]
-                    if addr["scope"] == "link"
-                ][0],
-            }
-        )
-    return nodes_netifs
+        return {
+            "netif": key,
+            "hwaddr": netifs[key]["long_hwaddr"],
+            "lladdr": [
+                addr["addr"]
+                for addr in netifs[key]["ipv6_addrs"]
+                if addr["scope"] == "link"
+            ][0],
+        }
+
+    return fan_out(nodes, get_netif)
 
 
 def _l2filter_nodes(nodes, nodes_netifs):
-    for i, node in enumerate(nodes):
+    def l2filter_node(i):
+        node = nodes[i]
         if i < (len(nodes) - 1):
             # set to-route
             node.ifconfig_l2filter_add(
@@ -80,6 +94,8 @@ def _l2filter_nodes(nodes, nodes_netifs):
                 nodes_netifs[i]["netif"], nodes_netifs[i - 1]["hwaddr"]
             )
 
+    fan_out(range(len(nodes)), l2filter_node)
+
 
 def _init_rpl_dodag(nodes, nodes_netifs):
     dodag_id = nodes_netifs[0]["lladdr"].replace("fe80::", "2001:db8::")
@@ -91,22 +107,41 @@ def _init_rpl_dodag(nodes, nodes_netifs):
     res = nodes[0].cmd(f"rpl root 0 {dodag_id}")
     if "success" not in res:
         raise RuntimeError(res)
-    for i, node in enumerate(nodes[1:], 1):
-        res = node.cmd(f"rpl init {nodes_netifs[i]['netif']}")
+    for res in fan_out(
+        range(1, len(nodes)),
+        lambda i: nodes[i].cmd(f"rpl init {nodes_netifs[i]['netif']}"),
+    ):
         if "success" not in res:
             raise RuntimeError(res)
-    nodes_configured = [False]
-    while not all(nodes_configured):
-        time.sleep(10)
-        nodes_configured = [False for node in nodes[1:]]
-        for i, node in enumerate(nodes[1:]):
-            res = node.cmd("rpl show")
-            nodes_configured[i] = dodag_id in res
+    return _wait_for_dodag(nodes[1:], dodag_id)
+
+
+def _wait_for_dodag(nodes, dodag_id, interval=0.5, backoff=1.5, max_interval=10):
+    """
+    Polls all `nodes` that did not join the DODAG `dodag_id` yet concurrently,
+    with an interval growing by `backoff` up to `max_interval` seconds, until
+    all of them joined.
+
+    :return: List of the time in seconds it took each node to join
+    """
+    start = time.monotonic()
+    convergence_times = [None] * len(nodes)
+    while True:
+        waiting = [i for i, t in enumerate(convergence_times) if t is None]
+        for i, res in zip(
+            waiting, fan_out([nodes[i] for i in waiting], lambda n: n.cmd("rpl show"))
+        ):
+            if dodag_id in res:
+                convergence_times[i] = time.monotonic() - start
+        if all(t is not None for t in convergence_times):
+            return convergence_times
+        time.sleep(interval)
+        interval = min(interval * backoff, max_interval)
 
 
 @pytest.fixture
 # pylint: disable=W0621
-def rpl_nodes(riot_ctrl, netif_parser):
+def rpl_nodes(riot_ctrl, netif_parser, record_stats):
     nodes = (
         riot_ctrl(0, APP, Shell, modules="l2filter_whitelist"),
         riot_ctrl(1, APP, Shell, modules="l2filter_whitelist"),
@@ -115,10 +150,17 @@ def rpl_nodes(riot_ctrl, netif_parser):
     )
     nodes_netifs = _get_nodes_netifs(nodes, netif_parser)
     _l2filter_nodes(nodes, nodes_netifs)
-    _init_rpl_dodag(nodes, nodes_netifs)
+    convergence_times = _init_rpl_dodag(nodes, nodes_netifs)
+    record_stats(
+        "rpl_convergence",
+        {f"node{i}": t for i, t in enumerate(convergence_times, 1)},
+    )
     return nodes
 
 
+# on RIOT's default channel
+@pytest.mark.radio_channel(26)
+@pytest.mark.usefixtures("radio_channel")
 @pytest.mark.flaky(reruns=3, reruns_delay=30)
 @pytest.mark.iotlab_creds
 # nodes passed to statically_routed_nodes for riot_ctrl fixture
@@ -135,6 +177,9 @@ def test_task01(statically_routed_nodes):
     check_pktbuf(*statically_routed_nodes)
 
 
+# on RIOT's default channel
+@pytest.mark.radio_channel(26)
+@pytest.mark.usefixtures("radio_channel")
 @pytest.mark.flaky(reruns=3, reruns_delay=30)
 @pytest.mark.iotlab_creds
 # nodes passed to statically_routed_nodes for riot_ctrl fixture
@@ -158,6 +203,9 @@ def test_task02(statically_routed_nodes):
     check_pktbuf(*statically_routed_nodes)
 
 
+# on RIOT's default channel
+@pytest.mark.radio_channel(26)
+@pytest.mark.usefixtures("radio_channel")
 @pytest.mark.flaky(reruns=3, reruns_delay=30)
 @pytest.mark.iotlab_creds
 # nodes passed to rpl_nodes for riot_ctrl fixture
@@ -175,6 +223,9 @@ def test_task03(rpl_nodes):
     check_pktbuf(*rpl_nodes)
 
 
+# on RIOT's default channel
+@pytest.mark.radio_channel(26)
+@pytest.mark.usefixtures("radio_channel")
 @pytest.mark.flaky(reruns=3, reruns_delay=30)
 @pytest.mark.iotlab_creds
 # nodes passed to rpl_nodes for riot_ctrl fixture
@@ -196,6 +247,9 @@ def test_task04(rpl_nodes):
     check_pktbuf(*rpl_nodes)
 
 
+# on RIOT's default channel
+@pytest.mark.radio_channel(26)
+@pytest.mark.usefixtures("radio_channel")
 @pytest.mark.iotlab_creds
 # nodes passed to rpl_nodes for riot_ctrl fixture
 @pytest.mark.parametrize(
@@ -50,6 +50,9 @@ def test_task01(riot_ctrl, log_nodes):
     assert res["stats"]["packet_loss"] < 1
 
 
+# on RIOT's default channel
+@pytest.mark.radio_channel(26)
+@pytest.mark.usefixtures("radio_channel")
 @pytest.mark.flaky(reruns=1, reruns_delay=30)
 @pytest.mark.iotlab_creds
 # nodes passed to riot_ctrl fixture
@@ -88,6 +91,9 @@ def test_task03(riot_ctrl):
     assert res['stats']['packet_loss'] < 10
 
 
+# on RIOT's default channel
+@pytest.mark.radio_channel(26)
+@pytest.mark.usefixtures("radio_channel")
 @pytest.mark.flaky(reruns=3, reruns_delay=30)
 @pytest.mark.iotlab_creds
 # nodes passed to riot_ctrl fixture
@@ -2,7 +2,6 @@ import asyncio
 import datetime
 import json
 import re
-import math
 import os
 import subprocess
 import time
@@ -15,6 +14,7 @@ from riotctrl_shell.netif import Ifconfig
 from riotctrl_shell.cord_ep import CordEp, CordEpRegistrationInfoParser
 
 from testutils.asyncio import timeout_futures, wait_for_futures
+from testutils.coap import block_exp, run_block_sweep
 from testutils.native import bridge, interface_exists, ip_addr_add, ip_addr_del
 from testutils.shell import lladdr
 
@@ -60,6 +60,16 @@ async def coap_server():
     return await aiocoap.Context.create_server_context(root)
 
 
+def _sweep_stats(results):
+    return {
+        str(res["block_size"]): {
+            "latency": res["latency"],
+            "retransmissions": res["retransmissions"],
+        }
+        for res in results
+    }
+
+
 def setup_function(function):
     if function.__name__ in ["test_task01", "test_task02", "test_task05"]:
         host_netif = bridge(TAP)
@@ -143,7 +153,7 @@ def test_task02(riot_ctrl, start_server, expected):
 
 @pytest.mark.skipif(not interface_exists("tap0"), reason="tap0 does not exist")
 @pytest.mark.parametrize('nodes', [pytest.param(['native'])], indirect=['nodes'])
-def test_task03(riot_ctrl):
+def test_task03(riot_ctrl, record_stats):
     node = riot_ctrl(0, 'examples/networking/coap/nanocoap_server', Shell, port=TAP)
     host_netif = bridge(TAP)
 
@@ -155,42 +165,36 @@ def test_task03(riot_ctrl):
         if addr.startswith("fe80:")
     ][0]
 
-    async def client(host, block_size):
-        # create async context and wait a couple of seconds
-        context = await aiocoap.Context.create_client_context()
-        await asyncio.sleep(2)
-
-        payload = (
-            b'If one advances confidently in the direction of his dreams,'
-            b' he will meet with a success unexpected in common hours.'
-        )
+    host = f"[{node_lladdr}%{host_netif}]"
+    payload = (
+        b'If one advances confidently in the direction of his dreams,'
+        b' he will meet with a success unexpected in common hours.'
+    )
 
+    def request(block_size):
         # pylint: disable=E1101
-        request = aiocoap.Message(
+        msg = aiocoap.Message(
             code=aiocoap.POST, payload=payload, uri=f'coap://{host}/sha256'
         )
-
-        block_exp = round(math.log(block_size, 2)) - 4
         # pylint: disable=E0237
-        request.opt.block1 = aiocoap.optiontypes.BlockOption.BlockwiseTuple(
-            0, 0, block_exp
+        msg.opt.block1 = aiocoap.optiontypes.BlockOption.BlockwiseTuple(
+            0, 0, block_exp(block_size)
         )
+        return msg
 
-        return await context.request(request).response
-
-    for block_size in range(16, 1024 + 1, 16):
-        print("Testing block size", block_size)
-        response = asyncio.get_event_loop().run_until_complete(
-            client(f"[{node_lladdr}%{host_netif}]", block_size)
-        )
-        assert str(response.code) == "2.04 Changed"
+    # the server hashes one upload at a time, so no concurrent requests
+    results = run_block_sweep(request, concurrency=1)
+    record_stats("block1", _sweep_stats(results))
+    for res in results:
+        response = res["response"]
+        assert str(response.code) == "2.04 Changed", res["block_size"]
         # payload is a sha256 digest
         assert re.match("^[0-9A-Fa-f]{64}$", response.payload.decode())
 
 
 @pytest.mark.skipif(not interface_exists("tap0"), reason="tap0 does not exist")
 @pytest.mark.parametrize('nodes', [pytest.param(['native'])], indirect=['nodes'])
-def test_task04(riot_ctrl):
+def test_task04(riot_ctrl, record_stats):
     node = riot_ctrl(0, 'examples/networking/coap/nanocoap_server', Shell, port=TAP)
     host_netif = bridge(TAP)
 
@@ -202,28 +206,22 @@ def test_task04(riot_ctrl):
         if addr.startswith("fe80:")
     ][0]
 
-    async def client(host, block_size):
-        # create async context and wait a couple of seconds
-        context = await aiocoap.Context.create_client_context()
-        await asyncio.sleep(2)
+    host = f"[{node_lladdr}%{host_netif}]"
 
+    def request(block_size):
         # pylint: disable=E1101
-        request = aiocoap.Message(code=aiocoap.GET, uri=f'coap://{host}/riot/ver')
-
-        block_exp = round(math.log(block_size, 2)) - 4
+        msg = aiocoap.Message(code=aiocoap.GET, uri=f'coap://{host}/riot/ver')
         # pylint: disable=E0237
-        request.opt.block2 = aiocoap.optiontypes.BlockOption.BlockwiseTuple(
-            0, 0, block_exp
+        msg.opt.block2 = aiocoap.optiontypes.BlockOption.BlockwiseTuple(
+            0, 0, block_exp(block_size)
         )
+        return msg
 
-        return await context.request(request).response
-
-    for block_size in range(16, 1024 + 1, 16):
-        print("Testing block size", block_size)
-        response = asyncio.get_event_loop().run_until_complete(
-            client(f"[{node_lladdr}%{host_netif}]", block_size)
-        )
-        assert str(response.code) == "2.05 Content"
+    results = run_block_sweep(request, concurrency=1)
+    record_stats("block2", _sweep_stats(results))
+    for res in results:
+        response = res["response"]
+        assert str(response.code) == "2.05 Content", res["block_size"]
         assert re.search(
             r"This is RIOT \(Version: .*\) running on a \S+ board with a \S+ MCU\.",
             response.payload.decode(),
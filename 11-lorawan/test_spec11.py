@@ -201,6 +201,8 @@ def test_task03(riot_ctrl, ttn_client, devaddr, nwkskey, appskey, dr):
     assert payload == APP_PAYLOAD
 
 
+# joins with the device of the other tasks
+@pytest.mark.usefixtures("ttn_device")
 @pytest.mark.iotlab_creds
 # nodes passed to riot_ctrl fixture
 @pytest.mark.parametrize(
@@ -6,30 +6,59 @@ Central pytest definitions.
 See https://docs.pytest.org/en/stable/fixture.html#conftest-py-sharing-fixture-functions
 """  # noqa: E501
 
+import logging
 import random
 import re
 import os
 import subprocess
 import sys
 import time
+import types
 
+from collections import Counter, defaultdict
 from collections.abc import Iterable
 
 import pytest
 from riotctrl.ctrl import RIOTCtrl
 
+import testutils.build
 import testutils.github
 import testutils.pytest
-from testutils.iotlab import IoTLABExperiment, DEFAULT_SITE
+import testutils.results
+import testutils.stats
+from testutils.iotlab import (
+    IoTLABExperiment,
+    IoTLABExperimentPool,
+    IoTLABExperimentPrefetcher,
+    DEFAULT_SITE,
+)
+from testutils.lease import LeaseBroker
+from testutils.ssh import SSHMultiplexer
 
 from testutils.pytest import get_required_envvar
 from testutils import ttn
 
 IOTLAB_EXPERIMENT_DURATION = 120
+IOTLAB_POOL_DURATION_PER_TEST = 20
 RIOTBASE = os.environ.get('RIOTBASE')
 RUNNING_CTRLS = []
 RUNNING_EXPERIMENTS = []
-DEFAULT_PAN_ID = str(random.randint(0, 0xFFFD))
+BUILD_CACHE = pytest.StashKey[testutils.build.BuildCache]()
+IOTLAB_POOLS = pytest.StashKey[dict]()
+IOTLAB_PREFETCHER = pytest.StashKey[IoTLABExperimentPrefetcher]()
+LEASE_BROKER = pytest.StashKey[LeaseBroker]()
+SSH_MULTIPLEXER = pytest.StashKey[SSHMultiplexer]()
+DEFAULT_CHANNEL = 26
+# channels handed out to concurrent tests, in order of preference. Tests on
+# RIOT's default channel and spec 04 tests fixed to channel 17 lease their
+# channel with the `radio_channel` marker.
+RADIO_CHANNELS = [c for c in range(DEFAULT_CHANNEL - 1, 10, -1) if c != 17]
+# pin DEFAULT_PAN_ID via environment to reuse builds across sessions, seeded
+# with the test run ID so all pytest-xdist workers build the same firmwares
+DEFAULT_PAN_ID = os.environ.get(
+    'DEFAULT_PAN_ID',
+    str(random.Random(os.environ.get('PYTEST_XDIST_TESTRUNUID')).randint(0, 0xFFFD)),
+)
 
 
 def pytest_addoption(parser):
@@ -84,6 +113,81 @@ def pytest_addoption(parser):
         "'{module}-{function}-{node}-{time}.log' and stored in the "
         "current work directory",
     )
+    parser.addoption(
+        "--prebuild",
+        action="store_true",
+        default=False,
+        help="Build all firmwares required by the collected tests in parallel "
+        "before running the tests and only flash them within the tests",
+    )
+    parser.addoption(
+        "--prebuild-jobs",
+        type=int,
+        default=None,
+        help="Number of parallel builds for --prebuild (default: number of CPUs). "
+        "With pytest-xdist, the first worker pre-builds for all workers and "
+        "leaves one job to each other worker",
+    )
+    parser.addoption(
+        "--build-cache-dir",
+        default=None,
+        help="Directory to keep built firmwares in between sessions. "
+        "Firmwares are reused if RIOT revision, application, BOARD and build "
+        "environment match. Set DEFAULT_PAN_ID in the environment to reuse "
+        "firmwares across sessions",
+    )
+    parser.addoption(
+        "--build-cache-size",
+        type=int,
+        default=2048,
+        help="Maximum size of --build-cache-dir in MiB. Least recently used "
+        "firmwares are removed at the end of the session (default: 2048)",
+    )
+    parser.addoption(
+        "--iotlab-pool",
+        action="store_true",
+        default=False,
+        help="Reserve the IoT-LAB nodes for all collected tests in one "
+        "experiment per site and lease them to the tests instead of starting "
+        "an experiment per test",
+    )
+    parser.addoption(
+        "--iotlab-prefetch",
+        action="store_true",
+        default=False,
+        help="Start the IoT-LAB experiment of the next test while a test "
+        "runs, so the nodes are booted when it starts. Not used with "
+        "--iotlab-pool or pytest-xdist",
+    )
+    parser.addoption(
+        "--iotlab-select-nodes",
+        action="store_true",
+        default=False,
+        help="Reserve idle IoT-LAB nodes close to each other for tests with "
+        "multiple nodes, instead of letting IoT-LAB choose any nodes of the "
+        "site. Not used with --iotlab-pool",
+    )
+    parser.addoption(
+        "--results-clone-dir",
+        default=None,
+        help="Directory to keep the clone of the results gist in between "
+        "sessions, so only new results are fetched (default: the session's "
+        "temporary directory)",
+    )
+    parser.addoption(
+        "--results-db",
+        default=None,
+        help="SQLite database to record the results of the tests in, with "
+        "the statistics recorded by the tests, to compare them between "
+        "release candidates",
+    )
+    parser.addoption(
+        "--github-flush-interval",
+        type=float,
+        default=None,
+        help="Also report the results collected so far to the tracking issue "
+        "every FLUSH_INTERVAL seconds instead of only at the end of the session",
+    )
 
 
 def pytest_ignore_collect(path, config):
@@ -113,7 +217,9 @@ def pytest_collection_modifyitems(config, items):
     run_local = config.getoption("--local")
     sudo_only_mark = testutils.pytest.check_sudo()
     local_only_mark = testutils.pytest.check_local(run_local)
-    iotlab_creds_mark = testutils.pytest.check_credentials(run_local)
+    iotlab_creds_mark = testutils.pytest.check_credentials(
+        run_local, ssh_multiplexer(config)
+    )
     rc_only_mark = testutils.pytest.check_rc(not config.getoption("--non-RC"))
 
     for item in items:
@@ -126,20 +232,385 @@ def pytest_collection_modifyitems(config, items):
         if rc_only_mark and "rc_only" in item.keywords:
             item.add_marker(rc_only_mark)
 
+    init_build_cache(config)
+    if config.getoption("--prebuild"):
+        prebuild_firmwares(config, items)
+    if config.getoption("--iotlab-pool") and not run_local:
+        init_iotlab_pools(config, items)
+    elif (
+        config.getoption("--iotlab-prefetch")
+        and not run_local
+        and testutils.pytest.xdist_worker_id(config) is None
+        and not testutils.pytest.is_xdist_controller(config)
+    ):
+        # with pytest-xdist, the next test of a worker is not known ahead
+        init_iotlab_prefetcher(config, items)
+
+
+def pytest_sessionfinish(session):
+    # pylint: disable=C0301
+    """
+    called after whole test run finished, right before returning the exit
+    status to the system.
+
+    See: https://docs.pytest.org/en/stable/reference.html#_pytest.hookspec.pytest_sessionfinish
+    """  # noqa: E501
+    config = session.config
+    if testutils.pytest.is_xdist_controller(config):
+        # the workers are done, so clean up what they shared
+        IoTLABExperimentPool.stop_all(lease_broker(config))
+        if config.getoption("--build-cache-dir") is not None:
+            testutils.build.BuildCache(
+                config.getoption("--build-cache-dir"),
+                None,
+                max_size=config.getoption("--build-cache-size") * 1024 * 1024,
+            ).evict()
+        return
+    if testutils.pytest.xdist_worker_id(config) is not None:
+        # shared with other workers, so leave it for the controller
+        return
+    cache = config.stash.get(BUILD_CACHE, None)
+    if cache is not None:
+        cache.evict()
+    for pool in config.stash.get(IOTLAB_POOLS, {}).values():
+        if pool.exp_id is not None:
+            pool.stop()
+            RUNNING_EXPERIMENTS.remove(pool)
+    prefetcher = config.stash.get(IOTLAB_PREFETCHER, None)
+    if prefetcher is not None:
+        prefetcher.stop()
+        RUNNING_EXPERIMENTS.remove(prefetcher)
+
+
+def shared_tmp_path(config):
+    """
+    Temporary directory shared by all pytest-xdist workers of a session
+    """
+    # pylint: disable=W0212
+    basetemp = config._tmp_path_factory.getbasetemp()
+    if testutils.pytest.xdist_worker_id(config) is not None:
+        # each worker gets a sub-directory of the controller's basetemp
+        return basetemp.parent
+    return basetemp
+
+
+def lease_broker(config):
+    """
+    Broker for resources that need to be distinct between concurrently running
+    tests. Only shared if running distributed with pytest-xdist, None
+    otherwise.
+    """
+    worker = testutils.pytest.xdist_worker_id(config)
+    if worker is None and not testutils.pytest.is_xdist_controller(config):
+        return None
+    if LEASE_BROKER not in config.stash:
+        broker = LeaseBroker(shared_tmp_path(config) / "leases.json", worker=worker)
+        if worker is not None:
+            # left behind by a crashed worker of the same ID
+            _release_stale_leases(broker, worker)
+        config.stash[LEASE_BROKER] = broker
+    return config.stash[LEASE_BROKER]
+
+
+def _release_stale_leases(broker, worker):
+    for resource, candidates in broker.release_worker(worker).items():
+        logging.warning(f"Released {resource} {candidates} leased by {worker}")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    """pytest-xdist hook, called on the controller when a worker went down"""
+    if error is not None:
+        _release_stale_leases(lease_broker(node.config), node.workerinput["workerid"])
+
+
+def ssh_multiplexer(config):
+    """
+    Multiplexer for the SSH connections of this process to the IoT-LAB
+    front-ends, so they only connect once per site. None if running locally.
+    """
+    if config.getoption("--local"):
+        return None
+    if SSH_MULTIPLEXER not in config.stash:
+        config.stash[SSH_MULTIPLEXER] = SSHMultiplexer()
+    return config.stash[SSH_MULTIPLEXER]
+
+
+def init_build_cache(config):
+    """
+    Set up the build cache for the `riot_ctrl` fixture. The cache is kept in
+    --build-cache-dir if given, or only for this session if --prebuild is set.
+    """
+    cachedir = config.getoption("--build-cache-dir")
+    max_size = None
+    if cachedir is not None:
+        max_size = config.getoption("--build-cache-size") * 1024 * 1024
+    elif config.getoption("--prebuild"):
+        cachedir = shared_tmp_path(config) / "firmwares"
+    else:
+        return
+    if os.environ.get('BUILD_IN_DOCKER', 0) == '1':
+        # BINDIR outside of RIOTBASE is not available within the container
+        logging.warning("Build cache is not supported with BUILD_IN_DOCKER=1")
+        return
+    revision = testutils.build.riot_revision(os.path.abspath(RIOTBASE))
+    if revision is None:
+        logging.warning(f"Unable to determine RIOT revision of {RIOTBASE}")
+        return
+    config.stash[BUILD_CACHE] = testutils.build.BuildCache(
+        cachedir, revision, max_size=max_size
+    )
+
+
+def _board_name(board):
+    try:
+        return IoTLABExperiment.board_from_iotlab_node(board)
+    except ValueError:
+        return board
+
+
+def item_boards(config, item):
+    """
+    The boards the `nodes` fixture provides for `item`
+    """
+    boards = config.getoption("--boards")
+    if not boards and hasattr(item, "callspec"):
+        boards = item.callspec.params.get("nodes")
+    return boards or []
+
+
+def item_iotlab_site(item):
+    """
+    The IoT-LAB site the `iotlab_site` fixture provides for `item`
+    """
+    if hasattr(item, "callspec") and "iotlab_site" in item.callspec.params:
+        return item.callspec.params["iotlab_site"]
+    return os.environ.get("IOTLAB_SITE", DEFAULT_SITE)
+
+
+def item_iotlab_boards(config, item):
+    """
+    The BOARDs of the IoT-LAB nodes `item` needs, if it runs and does not ask
+    for specific IOTLAB_NODEs
+    """
+    if item.get_closest_marker("skip") or "iotlab_creds" not in item.keywords:
+        return []
+    boards = item_boards(config, item)
+    if not boards or all(b.startswith("native") for b in boards):
+        return []
+    if not all(IoTLABExperiment.valid_board(b) for b in boards):
+        # tests asking for specific IOTLAB_NODEs get their own experiment
+        return []
+    return boards
+
+
+def init_iotlab_prefetcher(config, items):
+    """
+    Start the IoT-LAB experiment of the next test while a test runs
+    """
+    tests = []
+    for item in items:
+        boards = item_iotlab_boards(config, item)
+        if boards:
+            tests.append(
+                (
+                    item.nodeid,
+                    # pylint: disable=C0209
+                    "RIOT-release-test-{module}-{function}".format(**get_namefmt(item)),
+                    boards,
+                    item_iotlab_site(item),
+                )
+            )
+    prefetcher = IoTLABExperimentPrefetcher(
+        tests,
+        duration=IOTLAB_EXPERIMENT_DURATION,
+        select_nodes=config.getoption("--iotlab-select-nodes"),
+    )
+    config.stash[IOTLAB_PREFETCHER] = prefetcher
+    RUNNING_EXPERIMENTS.append(prefetcher)
+
+
+def init_iotlab_pools(config, items):
+    """
+    Set up an experiment pool per IoT-LAB site that can serve every collected
+    test that requires IoT-LAB. The experiments are only started once the
+    first test leases nodes.
+    """
+    site_boards = defaultdict(Counter)
+    site_boards_total = defaultdict(Counter)
+    site_tests = Counter()
+    for item in items:
+        boards = item_iotlab_boards(config, item)
+        if not boards:
+            continue
+        site = item_iotlab_site(item)
+        # tests run one after another per worker, so the pool needs as many
+        # nodes of a BOARD as the most demanding test per worker
+        site_boards[site] |= Counter(boards)
+        site_boards_total[site] += Counter(boards)
+        site_tests[site] += 1
+    workers = testutils.pytest.xdist_worker_count(config)
+    pools = {}
+    for site, boards in site_boards.items():
+        pools[site] = IoTLABExperimentPool(
+            name="RIOT-release-test-pool",
+            boards={
+                board: min(count * workers, site_boards_total[site][board])
+                for board, count in boards.items()
+            },
+            site=site,
+            duration=max(
+                IOTLAB_EXPERIMENT_DURATION,
+                site_tests[site] * IOTLAB_POOL_DURATION_PER_TEST // workers,
+            ),
+            broker=lease_broker(config),
+            owner=testutils.pytest.xdist_worker_id(config),
+        )
+    config.stash[IOTLAB_POOLS] = pools
+
+
+def prebuild_firmwares(config, items):
+    """
+    Build the firmwares of all collected tests that are not skipped in
+    parallel, so the `riot_ctrl` fixture only needs to flash them
+    """
+    cache = config.stash.get(BUILD_CACHE, None)
+    if cache is None:
+        return
+    if testutils.pytest.xdist_worker_id(config) not in (None, "gw0"):
+        # all workers collect the same tests and share the cache
+        return
+    firmwares = set()
+    for item in items:
+        if item.get_closest_marker("skip"):
+            continue
+        firmwares.update(
+            testutils.build.item_firmwares(
+                item, [_board_name(b) for b in item_boards(config, item)], build_env
+            )
+        )
+    jobs = config.getoption("--prebuild-jobs") or os.cpu_count()
+    testutils.build.prebuild(
+        firmwares,
+        os.path.abspath(RIOTBASE),
+        cache,
+        # leave one job to each other worker, building what it needs itself
+        # until it was pre-built
+        jobs=max(1, jobs - testutils.pytest.xdist_worker_count(config) + 1),
+    )
+
 
 def pytest_configure(config):
+    testutils.pytest.check_pan_id(DEFAULT_PAN_ID)
     plugin = GithubCommentReportPlugin(config)
     config.pluginmanager.register(plugin, 'github_comment_report_plugin')
+    if config.getoption("--results-db") is not None:
+        plugin = ResultsStorePlugin(config)
+        config.pluginmanager.register(plugin, 'results_store_plugin')
+
+
+def pytest_unconfigure(config):
+    # after all experiments were stopped
+    IoTLABExperiment.close_api()
+    multiplexer = config.stash.get(SSH_MULTIPLEXER, None)
+    if multiplexer is not None:
+        multiplexer.close()
 
 
-class GithubCommentReportPlugin:  # pylint: disable=R0903
+class GithubCommentReportPlugin:
     def __init__(self, config):
         self.config = config
+        self.worker = None
 
     def pytest_runtest_logreport(self, report):
-        # pylint: disable=W0212
-        basetemp = self.config._tmp_path_factory.getbasetemp()
-        testutils.github.update_issue(report, basetemp)
+        if testutils.pytest.xdist_worker_id(self.config) is not None:
+            # the controller also receives the reports of its workers
+            return
+        if self.worker is None:
+            clonedir = self.config.getoption("--results-clone-dir")
+            if clonedir is None:
+                # pylint: disable=W0212
+                clonedir = self.config._tmp_path_factory.getbasetemp()
+            self.worker = testutils.github.ReportWorker(
+                testutils.github.SessionReporter(
+                    clonedir,
+                    flush_interval=self.config.getoption("--github-flush-interval"),
+                )
+            )
+        # reported in the background while the next test runs
+        self.worker.put(report)
+
+    def pytest_keyboard_interrupt(self):
+        if self.worker is not None:
+            self.worker.close()
+
+    def pytest_sessionfinish(self):
+        if self.worker is not None:
+            self.worker.close()
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self.worker is None or self.worker.reporter.issue is None:
+            return
+        terminalreporter.write_line(self.worker.summary())
+
+
+class ResultsStorePlugin:
+    """Records the results of the tests run by this process in the
+    --results-db, with the metrics recorded with `record_stats`"""
+
+    def __init__(self, config):
+        self.config = config
+        self.store = None
+        self.release = None
+        self.boards = {}
+        self.reruns = Counter()
+
+    def pytest_collection_modifyitems(self, config, items):
+        for item in items:
+            self.boards[item.nodeid] = item_boards(config, item)
+
+    def _add(self, report, outcome, tested_task):
+        if self.store is None:
+            self.store = testutils.results.ResultsStore(
+                self.config.getoption("--results-db")
+            )
+            rc = testutils.github.get_rc()
+            if rc:
+                self.release = "{release}-{candidate}".format(**rc)
+            else:
+                self.release = testutils.build.riot_revision(RIOTBASE) or "unknown"
+        self.store.add(
+            self.release,
+            tested_task["spec"],
+            tested_task["task"],
+            outcome,
+            params=testutils.github.task_params(tested_task.get("params") or ""),
+            boards=self.boards.get(report.nodeid, ()),
+            duration=report.duration,
+            reruns=self.reruns.pop(report.nodeid, 0),
+            metrics=testutils.results.metrics_from_properties(report.user_properties),
+        )
+
+    def pytest_runtest_logreport(self, report):
+        if testutils.pytest.is_xdist_controller(self.config):
+            # recorded by the workers
+            return
+        if report.outcome == "rerun":
+            self.reruns[report.nodeid] += 1
+            return
+        if report.when == "call":
+            outcome = report.outcome
+        elif report.when == "setup" and not report.passed:
+            outcome = "skipped" if report.skipped else "error"
+        else:
+            return
+        tested_task = testutils.github.get_task(report.nodeid)
+        if tested_task:
+            self._add(report, outcome, tested_task)
+
+    def pytest_sessionfinish(self):
+        if self.store is not None:
+            self.store.close()
 
 
 def pytest_keyboard_interrupt(excinfo):
@@ -194,7 +665,16 @@ def appskey():
 
 
 @pytest.fixture
-def ttn_client():
+def ttn_device(request):
+    """
+    Serializes the tests using the TTN application and its device when running
+    distributed with pytest-xdist, as the uplinks are not told apart by device
+    """
+    testutils.pytest.lease(lease_broker(request.config), request, "ttn", ["device"])
+
+
+@pytest.fixture
+def ttn_client(ttn_device):  # pylint: disable=W0613,W0621
     with ttn.TTNClient() as client:
         yield client
 
@@ -259,6 +739,36 @@ def iotlab_site(request):
     return getattr(request, "param", os.environ.get("IOTLAB_SITE", DEFAULT_SITE))
 
 
+@pytest.fixture
+def radio_channel(request):
+    """
+    IEEE 802.15.4 channel to use for the test. Concurrently running tests get
+    distinct channels when running distributed with pytest-xdist. Tests that
+    need a specific channel request it with the `radio_channel` marker and wait
+    until no other test uses it.
+    """
+    marker = request.node.get_closest_marker("radio_channel")
+    broker = lease_broker(request.config)
+    if broker is None:
+        return marker.args[0] if marker else DEFAULT_CHANNEL
+    candidates = marker.args[:1] if marker else RADIO_CHANNELS
+    return testutils.pytest.lease(broker, request, "channels", candidates)
+
+
+@pytest.fixture
+def record_stats(request):
+    """
+    Records statistics, e.g. from `testutils.stats.ping6_stats()`, as
+    properties of the test in the JUnit XML report, so they can be compared
+    between release candidates
+    """
+
+    def record(name, stats):
+        request.node.user_properties.extend(testutils.stats.flatten(stats, name))
+
+    yield record
+
+
 def get_namefmt(request):
     name_fmt = {}
     if request.module:
@@ -292,20 +802,57 @@ def nodes(local, request, boards, iotlab_site):
         ctrls.append(RIOTCtrl(env=env))
     if local or only_native:
         yield ctrls
+        return
+    api_calls = IoTLABExperiment.api_calls()
+    multiplexer = ssh_multiplexer(request.config)
+    for ctrl in ctrls:
+        # flash, term and reset reuse the SSH connection to the front-end
+        multiplexer.configure(ctrl.env)
+    pool = request.config.stash.get(IOTLAB_POOLS, {}).get(iotlab_site)
+    if pool is not None and lease_iotlab_nodes(pool, ctrls):
+        yield ctrls
+        pool.release(ctrls)
     else:
-        name_fmt = get_namefmt(request)
-        # Start IoT-LAB experiment if requested
-        exp = IoTLABExperiment(
-            # pylint: disable=C0209
-            name="RIOT-release-test-{module}-{function}".format(**name_fmt),
-            ctrls=ctrls,
-            site=iotlab_site,
-        )
-        RUNNING_EXPERIMENTS.append(exp)
-        exp.start(duration=IOTLAB_EXPERIMENT_DURATION)
+        prefetcher = request.config.stash.get(IOTLAB_PREFETCHER, None)
+        exp = None
+        if prefetcher is not None:
+            exp = prefetcher.take(request.node.nodeid, ctrls)
+            # boot the next test's nodes while this test runs
+            prefetcher.prefetch_next(request.node.nodeid)
+        if exp is not None:
+            RUNNING_EXPERIMENTS.append(exp)
+        else:
+            name_fmt = get_namefmt(request)
+            # Start IoT-LAB experiment if requested
+            exp = IoTLABExperiment(
+                # pylint: disable=C0209
+                name="RIOT-release-test-{module}-{function}".format(**name_fmt),
+                ctrls=ctrls,
+                site=iotlab_site,
+                select_nodes=request.config.getoption("--iotlab-select-nodes"),
+            )
+            RUNNING_EXPERIMENTS.append(exp)
+            exp.start(duration=IOTLAB_EXPERIMENT_DURATION)
         yield ctrls
         exp.stop()
         RUNNING_EXPERIMENTS.remove(exp)
+    # includes the calls of experiments prefetched meanwhile
+    request.node.user_properties.append(
+        ("iotlab.rest_calls", IoTLABExperiment.api_calls() - api_calls)
+    )
+
+
+def lease_iotlab_nodes(pool, ctrls):
+    """
+    Lease nodes from IoT-LAB experiment `pool` to `ctrls`, starting the pool's
+    experiment if it is not running yet.
+
+    :return: True if all `ctrls` got a node assigned, False otherwise
+    """
+    if pool.exp_id is None:
+        RUNNING_EXPERIMENTS.append(pool)
+        pool.start()
+    return pool.lease(ctrls)
 
 
 def update_env(node, modules=None, cflags=None, port=None, termflags=None, extras=None):
@@ -338,6 +885,43 @@ def update_env(node, modules=None, cflags=None, port=None, termflags=None, extra
         node.env.update(extras)
 
 
+def build_env(board, modules=None, cflags=None, extras=None):
+    """
+    Environment variables `update_env()` sets that influence the build of a
+    firmware for `board`
+    """
+    node = types.SimpleNamespace(env={'BOARD': board})
+    update_env(node, modules, cflags, extras=extras)
+    return node.env
+
+
+def flash(node, firmware, log_nodes, cache=None):
+    """
+    Flash `firmware` to `node`. If a build `cache` is given, `firmware` is only
+    built if it is not in the cache yet.
+    """
+    if "BINFILE" in node.env or cache is None:
+        _make_flash(node, "flash-only" if "BINFILE" in node.env else "flash", log_nodes)
+        return
+    node.env["BINDIR"] = cache.bindir(firmware)
+    with cache.lock(firmware):
+        if cache.lookup(firmware) is None:
+            _make_flash(node, "flash", log_nodes)
+            # build succeeded, so keep it for later
+            cache.add(firmware)
+            return
+    _make_flash(node, "flash-only", log_nodes)
+
+
+def _make_flash(node, flash_cmd, log_nodes):
+    node.make_run(
+        [flash_cmd],
+        check=True,
+        stdout=None if log_nodes else subprocess.DEVNULL,
+        stderr=None if log_nodes else subprocess.DEVNULL,
+    )
+
+
 @pytest.fixture
 def riot_ctrl(log_nodes, log_file_fmt, nodes, riotbase, request):
     """
@@ -382,15 +966,10 @@ def riot_ctrl(log_nodes, log_file_fmt, nodes, riotbase, request):
         # need to access private member here isn't possible otherwise sadly :(
         # pylint: disable=W0212
         node._application_directory = os.path.join(riotbase, application_dir)
-        flash_cmd = "flash"
-        if "BINFILE" in node.env:
-            flash_cmd = "flash-only"
-        node.make_run(
-            [flash_cmd],
-            check=True,
-            stdout=None if log_nodes else subprocess.DEVNULL,
-            stderr=None if log_nodes else subprocess.DEVNULL,
+        firmware = testutils.build.Firmware.create(
+            application_dir, build_env(node.board(), modules, cflags, extras)
         )
+        flash(node, firmware, log_nodes, request.config.stash.get(BUILD_CACHE, None))
         if node.env.get("IOTLAB_NODE"):
             # reset to prevent at86rf2xx `ifconfig` issue
             time.sleep(1)
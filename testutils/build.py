@@ -0,0 +1,349 @@
+"""
+Helpers to build RIOT applications ahead of flashing them
+"""
+
+import ast
+import collections
+import functools
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from testutils.git import Git, GitError
+from testutils.lease import file_lock
+
+logger = logging.getLogger(__name__)
+
+MAKE = os.environ.get("MAKE", "make")
+RIOT_CTRL_FIXTURE = "riot_ctrl"
+# argument names of the factory provided by the `riot_ctrl` fixture, in order
+RIOT_CTRL_ARGS = (
+    "nodes_idx",
+    "application_dir",
+    "shell_interaction_cls",
+    "board_type",
+    "modules",
+    "cflags",
+    "port",
+    "termflags",
+    "extras",
+)
+
+
+class Firmware(collections.namedtuple("Firmware", ["application_dir", "env"])):
+    """A firmware image, identified by the application it is built from and
+    the environment variables that influence its build"""
+
+    __slots__ = ()
+
+    @classmethod
+    def create(cls, application_dir, env):
+        return cls(application_dir, tuple(sorted(env.items())))
+
+    @property
+    def board(self):
+        """
+        >>> Firmware.create("foo", {"QUIETER": "1", "BOARD": "native"}).board
+        'native'
+        """
+        return dict(self.env).get("BOARD")
+
+    @property
+    def key(self):
+        """
+        >>> Firmware.create("foo", {"BOARD": "native"}).key[:16]
+        'b8844a7e7def8440'
+        """
+        return hashlib.sha256(repr(tuple(self)).encode()).hexdigest()
+
+
+def riot_revision(riotbase):
+    """
+    Get the revision of the RIOT checkout at `riotbase`. If the checkout has
+    uncommitted changes, a hash of those changes is appended.
+
+    :return: The revision as a string or None if `riotbase` is not a git
+             repository
+    """
+    git = Git(riotbase)
+    try:
+        revision = git.head_sha
+        diff = git.diff("HEAD")
+    except GitError as exc:
+        logger.error(exc)
+        return None
+    if diff.strip():
+        revision += "-" + hashlib.sha256(diff.encode()).hexdigest()[:12]
+    return revision
+
+
+class BuildCache:
+    """Content-addressed cache of firmware builds. Each entry is a BINDIR,
+    keyed by the RIOT revision and the Firmware built into it. If `max_size`
+    (in bytes) is given, least recently used entries are evicted on `evict()`
+    until the cache fits."""
+
+    COMPLETE_FILE = ".complete"
+
+    def __init__(self, cachedir, revision, max_size=None):
+        self.cachedir = str(cachedir)
+        self.revision = revision
+        self.max_size = max_size
+
+    def __repr__(self):
+        return f"<{type(self).__name__}: {self.cachedir}>"
+
+    def key(self, firmware):
+        return hashlib.sha256(f"{self.revision}-{firmware.key}".encode()).hexdigest()
+
+    def bindir(self, firmware):
+        return os.path.join(self.cachedir, self.key(firmware))
+
+    def lock(self, firmware):
+        """Context manager to hold while building `firmware` into the cache,
+        as the cache may be shared between processes"""
+        os.makedirs(self.cachedir, exist_ok=True)
+        return file_lock(f"{self.bindir(firmware)}.lock")
+
+    def lookup(self, firmware):
+        """
+        :return: The BINDIR of `firmware` if it was completely built before,
+                 None otherwise
+        """
+        bindir = self.bindir(firmware)
+        complete_file = os.path.join(bindir, self.COMPLETE_FILE)
+        if not os.path.exists(complete_file):
+            return None
+        # update access time for LRU eviction
+        os.utime(complete_file)
+        return bindir
+
+    def add(self, firmware):
+        """Mark the BINDIR of `firmware` as completely built"""
+        bindir = self.bindir(firmware)
+        os.makedirs(bindir, exist_ok=True)
+        with open(
+            os.path.join(bindir, self.COMPLETE_FILE), "w", encoding="utf-8"
+        ) as complete_file:
+            complete_file.write(f"{firmware.application_dir}\n")
+        return bindir
+
+    @staticmethod
+    def _size(path):
+        size = 0
+        for root, _, files in os.walk(path):
+            for file in files:
+                try:
+                    size += os.path.getsize(os.path.join(root, file))
+                except OSError:
+                    # broken symlinks et al.
+                    pass
+        return size
+
+    def _entries(self):
+        """Cache entries sorted from least to most recently used"""
+        if not os.path.isdir(self.cachedir):
+            return []
+        entries = []
+        for entry in os.listdir(self.cachedir):
+            path = os.path.join(self.cachedir, entry)
+            if not os.path.isdir(path):
+                continue
+            complete_file = os.path.join(path, self.COMPLETE_FILE)
+            # incomplete entries are the first to go
+            last_used = (
+                os.path.getmtime(complete_file) if os.path.exists(complete_file) else 0
+            )
+            entries.append((last_used, path))
+        entries.sort()
+        return [path for _, path in entries]
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache is smaller than
+        `max_size`
+
+        :return: List of removed BINDIRs
+        """
+        removed = []
+        if self.max_size is None:
+            return removed
+        entries = [(path, self._size(path)) for path in self._entries()]
+        size = sum(entry_size for _, entry_size in entries)
+        for path, entry_size in entries:
+            if size <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            size -= entry_size
+            removed.append(path)
+        if removed:
+            logger.info(f"Evicted {len(removed)} firmwares from {self}")
+        return removed
+
+
+class _UnresolvableError(Exception):
+    pass
+
+
+@functools.lru_cache(maxsize=None)
+def _module_functions(filename):
+    with open(filename, encoding="utf-8") as module_file:
+        tree = ast.parse(module_file.read(), filename=filename)
+    return {
+        node.name: node
+        for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+    }
+
+
+def _resolve(node, module):
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        if isinstance(node, ast.Name) and hasattr(module, node.id):
+            value = getattr(module, node.id)
+            if isinstance(value, (str, int, list, tuple, dict)):
+                return value
+    raise _UnresolvableError(ast.dump(node))
+
+
+def _riot_ctrl_calls(func_def, module):
+    """Yield the arguments of all calls to the `riot_ctrl` factory in
+    `func_def` that can be resolved without running the test"""
+    for node in ast.walk(func_def):
+        if (
+            not isinstance(node, ast.Call)
+            or not isinstance(node.func, ast.Name)
+            or node.func.id != RIOT_CTRL_FIXTURE
+        ):
+            continue
+        try:
+            args = {
+                name: _resolve(arg, module)
+                for name, arg in zip(RIOT_CTRL_ARGS, node.args)
+                if name != "shell_interaction_cls"
+            }
+            args.update(
+                {
+                    kw.arg: _resolve(kw.value, module)
+                    for kw in node.keywords
+                    if kw.arg in RIOT_CTRL_ARGS and kw.arg != "shell_interaction_cls"
+                }
+            )
+        except _UnresolvableError as exc:
+            logger.debug(f"Can not plan build for {ast.dump(node)}: {exc}")
+            continue
+        yield args
+
+
+def item_firmwares(item, boards, build_env):
+    """
+    Get the firmwares a collected test item will request from the `riot_ctrl`
+    fixture.
+
+    :param item: A collected pytest item
+    :param boards: The boards of the `nodes` fixture for the item
+    :param build_env: Function that takes BOARD, modules, CFLAGS and extras
+                      and returns the environment the firmware is built with
+    :return: Set of Firmware objects
+    """
+    res = set()
+    module = getattr(item, "module", None)
+    if module is None or not getattr(module, "__file__", None) or not boards:
+        return res
+    functions = _module_functions(module.__file__)
+    func_names = [getattr(item, "originalname", item.name)]
+    func_names.extend(getattr(item, "fixturenames", ()))
+    for func_name in func_names:
+        if func_name not in functions:
+            continue
+        for args in _riot_ctrl_calls(functions[func_name], module):
+            if "BINFILE" in (args.get("extras") or {}):
+                # pre-built by other means, so nothing to build
+                continue
+            if args.get("board_type") is not None:
+                board = args["board_type"]
+            else:
+                try:
+                    board = boards[args["nodes_idx"]]
+                except (KeyError, IndexError, TypeError):
+                    continue
+            res.add(
+                Firmware.create(
+                    args["application_dir"],
+                    build_env(
+                        board,
+                        modules=args.get("modules"),
+                        cflags=args.get("cflags"),
+                        extras=args.get("extras"),
+                    ),
+                )
+            )
+    return res
+
+
+def build(firmware, riotbase, bindir):
+    """
+    Build `firmware` into `bindir`
+
+    :return: Tuple of the firmware and the return code of `make`
+    """
+    env = os.environ.copy()
+    env.update(firmware.env)
+    env["BINDIR"] = bindir
+    cmd = [
+        MAKE,
+        "--no-print-directory",
+        "-C",
+        os.path.join(riotbase, firmware.application_dir),
+        "all",
+    ]
+    res = subprocess.run(
+        cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=False
+    )
+    if res.returncode:
+        logger.warning(
+            f"Unable to pre-build {firmware.application_dir} for "
+            f"{firmware.board}:\n{res.stderr.decode(errors='replace')}"
+        )
+    return firmware, res.returncode
+
+
+def _cached_build(firmware, riotbase, cache):
+    with cache.lock(firmware):
+        # check again as other processes might have built it in the meantime
+        if cache.lookup(firmware) is not None:
+            return firmware, 0
+        firmware, returncode = build(firmware, riotbase, cache.bindir(firmware))
+        if returncode == 0:
+            cache.add(firmware)
+    return firmware, returncode
+
+
+def prebuild(firmwares, riotbase, cache, jobs=None):
+    """
+    Build all `firmwares` that are not in `cache` yet concurrently, each into
+    its own BINDIR within `cache`
+
+    :param jobs: Number of concurrent builds. Defaults to the number of CPUs.
+    :return: Set of successfully built Firmware objects
+    """
+    res = set()
+    firmwares = [f for f in firmwares if cache.lookup(f) is None]
+    if not firmwares:
+        return res
+    logger.info(f"Pre-building {len(firmwares)} firmwares")
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        futures = [
+            executor.submit(_cached_build, firmware, riotbase, cache)
+            for firmware in firmwares
+        ]
+        for future in as_completed(futures):
+            firmware, returncode = future.result()
+            if returncode == 0:
+                res.add(firmware)
+    return res
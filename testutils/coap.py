@@ -0,0 +1,104 @@
+"""
+Helpers for CoAP tests with aiocoap
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import math
+import time
+
+import aiocoap
+
+# block sizes from 16 to 1024 bytes in steps of 16 bytes
+BLOCK_SIZES = range(16, 1024 + 1, 16)
+
+# result of the exchange currently running in an asyncio task
+_exchange = contextvars.ContextVar("exchange", default=None)
+
+
+class _RetransmissionCounter(logging.Handler):
+    """Counts the retransmissions logged by aiocoap for the exchange of the
+    asyncio task they are scheduled in"""
+
+    def emit(self, record):
+        exchange = _exchange.get()
+        if exchange is not None and record.getMessage().startswith("Retransmission"):
+            exchange["retransmissions"] += 1
+
+
+@contextlib.asynccontextmanager
+async def client_context(settle_time=2):
+    """
+    Creates an aiocoap client context and shuts it down when leaving the
+    context.
+
+    :param settle_time: Time in seconds to wait before the context is used
+    """
+    context = await aiocoap.Context.create_client_context()
+    counter = _RetransmissionCounter()
+    level = context.log.level
+    context.log.addHandler(counter)
+    # retransmissions are logged with INFO
+    if not context.log.isEnabledFor(logging.INFO):
+        context.log.setLevel(logging.INFO)
+    try:
+        await asyncio.sleep(settle_time)
+        yield context
+    finally:
+        context.log.removeHandler(counter)
+        context.log.setLevel(level)
+        await context.shutdown()
+
+
+def block_exp(block_size):
+    """
+    Block size exponent (SZX) of `block_size`
+
+    >>> block_exp(16), block_exp(1024)
+    (0, 6)
+    """
+    return round(math.log(block_size, 2)) - 4
+
+
+async def block_sweep(context, make_request, block_sizes=BLOCK_SIZES, concurrency=1):
+    """
+    Sends a request for each block size using `context`, with at most
+    `concurrency` requests at a time. Note that aiocoap only has one
+    confirmable message in flight per remote endpoint, so retransmissions are
+    only attributed exactly to their request with a `concurrency` of 1.
+
+    :param make_request: Function that takes a block size and returns the
+                         aiocoap.Message to send
+    :return: List of dicts, one per block size in the order of `block_sizes`,
+             with the "block_size", the "response", its "latency" in seconds,
+             and the number of "retransmissions"
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def exchange(block_size):
+        async with semaphore:
+            res = {"block_size": block_size, "retransmissions": 0}
+            # gather() runs each exchange in its own task, so this only
+            # applies to this exchange
+            _exchange.set(res)
+            start = time.monotonic()
+            res["response"] = await context.request(make_request(block_size)).response
+            res["latency"] = time.monotonic() - start
+            return res
+
+    return list(await asyncio.gather(*(exchange(size) for size in block_sizes)))
+
+
+def run_block_sweep(make_request, block_sizes=BLOCK_SIZES, concurrency=1, **kwargs):
+    """
+    Runs `block_sweep()` with a new client context, see `client_context()` for
+    `kwargs`
+    """
+
+    async def sweep():
+        async with client_context(**kwargs) as context:
+            return await block_sweep(context, make_request, block_sizes, concurrency)
+
+    return asyncio.get_event_loop().run_until_complete(sweep())
@@ -29,8 +29,24 @@ class Git:
         return os.path.isdir(self._root)
 
     def staging_changed(self):
-        output = self.diff('--cached')
-        return output.strip() != ''
+        # only checks the exit code instead of generating the whole diff
+        return not self.succeeds('diff', '--cached', '--quiet')
+
+    def succeeds(self, subcmd, *args):
+        """
+        Runs a git command that reports its result in its exit code, e.g.
+        `git diff --quiet`
+
+        :return: True if the command exited with 0, False if it exited with 1
+        :raises GitError: If the command failed otherwise
+        """
+        cmd = ['git', '-C', self._root, subcmd]
+        cmd.extend(args)
+        stderr = subprocess.DEVNULL if self._quiet else None
+        returncode = subprocess.call(cmd, stdout=subprocess.DEVNULL, stderr=stderr)
+        if returncode not in (0, 1):
+            raise GitError(returncode, cmd)
+        return returncode == 0
 
     def cmd(self, subcmd, *args):
         cmd = ['git', '-C', self._root, subcmd]
@@ -63,6 +79,22 @@ class Git:
     def commit(self, *args):
         return self.cmd('commit', *args)
 
+    def commit_files(self, files, message):
+        """
+        Stages `files` and commits them with `message` in one commit, with
+        one git call per step instead of one per file
+
+        :param files: Paths relative to the repository
+        :return: True if a commit was made, False if nothing changed
+        """
+        files = list(files)
+        if files:
+            self.add('--', *files)
+        if not self.staging_changed():
+            return False
+        self.commit('--quiet', '-m', message)
+        return True
+
     def log(self, *args):
         return self.cmd('log', *args)
 
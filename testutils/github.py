@@ -1,14 +1,39 @@
+# pylint: disable=too-many-lines
+
+import base64
+import binascii
+import functools
+import gzip
+import html
+import io
+import json
 import logging
 import os
+import queue
 import re
+import threading
+import time
 import urllib.parse
+import zlib
 
 from bs4 import BeautifulSoup
-from github import Auth, Github, GithubException, InputFileContent
+from github import (
+    Auth,
+    Github,
+    GithubException,
+    InputFileContent,
+    RateLimitExceededException,
+)
 
 from testutils.git import Git, GitError
 
 STICKY_COMMENT_COMMENT = "<!-- release-specs results {user} -->"
+STICKY_COMMENT_PATTERN = STICKY_COMMENT_COMMENT.format(user=r"(?P<user>\S+)")
+# hidden block with the results shown in the sticky comment
+RESULTS_COMMENT_FMT = "<!-- release-specs-results:{results} -->"
+RESULTS_COMMENT_PATTERN = RESULTS_COMMENT_FMT.format(
+    results="(?P<results>[A-Za-z0-9+/=]*)"
+)
 GIST_ID_COMMENT_FMT = "<!-- gist-id:{gist_id} -->"
 GIST_ID_COMMENT_PATTERN = GIST_ID_COMMENT_FMT.format(gist_id="(?P<gist_id>[0-9a-f]+)")
 GIT_QUIET = True
@@ -22,6 +47,20 @@ OUTCOME_EMOJIS = {
     "skipped": "🟡",
     "rerun": "🔁",
 }
+# retries of a GitHub API call that hit the rate limit
+RATE_LIMIT_RETRIES = 5
+# initial wait in seconds between those retries, doubled after each retry
+RATE_LIMIT_BACKOFF = 2
+# maximum wait in seconds between those retries
+RATE_LIMIT_MAX_WAIT = 120
+# sections of a result file larger than this many characters are cut down to
+# their head and tail, the full output is kept in a gzip-compressed log next to
+# the result file
+RESULT_SECTION_MAX_SIZE = 64 * 1024
+RESULT_SECTION_HEAD_SIZE = 16 * 1024
+RESULT_SECTION_TAIL_SIZE = 16 * 1024
+# reports waiting for the ReportWorker before the test session has to wait
+REPORT_QUEUE_SIZE = 1000
 
 
 logger = logging.getLogger(__name__)
@@ -32,20 +71,41 @@ task_comp = re.compile(
     r"- \[(?P<done>\s|x)\] "
     r"\[(?P<name>Task #(?P<task>\d{2})[^\]]*)\]\((?P<url>[^)]+)\)"
 )
+rc_comp = re.compile(r"tag:\s(?P<release>\d{4}.\d{2})-(?P<candidate>RC\d+)")
+
 
+@functools.lru_cache(maxsize=None)
+def _head_log(riotbase):
+    # HEAD does not change during a test session, so only ask git once
+    return Git(riotbase).log("-1", "--oneline", "--decorate")
 
-def get_rc():
+
+def release_candidate(riotbase, refresh=False):
+    """
+    Get the release candidate checked out at `riotbase`. The result is cached,
+    use `refresh` to look it up again.
+
+    :return: dict with the "release" and the "candidate" or None if HEAD is
+             not a release candidate
+    :raises GitError: if `riotbase` can not be inspected with git
+    """
+    if refresh:
+        _head_log.cache_clear()
+    m = rc_comp.search(_head_log(riotbase))
+    return m.groupdict() if m is not None else None
+
+
+def get_rc(refresh=False):
     try:
-        output = Git(os.environ["RIOTBASE"]).log("-1", "--oneline", "--decorate")
+        rc = release_candidate(os.environ["RIOTBASE"], refresh=refresh)
     except GitError as exc:
         logger.error(exc)
         return None
-    m = re.search(r"tag:\s(?P<release>\d{4}.\d{2})-(?P<candidate>RC\d+)", output)
-    if m is None:
+    if rc is None:
+        output = _head_log(os.environ["RIOTBASE"])
         logger.warning("Not a release candidate")
         logger.warning(f"  {output}")
-        return None
-    return m.groupdict()
+    return rc
 
 
 def get_task(nodeid):
@@ -60,7 +120,9 @@ def get_task(nodeid):
     return {k: int(v) if k != 'params' else v for k, v in m.groupdict().items()}
 
 
+@functools.lru_cache(maxsize=None)
 def get_user_name(github):
+    # fetching the authenticated user costs an API request every time
     return github.get_user().login
 
 
@@ -90,14 +152,62 @@ def get_repo(github):
         return None
 
 
+def _rate_limit_wait(exc, backoff):
+    """
+    Seconds to wait before retrying after `exc`. GitHub tells us via the
+    response headers for how long, otherwise `backoff` is used.
+
+    >>> _rate_limit_wait(RateLimitExceededException(403, headers={}), 4)
+    4
+    >>> _rate_limit_wait(
+    ...     RateLimitExceededException(429, headers={"retry-after": "30"}), 4
+    ... )
+    30.0
+    """
+    headers = exc.headers or {}
+    if "retry-after" in headers:
+        wait = float(headers["retry-after"])
+    elif headers.get("x-ratelimit-remaining") == "0" and "x-ratelimit-reset" in headers:
+        wait = max(float(headers["x-ratelimit-reset"]) - time.time(), 0) + 1
+    else:
+        wait = backoff
+    return min(wait, RATE_LIMIT_MAX_WAIT)
+
+
+def retry_rate_limited(func, *args, **kwargs):
+    """
+    Call `func` and retry it with exponential backoff as long as it exceeds
+    the GitHub rate limit, up to `RATE_LIMIT_RETRIES` times.
+    """
+    backoff = RATE_LIMIT_BACKOFF
+    for retry in range(RATE_LIMIT_RETRIES + 1):
+        try:
+            return func(*args, **kwargs)
+        except RateLimitExceededException as exc:
+            if retry == RATE_LIMIT_RETRIES:
+                raise
+            wait = _rate_limit_wait(exc, backoff)
+            logger.warning(f"GitHub rate limit exceeded, retrying in {wait:.0f}s")
+            time.sleep(wait)
+            backoff *= 2
+    return None  # pragma: no cover
+
+
+def find_rc_tracking_issue(repo, rc):
+    """
+    :return: The open tracking issue of `rc` in `repo` or None
+    """
+    for issue in repo.get_issues(state="open"):
+        # pylint: disable=C0209
+        if issue.title == "Release {release} - {candidate}".format(**rc):
+            return issue
+    return None
+
+
 def get_rc_tracking_issue(repo, rc):
     issue = None
     try:
-        for i in repo.get_issues(state="open"):
-            # pylint: disable=C0209
-            if i.title == "Release {release} - {candidate}".format(**rc):
-                issue = i
-                break
+        issue = find_rc_tracking_issue(repo, rc)
         if issue is None:
             # pylint: disable=C0209
             logger.error(
@@ -108,7 +218,7 @@ def get_rc_tracking_issue(repo, rc):
     return issue
 
 
-def mark_task_done(user, comment_url, issue, task_line, tested_task):
+def _done_task_line(user, comment_url, task_line):
     new_task_line = task_line.replace("- [ ]", "- [x]")
     # trailing whitespace in case something was added after in the meantime
     if new_task_line != task_line:
@@ -116,6 +226,11 @@ def mark_task_done(user, comment_url, issue, task_line, tested_task):
             new_task_line += f" @{user} (see {comment_url}) "
         else:
             new_task_line += f" @{user} "
+    return new_task_line
+
+
+def mark_task_done(user, comment_url, issue, task_line, tested_task):
+    new_task_line = _done_task_line(user, comment_url, task_line)
     try:
         issue.update()  # reload body in case something changed
         new_body = issue.body.replace(task_line, new_task_line)
@@ -128,39 +243,110 @@ def mark_task_done(user, comment_url, issue, task_line, tested_task):
         )
 
 
-def find_task_text(issue_body, tested_task):
-    spec = None
-    for line in issue_body.splitlines():
-        m = spec_comp.search(line)
+def task_params(params):
+    """
+    >>> task_params("nodes0-foo--bar")
+    'foo-bar'
+    >>> task_params("nodes0") is None
+    True
+    """
+    # remove 'nodes0' param which is used for fixture
+    params = re.sub(r'nodes\d+', '', params)
+    # deduplicate dashes
+    params = re.sub(r'--+', '-', params)
+    params = params.strip('-')
+    # only use if there is anything left of params
+    return params or None
+
+
+class TaskIndex:
+    """Index of the tasks in the body of a tracking issue, built in one pass
+    over the body. Maps each (spec, task) to the span of its line in the
+    body."""
+
+    def __init__(self, body):
+        self.body = body
+        # (spec, task) -> (start, end, spec, task match)
+        self._tasks = {}
+        spec = None
+        start = 0
+        for line in body.splitlines(keepends=True):
+            end = start + len(line.splitlines()[0])
+            self._index_line(body[start:end], start, end, spec)
+            m = spec_comp.search(body[start:end])
+            if m is not None:
+                spec = m.groupdict()
+                spec["spec"] = int(spec["spec"])
+                spec["done"] = spec["done"] == "x"
+            start += len(line)
+
+    def _index_line(self, line, start, end, spec):
+        if not spec or spec_comp.search(line) is not None:
+            return
+        m = task_comp.search(line)
         if m is not None:
-            spec = m.groupdict()
-            spec["spec"] = int(spec["spec"])
-            spec["done"] = spec["done"] == "x"
-            continue
-        if spec:
-            m = task_comp.search(line)
-            if (
-                m is not None
-                and spec["spec"] == tested_task["spec"]
-                and int(m.group("task")) == tested_task["task"]
-            ):
-                task = m.groupdict()
-                task["spec"] = spec
-                task["name"] = re.sub(r"#(\d+)", r"\1", task["name"])
-                task["task"] = int(task["task"])
-                task["done"] = task["done"] == "x"
-                if tested_task.get("params") is not None:
-                    params = tested_task["params"]
-                    # remove 'nodes0' param which is used for fixture
-                    params = re.sub(r'nodes\d+', '', params)
-                    # deduplicate dashes
-                    params = re.sub(r'--+', '-', params)
-                    params = params.strip('-')
-                    if params:  # only add if there is anything left of params
-                        task["params"] = params
-                task_line = line
-                return task_line, task
-    return None, None
+            # only the first line of a task counts
+            self._tasks.setdefault(
+                (spec["spec"], int(m.group("task"))), (start, end, spec, m.groupdict())
+            )
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def find(self, tested_task):
+        """
+        :return: The line of `tested_task` and the parsed task as a tuple,
+                 (None, None) if `tested_task` is not in the tracking issue
+        """
+        entry = self._tasks.get((tested_task["spec"], tested_task["task"]))
+        if entry is None:
+            return None, None
+        start, end, spec, task = entry
+        task = dict(task)
+        task["spec"] = dict(spec)
+        task["name"] = re.sub(r"#(\d+)", r"\1", task["name"])
+        task["task"] = int(task["task"])
+        task["done"] = task["done"] == "x"
+        if tested_task.get("params") is not None:
+            params = task_params(tested_task["params"])
+            if params:
+                task["params"] = params
+        return self.body[start:end], task
+
+    def mark_done(self, tested_tasks, user, comment_url=None):
+        """
+        Marks all `tested_tasks` that are not done yet done
+
+        :return: The new body
+        """
+        spans = sorted(
+            {
+                self._tasks[key][:2]
+                for key in ((t["spec"], t["task"]) for t in tested_tasks)
+                if key in self._tasks and self._tasks[key][3]["done"] != "x"
+            }
+        )
+        body = []
+        last = 0
+        for start, end in spans:
+            body.append(self.body[last:start])
+            body.append(_done_task_line(user, comment_url, self.body[start:end]))
+            last = end
+        body.append(self.body[last:])
+        return "".join(body)
+
+
+@functools.lru_cache(maxsize=4)
+def task_index(issue_body):
+    """
+    :return: The TaskIndex of `issue_body`, only built once per revision of
+             the body
+    """
+    return TaskIndex(issue_body)
+
+
+def find_task_text(issue_body, tested_task):
+    return task_index(issue_body).find(tested_task)
 
 
 def find_previous_comment(github, issue):
@@ -171,125 +357,265 @@ def find_previous_comment(github, issue):
     return None
 
 
-def create_comment(github, issue):
-    run_url = None
+def _run_url():
     if (
         "GITHUB_RUN_ID" in os.environ
         and "GITHUB_REPOSITORY" in os.environ
         and "GITHUB_SERVER_URL" in os.environ
     ):
         # pylint: disable=C0209
-        run_url = (
+        return (
             "{GITHUB_SERVER_URL}/{GITHUB_REPOSITORY}/actions/runs/"
             "{GITHUB_RUN_ID}".format(**os.environ)
         )
+    return None
 
-    # pylint: disable=C0209
-    body = "<h1>{a_open}Test Report{a_close}</h1>\n\n".format(
-        a_open='<a href="{}">'.format(run_url) if run_url else '',
-        a_close='</a>' if run_url else '',
+
+def _new_comment_body(github):
+    return render_comment(
+        {"user": get_user_name(github), "run_url": _run_url(), "tasks": {}}
     )
-    body += STICKY_COMMENT_COMMENT.format(user=get_user_name(github))
-    body += """
-<table>
-  <thead>
-    <tr><th></th><th>Task</th><th>Outcome</th></tr>
-  </thead>
-  <tbody>
-  </tbody>
-</table>
-"""
+
+
+def create_comment(github, issue):
     try:
-        return issue.create_comment(body)
+        return issue.create_comment(_new_comment_body(github))
     except GithubException as e:
         logger.error(f"Unable to comment: {e}")
         return None
 
 
-def _generate_outcome_summary(pytest_report, task):
-    # pylint: disable=C0209
-    return "<strong>{a_open}{outcome}{a_close}</strong>".format(
-        a_open=(
-            '<a href="{}">'.format(task["outcome_url"]) if "outcome_url" in task else ''
-        ),
-        outcome=pytest_report.outcome.upper(),
-        a_close='</a>' if "outcome_url" in task else '',
-    )
+class GithubCache:
+    """Caches the GitHub objects reporting needs for the whole session, so
+    they are only looked up once. `refresh()` fetches a cached object again
+    with a conditional request on its ETag, which is cheap and does not count
+    against the rate limit if the object did not change."""
 
+    def __init__(self, github):
+        self.github = github
+        self._objects = {}
+        self._lock = threading.RLock()
 
-def get_tasks(comment, tbody, task):
-    tasks = []
-    task_already_exists = False
-    for row in tbody.children:
-        if row.name != 'tr':
-            continue
-        cells = list(row.find_all('td'))
-        try:
-            emoji = cells[0].decode_contents()
-            task_cell = cells[1].find_all('a')[0]
-            outcome = BeautifulSoup(
-                ' '.join(str(t).strip() for t in cells[2].contents), 'html.parser'
-            )
-        except IndexError:
+    def __repr__(self):
+        return f"<{type(self).__name__}: {len(self._objects)} objects>"
+
+    def _get(self, key, lookup, *args):
+        with self._lock:
+            if self._objects.get(key) is None:
+                self._objects[key] = retry_rate_limited(lookup, *args)
+            return self._objects[key]
+
+    @property
+    def user(self):
+        return self._get("user", get_user_name, self.github)
+
+    @property
+    def repo(self):
+        return self._get("repo", self.github.get_repo, REPO_NAME)
+
+    def tracking_issue(self, rc):
+        """
+        :return: The tracking issue of `rc` or None if there is none
+        """
+        return self._get(
+            ("issue", rc["release"], rc["candidate"]),
+            find_rc_tracking_issue,
+            self.repo,
+            rc,
+        )
+
+    def sticky_comment(self, issue):
+        """
+        :return: The sticky comment of the user in `issue`, which is created
+                 if it does not exist yet
+        """
+
+        def lookup():
+            comment = find_previous_comment(self.github, issue)
+            if comment is None:
+                comment = issue.create_comment(_new_comment_body(self.github))
+            return comment
+
+        return self._get(("comment", issue.url), lookup)
+
+    def refresh(self, obj):
+        """
+        Update `obj` from GitHub if it changed since it was fetched
+
+        :return: True if `obj` changed
+        """
+        with self._lock:
+            return retry_rate_limited(obj.update)
+
+
+@functools.lru_cache(maxsize=1)
+def get_github_cache():
+    """
+    :return: The GithubCache of the session or None if there is no access
+             token
+    """
+    github = get_github()
+    if not github:
+        return None
+    return GithubCache(github)
+
+
+def clear_caches():
+    """Forget the RC, the GitHub user, the GithubCache and the task indexes
+    of the session"""
+    _head_log.cache_clear()
+    get_user_name.cache_clear()
+    get_github_cache.cache_clear()
+    task_index.cache_clear()
+
+
+def _render_outcome(outcome, outcome_url=None):
+    """
+    >>> _render_outcome("passed")
+    '<strong>PASSED</strong>'
+    >>> _render_outcome("failed", "https://example.org/log")
+    '<strong><a href="https://example.org/log">FAILED</a></strong>'
+    """
+    if outcome_url:
+        return (
+            f'<strong><a href="{html.escape(outcome_url)}">'
+            f'{html.escape(outcome.upper())}</a></strong>'
+        )
+    return f'<strong>{html.escape(outcome.upper())}</strong>'
+
+
+def _dump_results(results):
+    """
+    Encodes `results` for the hidden results block of the sticky comment.
+    Compressed, as GitHub limits the size of comments.
+
+    >>> _load_results(RESULTS_COMMENT_FMT.format(results=_dump_results({"a": 1})))
+    {'a': 1}
+    """
+    return base64.b64encode(
+        zlib.compress(
+            json.dumps(results, sort_keys=True, separators=(",", ":")).encode()
+        )
+    ).decode()
+
+
+def _load_results(body):
+    m = re.search(RESULTS_COMMENT_PATTERN, body)
+    if m is None:
+        return None
+    try:
+        return json.loads(zlib.decompress(base64.b64decode(m.group("results"))))
+    except (binascii.Error, zlib.error, ValueError) as exc:
+        logger.warning(f"Unable to decode results block: {exc}")
+        return None
+
+
+def _parse_legacy_comment(comment):
+    """
+    Parses the results out of the table of a sticky comment that was written
+    before the comment had a results block
+    """
+    soup = BeautifulSoup(comment.body, "html.parser")
+    tbody = soup.find('tbody')
+    if tbody is None:
+        logger.error("Unable to find table body in %s:\n%s", comment, comment.body)
+        return None
+    results = {"tasks": {}}
+    m = re.search(STICKY_COMMENT_PATTERN, comment.body)
+    if m is not None:
+        results["user"] = m.group("user")
+    m = re.search(GIST_ID_COMMENT_PATTERN, comment.body)
+    if m is not None:
+        results["gist_id"] = m.group("gist_id")
+    run_a = soup.select_one("h1 a[href]")
+    if run_a is not None:
+        results["run_url"] = run_a["href"]
+    for row in tbody.find_all('tr'):
+        cells = row.find_all('td')
+        task_a = cells[1].find('a', href=True) if len(cells) == 3 else None
+        if task_a is None:
             logger.error("Unexpected table format in %s:\n%s", comment, row)
             continue
-        task_title = task_cell.decode_contents().strip()
-        try:
-            task_url = task_cell['href']
-        except KeyError:
-            logger.error("Unexpected table format in %s:\n%s", comment, task_cell)
-            continue
-        if task_title == task["title"].strip():
-            task_already_exists = True
-            emoji = task["emoji"]
-            task_url = task["url"]
-            outcome = task["outcome"]
-        tasks.append((task_title, task_url, emoji, outcome))
-    if not task_already_exists:
-        tasks.append(
-            (task["title"].strip(), task["url"], task["emoji"], task["outcome"])
-        )
-    tasks.sort()
-    return tasks
+        outcome_a = cells[2].find('a', href=True)
+        results["tasks"][task_a.get_text().strip()] = {
+            "emoji": cells[0].get_text().strip(),
+            "url": task_a["href"],
+            "outcome": cells[2].get_text().strip().lower(),
+            "outcome_url": outcome_a["href"] if outcome_a is not None else None,
+        }
+    return results
 
 
-def _update_soup(soup, tbody, tasks):
-    if (
-        "GITHUB_RUN_ID" in os.environ
-        and "GITHUB_REPOSITORY" in os.environ
-        and "GITHUB_SERVER_URL" in os.environ
-    ):
-        title = soup.find("h1")
-        if title:
-            run_a = title.find("a")
-            # pylint: disable=C0209
-            url = (
-                "{GITHUB_SERVER_URL}/{GITHUB_REPOSITORY}/"
-                "actions/runs/{GITHUB_RUN_ID}".format(**os.environ)
-            )
-            if run_a:
-                run_a["href"] = url
-            else:
-                content = ' '.join(str(t).strip() for t in title.contents)
-                title.clear()
-                title.append(
-                    BeautifulSoup(f'<a href="{url}">' + content + '</a>', 'html.parser')
-                )
-    tbody.clear()
-    for task in tasks:
-        tr = soup.new_tag("tr")
-        tbody.append(tr)
-        emoji_td = soup.new_tag("td")
-        emoji_td.append(task[2])
-        tr.append(emoji_td)
-        task_td = soup.new_tag("td")
-        task_a = soup.new_tag("a", href=task[1])
-        task_a.string = task[0]
-        task_td.append(task_a)
-        tr.append(task_td)
-        outcome_td = soup.new_tag("td")
-        outcome_td.append(task[3])
-        tr.append(outcome_td)
+def comment_results(comment):
+    """
+    Gets the results of the sticky `comment`, from its results block or, for
+    comments without one, from its table
+
+    :return: dict with the "user", "run_url", "gist_id" and the "tasks" of
+             the comment, mapping the title of each task to its "emoji",
+             "url", "outcome" and "outcome_url". None if the comment can not
+             be parsed.
+    """
+    results = _load_results(comment.body)
+    if results is None:
+        results = _parse_legacy_comment(comment)
+    return results
+
+
+def render_comment(results):
+    # pylint: disable=C0301
+    """
+    Renders the body of the sticky comment from `results`, see
+    `comment_results()`. Tasks are sorted by their title.
+
+    >>> body = render_comment({"user": "user", "tasks": {"01. foo": {
+    ...     "emoji": "✔", "url": "https://example.org", "outcome": "passed"
+    ... }}})
+    >>> for line in body.splitlines():
+    ...     if "release-specs-results" not in line:
+    ...         print(line)
+    <h1>Test Report</h1>
+    <BLANKLINE>
+    <!-- release-specs results user -->
+    <table>
+      <thead>
+        <tr><th></th><th>Task</th><th>Outcome</th></tr>
+      </thead>
+      <tbody>
+        <tr><td>✔</td><td><a href="https://example.org">01. foo</a></td><td><strong>PASSED</strong></td></tr>
+      </tbody>
+    </table>
+    """  # noqa: E501
+    lines = []
+    if results.get("run_url"):
+        lines.append(
+            f'<h1><a href="{html.escape(results["run_url"])}">Test Report</a></h1>'
+        )
+    else:
+        lines.append("<h1>Test Report</h1>")
+    lines.append("")
+    if results.get("user"):
+        lines.append(STICKY_COMMENT_COMMENT.format(user=results["user"]))
+    if results.get("gist_id"):
+        lines.append(GIST_ID_COMMENT_FMT.format(gist_id=results["gist_id"]))
+    lines.append(RESULTS_COMMENT_FMT.format(results=_dump_results(results)))
+    lines.extend(
+        [
+            "<table>",
+            "  <thead>",
+            "    <tr><th></th><th>Task</th><th>Outcome</th></tr>",
+            "  </thead>",
+            "  <tbody>",
+        ]
+    )
+    for title, task in sorted(results["tasks"].items()):
+        lines.append(
+            f"    <tr><td>{html.escape(task['emoji'])}</td>"
+            f"<td><a href=\"{html.escape(task['url'])}\">{html.escape(title)}</a></td>"
+            f"<td>{_render_outcome(task['outcome'], task.get('outcome_url'))}</td></tr>"
+        )
+    lines.extend(["  </tbody>", "</table>", ""])
+    return "\n".join(lines)
 
 
 def _make_title(task):
@@ -305,32 +631,84 @@ def _make_title(task):
     return title
 
 
-def update_comment(pytest_report, comment, task):
-    soup = BeautifulSoup(comment.body, "html.parser")
-    if "gist_id" in task:
-        soup.insert(
-            0,
-            BeautifulSoup(
-                GIST_ID_COMMENT_FMT.format(gist_id=task["gist_id"]), "html.parser"
-            ),
-        )
+def merge_result(results, pytest_report, task):
+    """
+    Merge the result of `task` in `pytest_report` into the `results` of a
+    sticky comment
+    """
+    if task.get("gist_id"):
+        results["gist_id"] = task["gist_id"]
+    run_url = _run_url()
+    if run_url:
+        results["run_url"] = run_url
     task["title"] = _make_title(task)
-    task["outcome"] = BeautifulSoup(
-        _generate_outcome_summary(pytest_report, task), "html.parser"
-    )
-    task["emoji"] = OUTCOME_EMOJIS[pytest_report.outcome.lower()]
-    tbody = soup.find('tbody')
-    if tbody is None:
-        logger.error("Unable to find table body in %s:\n%s", comment, comment.body)
+    results["tasks"][task["title"]] = {
+        "emoji": OUTCOME_EMOJIS[pytest_report.outcome.lower()],
+        "url": task["url"],
+        "outcome": pytest_report.outcome.lower(),
+        "outcome_url": task.get("outcome_url"),
+    }
+
+
+def update_comment(pytest_report, comment, task):
+    results = comment_results(comment)
+    if results is None:
         return
-    _update_soup(soup, tbody, get_tasks(comment, tbody, task))
+    merge_result(results, pytest_report, task)
     try:
-        comment.edit(soup.prettify(formatter="html5"))
+        comment.edit(render_comment(results))
     except GithubException as e:
         logger.error(f"Unable to update comment: {e}")
 
 
+def _section_head_tail(
+    text, head_size=RESULT_SECTION_HEAD_SIZE, tail_size=RESULT_SECTION_TAIL_SIZE
+):
+    """
+    Cuts `text` down to its head and tail at line boundaries
+
+    :return: The head, the tail and the number of lines omitted in between
+
+    >>> _section_head_tail("a\\nb\\nc\\nd\\ne\\n", 4, 4)
+    ('a\\nb\\n', 'd\\ne\\n', 1)
+    """
+    head_end = text.rfind("\n", 0, head_size) + 1 or head_size
+    tail_start = len(text) - tail_size
+    newline = text.find("\n", tail_start - 1)
+    if newline >= 0:
+        tail_start = newline + 1
+    tail_start = max(head_end, tail_start)
+    return (
+        text[:head_end],
+        text[tail_start:],
+        text.count("\n", head_end, tail_start),
+    )
+
+
+def _outcome_sections(pytest_report):
+    if pytest_report.longrepr:
+        yield "Failures", str(pytest_report.longrepr)
+    for title, body in pytest_report.sections or []:
+        yield title, str(body)
+
+
+def _compressed_log(sections):
+    log = io.BytesIO()
+    # no timestamp, so an unchanged log does not change the upload
+    with gzip.GzipFile(fileobj=log, mode="wb", mtime=0) as log_file:
+        for title, body in sections:
+            log_file.write(f"## {title}\n\n{body}\n\n".encode())
+    return log.getvalue()
+
+
 def generate_outcome_content(pytest_report, task):
+    """
+    :return: dict of the result files of `task` with their content. The first
+             is the markdown result. If any section of the result is larger
+             than RESULT_SECTION_MAX_SIZE, it only has the head and the tail
+             of it and links a gzip-compressed log of the full output, which
+             is included as bytes.
+    """
     params = task.get('params')
     # pylint: disable=C0209
     filename = 'task_{spec:02d}.{task:02d}{params}_result.md'.format(
@@ -338,27 +716,34 @@ def generate_outcome_content(pytest_report, task):
         task=task['task'],
         params='.{}'.format(params) if params else '',
     )
-    content = ""
-    if pytest_report.outcome in ['passed', 'failed']:
-        content += f'# {task["spec"]["spec"]:02d}. {task["name"]} ['
-        if task.get('params'):
-            content += task['params'] + '] ['
-        content += pytest_report.outcome.upper()
-        content += ']\n'
-        if pytest_report.longrepr:
-            content += "## Failures\n\n"
-            content += "```\n"
-            content += str(pytest_report.longrepr)
-            content += "\n```\n\n"
-        if pytest_report.sections:
-            for title, body in pytest_report.sections:
-                content += f"## {title}\n\n"
-                content += "```\n"
-                content += str(body)
-                content += "\n```\n\n"
-    if content:
-        return {filename: content}
-    return {}
+    if pytest_report.outcome not in ['passed', 'failed']:
+        return {}
+    log_filename = f"{filename[:-len('.md')]}.log.gz"
+    content = [f'# {task["spec"]["spec"]:02d}. {task["name"]} [']
+    if task.get('params'):
+        content.append(task['params'] + '] [')
+    content.append(pytest_report.outcome.upper())
+    content.append(']\n')
+    sections = list(_outcome_sections(pytest_report))
+    for title, body in sections:
+        content.append(f"## {title}\n\n```\n")
+        if len(body) > RESULT_SECTION_MAX_SIZE:
+            head, tail, omitted = _section_head_tail(body)
+            content.extend(
+                [
+                    head,
+                    f"\n[... {omitted} lines omitted ...]\n\n",
+                    tail,
+                    "\n```\n\n",
+                    f"Full output in [{log_filename}]({log_filename})\n\n",
+                ]
+            )
+        else:
+            content.extend([body, "\n```\n\n"])
+    res = {filename: "".join(content)}
+    if any(len(body) > RESULT_SECTION_MAX_SIZE for _, body in sections):
+        res[log_filename] = _compressed_log(sections)
+    return res
 
 
 def gist_file_url(gist_url, filename, ref=''):
@@ -384,14 +769,20 @@ def upload_result_content(github, repo, repo_url, new_content):
             repo = Git.clone(
                 urllib.parse.urlunsplit(pull_url), repo.repodir, quiet=GIT_QUIET
             )
-        for filename in new_content:
-            with open(
-                os.path.join(repo.repodir, filename), 'w', encoding='utf-8'
-            ) as file:
-                file.write(new_content[filename])
-            repo.add(filename)
-            if repo.staging_changed():
-                repo.commit('-m', f'Add {filename}')
+        for filename, content in new_content.items():
+            if isinstance(content, bytes):
+                with open(os.path.join(repo.repodir, filename), 'wb') as file:
+                    file.write(content)
+            else:
+                with open(
+                    os.path.join(repo.repodir, filename), 'w', encoding='utf-8'
+                ) as file:
+                    file.write(content)
+        if len(new_content) == 1:
+            message = f'Add {list(new_content)[0]}'
+        else:
+            message = f'Add {len(new_content)} results'
+        repo.commit_files(new_content, message)
         repo.push()
         return repo.head_sha
     except GitError as exc:
@@ -419,7 +810,13 @@ def get_results_gist(comment, github, rc, tmpdir, content):
     try:
         gist = github_user.create_gist(
             public=False,
-            files={k: InputFileContent(content=content[k]) for k in content},
+            # the gist API only takes text files, binary files are pushed
+            # with the results
+            files={
+                k: InputFileContent(content=v)
+                for k, v in content.items()
+                if isinstance(v, str)
+            },
             description='Automated test results for RIOT '
             f'{rc["release"]}-{rc["candidate"]}',
         )
@@ -455,6 +852,62 @@ def upload_results(pytest_report, comment, task, github, rc, tmpdir):
             task['outcome_url'] = outcome_url
 
 
+class ResultUploader:
+    """Stages the result files of a session locally and uploads all of them
+    with one commit and one push on `upload()`. The clone of the results
+    repository is kept in `clonedir`, so a persistent `clonedir` only fetches
+    what changed since the last session."""
+
+    def __init__(self, clonedir):
+        self.clonedir = clonedir
+        self.content = {}
+        # (filename, task) of the staged results
+        self.tasks = []
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def stage(self, pytest_report, task):
+        content = generate_outcome_content(pytest_report, task)
+        if not content:
+            logger.info("No result content for %s", pytest_report)
+            return
+        self.content.update(content)
+        self.tasks.append((list(content.keys())[0], task))
+
+    def upload(self, comment, github, rc):
+        """
+        Uploads all staged results and sets the "outcome_url" of their tasks
+
+        :param comment: Sticky comment to find the results gist ID in
+        """
+        content, self.content = self.content, {}
+        tasks, self.tasks = self.tasks, []
+        if not content:
+            return
+        if "RESULT_OUTPUT_DIR" in os.environ and "RESULT_OUTPUT_URL" in os.environ:
+            repo = Git(os.environ['RESULT_OUTPUT_DIR'], quiet=GIT_QUIET)
+            repo_url = os.environ['RESULT_OUTPUT_URL']
+            url_func = github_file_url
+            gist_id = None
+        else:
+            repo, repo_url, gist_id = get_results_gist(
+                comment, github, rc, self.clonedir, content
+            )
+            if repo is None:
+                logger.info("No suitable repo for result upload")
+                return
+            url_func = gist_file_url
+        head = upload_result_content(github, repo, repo_url, content)
+        for filename, task in tasks:
+            if gist_id:
+                task['gist_id'] = gist_id
+            if head:
+                outcome_url = url_func(repo_url, filename, head)
+                if outcome_url:
+                    task['outcome_url'] = outcome_url
+
+
 def make_comment(pytest_report, issue, task, github, rc, tmpdir):
     # pylint: disable=too-many-arguments
     comment = find_previous_comment(github, issue)
@@ -466,11 +919,16 @@ def make_comment(pytest_report, issue, task, github, rc, tmpdir):
     return comment
 
 
+def _is_reported(pytest_report):
+    # setup is only reported if it skipped the test
+    return pytest_report.when == 'call' or (
+        pytest_report.when == 'setup' and pytest_report.outcome == 'skipped'
+    )
+
+
 # pylint: disable=R0911,R0912
 def update_issue(pytest_report, tmpdir):  # noqa: C901
-    if pytest_report.when not in ['call', 'setup'] or (
-        pytest_report.when == 'setup' and pytest_report.outcome != 'skipped'
-    ):
+    if not _is_reported(pytest_report):
         return
     tested_task = get_task(pytest_report.nodeid)
     if not tested_task:
@@ -514,3 +972,289 @@ def update_issue(pytest_report, tmpdir):  # noqa: C901
                 "Task {spec}.{task} is already marked done in the "
                 "tracking issue".format(**tested_task)
             )
+
+
+class _CommentDraft:
+    """Results of the sticky comment. Results are merged locally and only
+    written back to GitHub on `push()`."""
+
+    def __init__(self, comment):
+        self.comment = comment
+        self.results = comment_results(comment)
+        self.changed = False
+
+    def __str__(self):
+        return str(self.comment)
+
+    @property
+    def body(self):
+        if self.results is None:
+            return self.comment.body
+        return render_comment(self.results)
+
+    @property
+    def html_url(self):
+        return self.comment.html_url
+
+    def update(self, pytest_report, task):
+        if self.results is not None:
+            merge_result(self.results, pytest_report, task)
+            self.changed = True
+
+    def push(self):
+        if self.changed:
+            retry_rate_limited(self.comment.edit, render_comment(self.results))
+            self.changed = False
+
+
+class SessionReporter:  # pylint: disable=R0902
+    """Collects the results of a test session and reports them to the
+    tracking issue of the release candidate under test on `flush()`, with
+    one edit of the issue, one edit of the sticky comment, and one commit and
+    push of the result files for all results. The RC, the tracking issue and
+    the sticky comment are taken from the session's GithubCache.
+
+    With a `flush_interval` in seconds, results are also flushed when adding
+    a result more than `flush_interval` after the last flush."""
+
+    def __init__(self, clonedir, flush_interval=None):
+        self.uploader = ResultUploader(clonedir)
+        self.flush_interval = flush_interval
+        self.results = []
+        self.rc = None
+        self.cache = None
+        self.issue = None
+        self.comment = None
+        self._resolved = None
+        self._last_flush = time.monotonic()
+        self.flushes = 0
+
+    def add(self, pytest_report):
+        if not _is_reported(pytest_report):
+            return
+        tested_task = get_task(pytest_report.nodeid)
+        if tested_task:
+            self.results.append((pytest_report, tested_task))
+        if (
+            self.flush_interval is not None
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def _resolve(self):
+        if self._resolved is not None:
+            return self._resolved
+        self._resolved = False
+        self.rc = get_rc()
+        if not self.rc:
+            return False
+        self.cache = get_github_cache()
+        if not self.cache:
+            return False
+        try:
+            self.issue = self.cache.tracking_issue(self.rc)
+            if self.issue is None:
+                # pylint: disable=C0209
+                logger.error(
+                    "No tracking issue found for {release}-{candidate}".format(
+                        **self.rc
+                    )
+                )
+                return False
+            self.comment = self.cache.sticky_comment(self.issue)
+        except GithubException as e:
+            logger.error(f"Unable to get tracking issue: {e}")
+            if self.issue is None:
+                return False
+            # still mark the tasks done without a comment
+            self.comment = None
+        self._resolved = True
+        return True
+
+    def _report(self, results, index, draft):
+        """Report `results` to `draft` and return the tasks in `index` to mark
+        done"""
+        found = []
+        for pytest_report, tested_task in results:
+            task_line, task = index.find(tested_task)
+            if not task_line or not task:
+                # pylint: disable=C0209
+                logger.warning(
+                    "Unable to find task {spec}.{task} in the "
+                    "tracking issue".format(**tested_task)
+                )
+                continue
+            found.append((pytest_report, tested_task, task))
+            if draft is not None:
+                self.uploader.stage(pytest_report, task)
+        if draft is not None:
+            self.uploader.upload(draft, self.cache.github, self.rc)
+        done = []
+        for pytest_report, tested_task, task in found:
+            if draft is not None:
+                draft.update(pytest_report, task)
+            if task["done"]:
+                # pylint: disable=C0209
+                logger.info(
+                    "Task {spec}.{task} is already marked done in the "
+                    "tracking issue".format(**tested_task)
+                )
+            elif pytest_report.outcome == "passed":
+                done.append(tested_task)
+        return done
+
+    def flush(self):
+        """Report all results collected since the last flush"""
+        self._last_flush = time.monotonic()
+        self.flushes += 1
+        results, self.results = self.results, []
+        if not results or not self._resolve():
+            return
+        try:
+            self.cache.refresh(self.issue)
+            body = self.issue.body
+        except GithubException as e:
+            logger.error(f"Unable to get issue text of {self.issue}: {e}")
+            return
+        index = task_index(body)
+        draft = _CommentDraft(self.comment) if self.comment is not None else None
+        done = self._report(results, index, draft)
+        if draft is not None:
+            try:
+                draft.push()
+            except GithubException as e:
+                logger.error(f"Unable to update comment: {e}")
+        self._mark_tasks_done(done)
+
+    def _mark_tasks_done(self, tested_tasks):
+        if not tested_tasks:
+            return
+        comment_url = self.comment.html_url if self.comment is not None else None
+        try:
+            # reload body, as other testers might have edited it in the meantime
+            self.cache.refresh(self.issue)
+            index = task_index(self.issue.body)
+            new_body = index.mark_done(tested_tasks, self.cache.user, comment_url)
+            if new_body == index.body:
+                return
+            retry_rate_limited(self.issue.edit, body=new_body)
+        except GithubException as e:
+            tasks = ", ".join(
+                f"{tested_task['spec']}.{tested_task['task']}"
+                for tested_task in tested_tasks
+            )
+            logger.error(f"Unable to mark {tasks} in the tracking issue: {e}")
+
+
+class ReportWorker:
+    """Hands the reports of a test session to a SessionReporter in a
+    background thread, so the next test does not wait for results being
+    reported to GitHub. At most `maxsize` reports are queued, `put()` waits
+    when the queue is full. `close()` reports everything still queued."""
+
+    def __init__(self, reporter, maxsize=REPORT_QUEUE_SIZE):
+        self.reporter = reporter
+        self.queue = queue.Queue(maxsize)
+        self.max_queue_depth = 0
+        # seconds from queueing a result to it being reported
+        self.latencies = []
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __repr__(self):
+        return f"<ReportWorker: {self.queue.qsize()} queued>"
+
+    def put(self, pytest_report):
+        with self._lock:
+            if self._closed:
+                logger.warning("Report %s after closing", pytest_report)
+                return
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="github-report-worker", daemon=True
+                )
+                self._thread.start()
+        self.queue.put((time.monotonic(), pytest_report))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    def _add(self, queued, pytest_report, pending):
+        flushes = self.reporter.flushes
+        results = len(self.reporter.results)
+        self.reporter.add(pytest_report)
+        if self.reporter.flushes != flushes:
+            self._reported(pending + [queued])
+            pending.clear()
+        elif len(self.reporter.results) > results:
+            pending.append(queued)
+
+    def _reported(self, pending):
+        now = time.monotonic()
+        self.latencies.extend(now - queued for queued in pending)
+
+    def _run(self):
+        # queue times of the results added to the reporter but not reported
+        pending = []
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    self.reporter.flush()
+                    self._reported(pending)
+                    return
+                self._add(*item, pending)
+            except Exception:  # pylint: disable=W0703
+                if item is None:
+                    # the pending results are not reported
+                    logger.exception("Unable to flush results")
+                    return
+                # keep consuming, so the test session never blocks on the queue
+                logger.exception("Unable to report %s", item[1])
+            finally:
+                self.queue.task_done()
+
+    def close(self):
+        """Reports all queued results and stops the worker"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if self._thread is None:
+            self.reporter.flush()
+            return
+        self.queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        """
+        :return: dict with the number of reported "results", the current and
+                 the maximum queue depth, and the mean and the maximum
+                 "upload_latency" in seconds from queueing a result to it
+                 being reported
+        """
+        latencies = self.latencies
+        return {
+            "results": len(latencies),
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "upload_latency": {
+                "mean": sum(latencies) / len(latencies) if latencies else None,
+                "max": max(latencies, default=None),
+            },
+        }
+
+    def summary(self):
+        """:return: The `stats()` as a line for the terminal summary"""
+        stats = self.stats()
+        latency = stats["upload_latency"]
+        if latency["mean"] is None:
+            # nothing was reported, e.g. as the final flush failed
+            latency = "n/a"
+        else:
+            # pylint: disable=C0209
+            latency = "{mean:.1f}s mean, {max:.1f}s max".format(**latency)
+        return (
+            f"Reported {stats['results']} results to the tracking issue, "
+            f"max. queue depth: {stats['max_queue_depth']}, "
+            f"upload latency: {latency}"
+        )
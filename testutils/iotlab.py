@@ -1,7 +1,18 @@
+import collections
+import heapq
 import logging
+import math
+import os
 import re
+import sys
+import threading
+import time
 
+from urllib.error import HTTPError
+
+import requests
 from iotlabcli.auth import get_user_credentials
+from iotlabcli.node import node_command
 from iotlabcli.rest import Api
 from iotlabcli.experiment import (
     submit_experiment,
@@ -12,13 +23,165 @@ from iotlabcli.experiment import (
     AliasNodes,
 )
 
+from testutils.lease import LeaseBroker
+
 DEFAULT_SITE = 'saclay'
 IOTLAB_DOMAIN = 'iot-lab.info'
+# seconds a site's topology is used before the node states are fetched again
+TOPOLOGY_MAX_AGE = 30
+
+
+class IoTLABApi(Api):
+    """IoT-LAB REST API client that sends the requests of each thread over
+    its own keep-alive session and counts them in `calls`"""
+
+    def __init__(self, username, password):
+        super().__init__(username, password)
+        self.credentials = (username, password)
+        self.calls = 0
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def _request(self, url, method, **kwargs):  # pylint: disable=W0221
+        with self._lock:
+            self.calls += 1
+        try:
+            return self._session().request(method, url, timeout=None, **kwargs)
+        except Exception as exc:  # like Api._request
+            raise RuntimeError(sys.exc_info()) from exc
+
+    def close(self):
+        """Close the connections of all threads"""
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+
+
+class IoTLABTopology:
+    """Positions, archis and states of the nodes of an IoT-LAB site, as
+    returned by `Api.get_nodes()`, to select idle nodes close to each other.
+    Mobile nodes and nodes without a position are ignored."""
+
+    # site -> IoTLABTopology, see get()
+    _cache = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, site, items):
+        self.site = site
+        self.fetched = time.monotonic()
+        self._nodes = {}
+        self._idle = set()
+        self._lock = threading.Lock()
+        for item in items:
+            try:
+                position = tuple(float(item[axis]) for axis in ('x', 'y', 'z'))
+            except (KeyError, ValueError):
+                continue
+            if item.get('mobile'):
+                continue
+            self._nodes[item['network_address']] = (item['archi'], position)
+            if item.get('state') == 'Alive':
+                self._idle.add(item['network_address'])
+
+    def __repr__(self):
+        return f"<{type(self).__name__}: {self.site} ({len(self._idle)} idle)>"
+
+    def __len__(self):
+        return len(self._nodes)
+
+    @classmethod
+    def get(cls, api, site, max_age=TOPOLOGY_MAX_AGE):
+        """The topology of `site`, fetched with `api` if not cached or older
+        than `max_age` seconds"""
+        with cls._cache_lock:
+            topology = cls._cache.get(site)
+            if topology is None or time.monotonic() - topology.fetched > max_age:
+                topology = cls(site, api.get_nodes(site=site)['items'])
+                cls._cache[site] = topology
+            return topology
+
+    @classmethod
+    def clear_cache(cls):
+        with cls._cache_lock:
+            cls._cache.clear()
+
+    def _idle_nodes(self, archi):
+        return sorted(n for n in self._idle if self._nodes[n][0] == archi)
+
+    def idle(self, archi):
+        """Idle nodes of `archi`, e.g. `m3:at86rf231`"""
+        with self._lock:
+            return self._idle_nodes(archi)
+
+    def distance(self, node, other):
+        """Distance between `node` and `other` in meters"""
+        return math.dist(self._nodes[node][1], self._nodes[other][1])
+
+    def _closest(self, anchor, archis, candidates):
+        """The nodes for `archis` closest to `anchor`, with `anchor` for the
+        first of `archis` with its archi"""
+        anchor_index = archis.index(self._nodes[anchor][0])
+        needed = collections.Counter(archis)
+        needed[archis[anchor_index]] -= 1
+        closest = {}
+        for archi, count in needed.items():
+            nodes = heapq.nsmallest(
+                count,
+                (n for n in candidates[archi] if n != anchor),
+                key=lambda n: (self.distance(anchor, n), n),
+            )
+            if len(nodes) < count:
+                return None
+            closest[archi] = nodes
+        return [
+            anchor if i == anchor_index else closest[archi].pop(0)
+            for i, archi in enumerate(archis)
+        ]
+
+    def select(self, archis):
+        """
+        Select one idle node per archi in `archis`, so that the selected
+        nodes are as close as possible to one of them. The selected nodes
+        are no longer idle.
+
+        :return: List of the selected nodes in the order of `archis`, None
+                 if there are not enough idle nodes
+        """
+        with self._lock:
+            candidates = {archi: self._idle_nodes(archi) for archi in set(archis)}
+            # the archi with the fewest idle nodes needed
+            anchor_archi = min(candidates, key=lambda a: len(candidates[a]))
+            best, best_spread = None, None
+            for anchor in candidates[anchor_archi]:
+                nodes = self._closest(anchor, list(archis), candidates)
+                if nodes is None:
+                    continue
+                spread = max(self.distance(anchor, n) for n in nodes)
+                if best is None or spread < best_spread:
+                    best, best_spread = nodes, spread
+            if best is not None:
+                self._idle.difference_update(best)
+            return best
 
 
 class IoTLABExperiment:
     """Utility for running iotlab-experiments based on a list of RIOTCtrls
-    expects BOARD or IOTLAB_NODE variable to be set for received nodes"""
+    expects BOARD or IOTLAB_NODE variable to be set for received nodes
+
+    With `select_nodes`, idle nodes close to each other are reserved for
+    multiple RIOTCtrls with only BOARD set, see `IoTLABTopology`. Otherwise
+    IoT-LAB chooses any nodes of the BOARDs on the site."""
 
     BOARD_ARCHI_MAP = {
         'arduino-zero': {'name': 'arduino-zero', 'radio': 'xbee'},
@@ -40,32 +203,47 @@ class IoTLABExperiment:
         'samr30-xpro': {'name': 'samr30', 'radio': 'at86rf212b'},
     }
 
+    # lookup tables derived from BOARD_ARCHI_MAP
+    _NODE_NAME_BOARD = {
+        archi['name']: board for board, archi in BOARD_ARCHI_MAP.items()
+    }
+    _BOARD_ARCHI = {
+        board: (
+            f"{archi['name']}:{archi['radio']}" if 'radio' in archi else archi['name']
+        )
+        for board, archi in BOARD_ARCHI_MAP.items()
+    }
+    _IOTLAB_NODE_REGEX = re.compile(r'([0-9a-zA-Z\-]+)-\d+\.[a-z]+\.iot-lab\.info')
+
     SITES = ['grenoble', 'lille', 'saclay', 'strasbourg']
 
-    def __init__(self, name, ctrls, site=DEFAULT_SITE):
+    # shared by all experiments, see api()
+    _api = None
+    _api_lock = threading.Lock()
+
+    def __init__(self, name, ctrls, site=DEFAULT_SITE, select_nodes=False):
         IoTLABExperiment._check_site(site)
         self.site = site
         IoTLABExperiment._check_ctrls(site, ctrls)
         self.ctrls = ctrls
         self.name = name
+        self.select_nodes = select_nodes
         self.exp_id = None
 
     @staticmethod
     def board_from_iotlab_node(iotlab_node):
         """Return BOARD matching iotlab_node"""
-        reg = r'([0-9a-zA-Z\-]+)-\d+\.[a-z]+\.iot-lab\.info'
-        match = re.search(reg, iotlab_node)
+        match = IoTLABExperiment._IOTLAB_NODE_REGEX.search(iotlab_node)
         if match is None:
             raise ValueError(
                 f"Unable to parse {iotlab_node} as IoT-LAB node "
                 "name of format "
                 "<node-name>.<site-name>.iot-lab.info"
             )
-        iotlab_node_name = match.group(1)
-        dict_values = IoTLABExperiment.BOARD_ARCHI_MAP.values()
-        dict_names = [value['name'] for value in dict_values]
-        dict_keys = list(IoTLABExperiment.BOARD_ARCHI_MAP.keys())
-        return dict_keys[dict_names.index(iotlab_node_name)]
+        try:
+            return IoTLABExperiment._NODE_NAME_BOARD[match.group(1)]
+        except KeyError as exc:
+            raise ValueError(f"No BOARD for IoT-LAB node {iotlab_node}") from exc
 
     @staticmethod
     def valid_board(board):
@@ -81,32 +259,45 @@ class IoTLABExperiment:
 
     @classmethod
     def check_user_credentials(cls):
-        res = cls.user_credentials()
-        return res != (None, None)
+        return cls.api().credentials != (None, None)
 
     @staticmethod
     def user_credentials():
         return get_user_credentials()
 
+    @classmethod
+    def api(cls):
+        """The IoTLABApi shared by all experiments, created with the
+        `user_credentials()` on first use"""
+        with cls._api_lock:
+            if cls._api is None:
+                cls._api = IoTLABApi(*cls.user_credentials())
+            return cls._api
+
+    @classmethod
+    def close_api(cls):
+        """Close the shared IoTLABApi, the next `api()` creates a new one"""
+        with cls._api_lock:
+            api, cls._api = cls._api, None
+        if api is not None:
+            api.close()
+
+    @classmethod
+    def api_calls(cls):
+        """REST calls made by the shared IoTLABApi so far"""
+        with cls._api_lock:
+            return 0 if cls._api is None else cls._api.calls
+
     @staticmethod
     def _archi_from_board(board):
         """Return iotlab 'archi' format for BOARD"""
-        name = IoTLABExperiment.BOARD_ARCHI_MAP[board]['name']
-        if 'radio' not in IoTLABExperiment.BOARD_ARCHI_MAP[board]:
-            return f'{name}'
-        radio = IoTLABExperiment.BOARD_ARCHI_MAP[board]['radio']
-        return f'{name}:{radio}'
+        return IoTLABExperiment._BOARD_ARCHI[board]
 
     @staticmethod
     def _check_site(site):
         if site not in IoTLABExperiment.SITES:
             raise ValueError("iotlab site must be one of " f"{IoTLABExperiment.SITES}")
 
-    @staticmethod
-    def _valid_addr(ctrl, addr):
-        """Check id addr matches a specific RIOTCtrl BOARD"""
-        return addr.startswith(IoTLABExperiment.BOARD_ARCHI_MAP[ctrl.board()]['name'])
-
     @staticmethod
     def _check_ctrls(site, ctrls):
         """Takes a list of RIOTCtrls and validates BOARD or IOTLAB_NODE"""
@@ -130,7 +321,7 @@ class IoTLABExperiment:
         """If running stop the experiment"""
         ret = None
         if self.exp_id is not None:
-            ret = stop_experiment(Api(*self.user_credentials()), self.exp_id)
+            ret = stop_experiment(self.api(), self.exp_id)
             self.exp_id = None
         return ret
 
@@ -147,12 +338,21 @@ class IoTLABExperiment:
 
     def _wait(self):
         """Wait for the experiment to finish launching"""
-        ret = wait_experiment(Api(*self.user_credentials()), self.exp_id)
+        ret = wait_experiment(self.api(), self.exp_id)
         return ret
 
     def _submit(self, site, duration):
         """Submit an experiment with required nodes"""
-        api = Api(*self.user_credentials())
+        nodes = self._select_nodes(site) if self.select_nodes else None
+        if nodes is not None:
+            resources = [exp_resources(nodes)]
+        else:
+            resources = self._resources(site)
+        return submit_experiment(self.api(), self.name, duration, resources)['id']
+
+    def _resources(self, site):
+        """Resources of the required nodes, with IoT-LAB choosing the nodes
+        for the RIOTCtrls without IOTLAB_NODE"""
         resources = []
         for ctrl in self.ctrls:
             if ctrl.env.get('IOTLAB_NODE') is not None:
@@ -163,22 +363,321 @@ class IoTLABExperiment:
                 resources.append(exp_resources(alias))
             else:
                 raise ValueError("neither BOARD or IOTLAB_NODE are set")
-        return submit_experiment(api, self.name, duration, resources)['id']
+        return resources
+
+    def _select_nodes(self, site):
+        """Idle nodes of `site` close to each other for the RIOTCtrls, or None
+        to let IoT-LAB choose, e.g. for a single node or if IOTLAB_NODE is set
+        for any RIOTCtrl"""
+        if len(self.ctrls) < 2 or any(
+            ctrl.env.get('IOTLAB_NODE') is not None or ctrl.board() is None
+            for ctrl in self.ctrls
+        ):
+            return None
+        try:
+            topology = IoTLABTopology.get(self.api(), site)
+        except (HTTPError, RuntimeError) as exc:
+            logging.warning(f"Unable to get topology of {site}: {exc}")
+            return None
+        nodes = topology.select(
+            [IoTLABExperiment._archi_from_board(ctrl.board()) for ctrl in self.ctrls]
+        )
+        if nodes is None:
+            logging.warning(f"Not enough idle nodes close to each other on {site}")
+        return nodes
 
     def _map_iotlab_nodes_to_riot_ctrl(self, iotlab_nodes):
         """Fetch reserved nodes and map each one to an RIOTCtrl"""
+        reserved = set(iotlab_nodes)
+        requested = {ctrl.env.get('IOTLAB_NODE') for ctrl in self.ctrls}
+        # by BOARD, the nodes no IOTLAB_NODE asks for, in the order reserved
+        free = collections.defaultdict(collections.deque)
+        for iotlab_node in iotlab_nodes:
+            if iotlab_node in requested:
+                continue
+            match = self._IOTLAB_NODE_REGEX.search(iotlab_node)
+            if match is not None:
+                free[self._NODE_NAME_BOARD.get(match.group(1))].append(iotlab_node)
         for ctrl in self.ctrls:
-            if ctrl.env.get('IOTLAB_NODE') in iotlab_nodes:
-                iotlab_nodes.remove(ctrl.env['IOTLAB_NODE'])
-            else:
-                for iotlab_node in iotlab_nodes:
-                    if IoTLABExperiment._valid_addr(ctrl, iotlab_node):
-                        iotlab_nodes.remove(iotlab_node)
-                        ctrl.env['IOTLAB_NODE'] = str(iotlab_node)
-                        break
+            if ctrl.env.get('IOTLAB_NODE') not in reserved and free[ctrl.board()]:
+                ctrl.env['IOTLAB_NODE'] = str(free[ctrl.board()].popleft())
             ctrl.env['IOTLAB_EXP_ID'] = str(self.exp_id)
 
     def _get_nodes(self):
         """Return all nodes reserved by the experiment"""
-        ret = get_experiment(Api(*self.user_credentials()), self.exp_id)
+        ret = get_experiment(self.api(), self.exp_id)
         return ret['nodes']
+
+
+class _PoolNode:  # pylint: disable=R0903
+    """Placeholder RIOTCtrl for the nodes reserved by an IoTLABExperimentPool"""
+
+    def __init__(self, board):
+        self.env = {'BOARD': board}
+
+    def board(self):
+        return self.env['BOARD']
+
+
+class IoTLABExperimentPool:
+    """Reserves nodes for multiple tests in a single IoT-LAB experiment and
+    leases them to a list of RIOTCtrls, so not every test has to wait for its
+    own experiment to start.
+
+    If a shared `broker` (see `testutils.lease.LeaseBroker`) is given, the
+    experiment and its nodes are shared between all processes using that
+    broker: only the first process to start the pool submits the experiment
+    and each node is leased to at most one process at a time.
+
+    :param boards: Mapping of BOARD to the number of nodes of that BOARD to
+                   reserve
+    :param duration: Duration of the experiment in minutes
+    :param owner: Name of the process in `broker`'s leases
+    """
+
+    BROKER_KEY_FMT = "iotlab-pool-{site}"
+
+    # pylint: disable=R0913
+    def __init__(
+        self, name, boards, site=DEFAULT_SITE, duration=60, broker=None, owner=None
+    ):
+        self.experiment = IoTLABExperiment(
+            name=name,
+            ctrls=[
+                _PoolNode(board)
+                for board, count in sorted(boards.items())
+                for _ in range(count)
+            ],
+            site=site,
+        )
+        self.duration = duration
+        self.broker = broker if broker is not None else LeaseBroker()
+        self.owner = owner if owner is not None else str(os.getpid())
+        self._nodes = {}
+
+    def __repr__(self):
+        return (
+            f"<{type(self).__name__}: {self.experiment.name} "
+            f"({self.experiment.exp_id})>"
+        )
+
+    @property
+    def site(self):
+        return self.experiment.site
+
+    @property
+    def exp_id(self):
+        return self.experiment.exp_id
+
+    @property
+    def _broker_key(self):
+        return self.BROKER_KEY_FMT.format(site=self.site)
+
+    def free_nodes(self, board=None):
+        leased = self.broker.leased(self._broker_key)
+        boards = sorted(self._nodes) if board is None else [board]
+        return [
+            node
+            for b in boards
+            for node in self._nodes.get(b, [])
+            if node not in leased
+        ]
+
+    def _start_experiment(self):
+        self.experiment.start(duration=self.duration)
+        nodes = collections.defaultdict(list)
+        for node in self.experiment.ctrls:
+            nodes[node.board()].append(node.env['IOTLAB_NODE'])
+        return {"exp_id": self.experiment.exp_id, "nodes": dict(nodes)}
+
+    def start(self):
+        """Start the experiment of the pool, unless another process sharing
+        the broker already did, and mark all its nodes as free"""
+        info = self.broker.setdefault(self._broker_key, self._start_experiment)
+        self.experiment.exp_id = info["exp_id"]
+        self._nodes = info["nodes"]
+
+    def stop(self):
+        """Stop the experiment of the pool"""
+        self._nodes = {}
+        self.broker.pop(self._broker_key)
+        return self.experiment.stop()
+
+    @classmethod
+    def stop_all(cls, broker):
+        """Stop all pool experiments started by processes sharing `broker`"""
+        with broker.transaction() as state:
+            for key in list(state):
+                if not key.startswith(cls.BROKER_KEY_FMT.format(site="")):
+                    continue
+                info = state.pop(key)
+                stop_experiment(IoTLABExperiment.api(), info["exp_id"])
+
+    def lease(self, ctrls):
+        """
+        Assign free nodes of the pool to `ctrls`. Either all or none of
+        `ctrls` are assigned.
+
+        :return: True if all `ctrls` got a node assigned, False otherwise
+        """
+        if self.exp_id is None:
+            return False
+        candidate_lists = []
+        for ctrl in ctrls:
+            candidates = self._nodes.get(ctrl.board(), [])
+            if ctrl.env.get('IOTLAB_NODE') is not None:
+                candidates = [n for n in candidates if n == ctrl.env['IOTLAB_NODE']]
+            if not candidates:
+                return False
+            candidate_lists.append(candidates)
+        leased = self.broker.lease_each(self._broker_key, candidate_lists, self.owner)
+        if leased is None:
+            return False
+        for ctrl, iotlab_node in zip(ctrls, leased):
+            ctrl.env['IOTLAB_NODE'] = iotlab_node
+            ctrl.env['IOTLAB_EXP_ID'] = str(self.exp_id)
+        return True
+
+    def release(self, ctrls):
+        """Reset the nodes leased to `ctrls` and return them to the pool.
+        The next lessee flashes its own firmware."""
+        iotlab_nodes = [ctrl.env['IOTLAB_NODE'] for ctrl in ctrls]
+        if self.exp_id is None:
+            return
+        try:
+            node_command(self.experiment.api(), 'reset', self.exp_id, iotlab_nodes)
+        except HTTPError as exc:
+            logging.error(f"Unable to reset {iotlab_nodes}: {exc}")
+        self.broker.release(self._broker_key, self.owner, iotlab_nodes)
+
+
+class _Prefetch:
+    """Experiment of a test started in the background"""
+
+    def __init__(self, experiment, duration):
+        self.experiment = experiment
+        self.error = None
+        self._thread = threading.Thread(
+            target=self._start, args=(duration,), name=experiment.name, daemon=True
+        )
+        self._thread.start()
+
+    def _start(self, duration):
+        try:
+            self.experiment.start(duration=duration)
+        except Exception as exc:  # pylint: disable=W0703
+            # raised to the test that takes the experiment
+            self.error = exc
+
+    def wait(self):
+        self._thread.join()
+        return self.error is None
+
+    def cancel(self):
+        if self.experiment.exp_id is None:
+            # still submitting
+            self._thread.join()
+        self.experiment.stop()
+
+
+class IoTLABExperimentPrefetcher:
+    """Starts the IoT-LAB experiments of the next tests while the current
+    test runs, so the time the testbed takes to boot the nodes overlaps with
+    the current test.
+
+    :param tests: (nodeid, experiment name, BOARDs, site) of the tests that
+                  need an experiment, in the order they run
+    :param ahead: Maximum number of experiments started ahead per site
+    :param duration: Duration of the experiments in minutes
+    :param select_nodes: Select idle nodes close to each other, see
+                         `IoTLABExperiment`
+    """
+
+    def __init__(self, tests, ahead=1, duration=60, select_nodes=False):
+        self.tests = list(tests)
+        self.ahead = ahead
+        self.duration = duration
+        self.select_nodes = select_nodes
+        self._index = {test[0]: i for i, test in enumerate(self.tests)}
+        self._prefetched = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<{type(self).__name__}: {len(self._prefetched)} prefetched>"
+
+    def prefetch_next(self, nodeid):
+        """Start the experiments of the `ahead` tests after `nodeid` in the
+        background, with at most `ahead` experiments started ahead per site"""
+        if nodeid not in self._index:
+            return
+        start = self._index[nodeid] + 1
+        end = start + self.ahead
+        with self._lock:
+            for next_nodeid, name, boards, site in self.tests[start:end]:
+                ahead = [
+                    prefetched
+                    for prefetched in self._prefetched.values()
+                    if prefetched.experiment.site == site
+                ]
+                if next_nodeid in self._prefetched or len(ahead) >= self.ahead:
+                    continue
+                logging.info(f"Prefetching experiment for {next_nodeid}")
+                self._prefetched[next_nodeid] = _Prefetch(
+                    IoTLABExperiment(
+                        name,
+                        [_PoolNode(board) for board in boards],
+                        site=site,
+                        select_nodes=self.select_nodes,
+                    ),
+                    self.duration,
+                )
+
+    def take(self, nodeid, ctrls):
+        """
+        Wait for the experiment prefetched for `nodeid` and assign its nodes
+        to `ctrls`. Experiments prefetched for tests before `nodeid` that did
+        not take them, e.g. as they were skipped, are stopped.
+
+        :return: The running experiment or None if none was prefetched for
+                 `nodeid` or it failed to start
+        """
+        with self._lock:
+            index = self._index.get(nodeid, -1)
+            stale = [
+                self._prefetched.pop(other)
+                for other in list(self._prefetched)
+                if self._index[other] < index
+            ]
+            prefetched = self._prefetched.pop(nodeid, None)
+        for other in stale:
+            other.cancel()
+        if prefetched is None:
+            return None
+        if not prefetched.wait():
+            logging.error(
+                f"Prefetched experiment for {nodeid} failed: {prefetched.error}"
+            )
+            prefetched.experiment.stop()
+            return None
+        experiment = prefetched.experiment
+        nodes = collections.defaultdict(list)
+        for node in experiment.ctrls:
+            nodes[node.board()].append(node.env['IOTLAB_NODE'])
+        if collections.Counter(ctrl.board() for ctrl in ctrls) != collections.Counter(
+            {board: len(board_nodes) for board, board_nodes in nodes.items()}
+        ):
+            logging.error(f"Prefetched experiment for {nodeid} has other nodes")
+            experiment.stop()
+            return None
+        for ctrl in ctrls:
+            ctrl.env['IOTLAB_NODE'] = nodes[ctrl.board()].pop(0)
+            ctrl.env['IOTLAB_EXP_ID'] = str(experiment.exp_id)
+        experiment.ctrls = ctrls
+        return experiment
+
+    def stop(self):
+        """Stop all prefetched experiments no test took"""
+        with self._lock:
+            prefetched, self._prefetched = self._prefetched, {}
+        for other in prefetched.values():
+            other.cancel()
@@ -0,0 +1,213 @@
+"""
+Helpers to share resources between concurrent test processes, e.g. when
+running with `pytest-xdist`
+"""
+
+import collections
+import contextlib
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+
+# seconds between attempts of `LeaseBroker.wait_lease()`
+LEASE_POLL_INTERVAL = 1
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on the file `path` (created if it does not
+    exist) for the duration of the context"""
+    with open(path, "a", encoding="utf-8") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class LeaseBroker:
+    """Hands out resources to concurrent owners (e.g. pytest-xdist workers).
+    The state is kept as JSON in `statefile` which is only accessed while
+    holding a lock on `statefile`.lock, so any number of processes can share
+    it. Without `statefile` the state is only kept in memory of the current
+    process.
+
+    Each lease records the `worker` process it was made by (e.g. its
+    pytest-xdist worker ID, the PID if not given), so the leases of a crashed
+    worker can be returned with `release_worker()`.
+    """
+
+    def __init__(self, statefile=None, worker=None):
+        self.statefile = str(statefile) if statefile is not None else None
+        self.worker = str(worker) if worker is not None else str(os.getpid())
+        self._state = {}
+        self._lock = threading.RLock()
+        self._key_locks = collections.defaultdict(threading.Lock)
+
+    def __repr__(self):
+        return f"<{type(self).__name__}: {self.statefile}>"
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Yields the state of the broker as a dict. Changes to the dict are
+        written back at the end of the context.
+        """
+        if self.statefile is None:
+            with self._lock:
+                yield self._state
+            return
+        with file_lock(f"{self.statefile}.lock"):
+            state = {}
+            if os.path.exists(self.statefile):
+                with open(self.statefile, encoding="utf-8") as statefile:
+                    state = json.load(statefile)
+            yield state
+            with open(self.statefile, "w", encoding="utf-8") as statefile:
+                json.dump(state, statefile)
+
+    @contextlib.contextmanager
+    def key_lock(self, key):
+        """Hold a lock for `key` only, so the state can be accessed by others
+        for the duration of the context"""
+        if self.statefile is None:
+            with self._lock:
+                lock = self._key_locks[key]
+            with lock:
+                yield
+            return
+        name = re.sub(r"[^\w-]", "_", key)
+        with file_lock(f"{self.statefile}.{name}.lock"):
+            yield
+
+    def setdefault(self, key, factory):
+        """
+        Get the value for `key`. If there is none yet, it is created by calling
+        `factory`. Other owners of `key` wait for `factory` to return, all
+        other access to the state does not.
+        """
+        with self.transaction() as state:
+            if key in state:
+                return state[key]
+        with self.key_lock(key):
+            # check again as another owner might have created it in the meantime
+            with self.transaction() as state:
+                if key in state:
+                    return state[key]
+            value = factory()
+            with self.transaction() as state:
+                state[key] = value
+            return value
+
+    def pop(self, key, default=None):
+        with self.transaction() as state:
+            return state.pop(key, default)
+
+    def lease(self, resource, candidates, owner, count=1):
+        """
+        Lease `count` of `candidates` that are not leased to anyone else yet
+        to `owner`, preferring candidates in the given order.
+
+        :return: List of leased candidates or None if not enough candidates
+                 were available
+        """
+        return self.lease_each(resource, [candidates] * count, owner)
+
+    # pylint: disable=R0913
+    def wait_lease(
+        self,
+        resource,
+        candidates,
+        owner,
+        count=1,
+        timeout=None,
+        interval=LEASE_POLL_INTERVAL,
+    ):
+        """
+        Like `lease()`, but retries every `interval` seconds until enough
+        `candidates` were released by their owners. Raises TimeoutError if
+        that did not happen within `timeout` seconds.
+
+        :return: List of leased candidates
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            res = self.lease(resource, candidates, owner, count)
+            if res is not None:
+                return res
+            if deadline is not None and time.monotonic() >= deadline:
+                leased = self.leased(resource)
+                holders = ", ".join(
+                    f"{c} to {leased[str(c)]}" for c in candidates if str(c) in leased
+                )
+                raise TimeoutError(
+                    f"{resource} still leased after {timeout}s: {holders}"
+                )
+            time.sleep(interval)
+
+    def lease_each(self, resource, candidate_lists, owner):
+        """
+        Lease one distinct candidate from each list in `candidate_lists` to
+        `owner`. Either all or none are leased.
+
+        :return: List of leased candidates, in the order of `candidate_lists`,
+                 or None if not all lists could be served
+        """
+        res = [None] * len(candidate_lists)
+        with self.transaction() as state:
+            leases = state.setdefault("leases", {}).setdefault(resource, {})
+            taken = set(leases)
+            # serve the most constrained lists first
+            for idx in sorted(
+                range(len(candidate_lists)), key=lambda i: len(candidate_lists[i])
+            ):
+                for candidate in candidate_lists[idx]:
+                    if str(candidate) not in taken:
+                        taken.add(str(candidate))
+                        res[idx] = candidate
+                        break
+                else:
+                    return None
+            for candidate in res:
+                leases[str(candidate)] = {"owner": owner, "worker": self.worker}
+        return res
+
+    def release(self, resource, owner, candidates=None):
+        """
+        Release the `candidates` of `resource` leased to `owner`. If
+        `candidates` is not given, all candidates leased to `owner` are
+        released.
+        """
+        with self.transaction() as state:
+            leases = state.setdefault("leases", {}).setdefault(resource, {})
+            for candidate, lease in list(leases.items()):
+                if lease["owner"] != owner:
+                    continue
+                if candidates is None or candidate in (str(c) for c in candidates):
+                    del leases[candidate]
+
+    def leased(self, resource):
+        """
+        :return: Mapping of leased candidates of `resource` to their owner
+        """
+        with self.transaction() as state:
+            leases = state.get("leases", {}).get(resource, {})
+            return {candidate: lease["owner"] for candidate, lease in leases.items()}
+
+    def release_worker(self, worker):
+        """
+        Release all leases made by `worker`, e.g. after it crashed
+
+        :return: Mapping of the resources to the released candidates
+        """
+        res = {}
+        with self.transaction() as state:
+            for resource, leases in state.get("leases", {}).items():
+                for candidate, lease in list(leases.items()):
+                    if lease["worker"] == str(worker):
+                        res.setdefault(resource, []).append(candidate)
+                        del leases[candidate]
+        return res
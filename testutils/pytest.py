@@ -3,13 +3,15 @@ Helpers for pytest
 """
 
 import os
-import re
-import subprocess
 
-import pexpect.replwrap
 import pytest
 
+from .github import release_candidate
 from .iotlab import IoTLABExperiment, DEFAULT_SITE, IOTLAB_DOMAIN
+from .ssh import reachable
+
+# seconds a test waits for a resource leased with `lease()`
+LEASE_TIMEOUT = 30 * 60
 
 
 def list_from_string(list_str=None):
@@ -51,13 +53,61 @@ def log_file_fmt(fmt_str=None):
     return None
 
 
-def check_ssh():
-    user, _ = IoTLABExperiment.user_credentials()
+def xdist_worker_id(config):
+    """
+    Returns the ID of the pytest-xdist worker `config` belongs to or None if
+    it does not belong to a worker.
+    """
+    return getattr(config, "workerinput", {}).get("workerid")
+
+
+def xdist_worker_count(config):
+    """
+    Returns the number of pytest-xdist workers or 1 if not running
+    distributed.
+    """
+    return getattr(config, "workerinput", {}).get("workercount", 1)
+
+
+def is_xdist_controller(config):
+    """
+    Returns True if `config` belongs to the pytest-xdist controller process
+    distributing the tests to its workers.
+    """
+    return config.pluginmanager.has_plugin("dsession")
+
+
+def lease(broker, request, resource, candidates, timeout=LEASE_TIMEOUT):
+    """
+    Lease one of `candidates` of `resource` from `broker` to the test of
+    `request` until it is done. Fails the test if none was free within
+    `timeout` seconds.
+
+    :return: The leased candidate, None if there is no `broker`
+    """
+    if broker is None:
+        return None
+    owner = request.node.nodeid
+    try:
+        (res,) = broker.wait_lease(resource, candidates, owner, timeout=timeout)
+    except TimeoutError as exc:
+        pytest.fail(f"Unable to lease {resource}: {exc}")
+    request.addfinalizer(lambda: broker.release(resource, owner))
+    return res
+
+
+def check_ssh(ssh_multiplexer=None):
+    """
+    Checks if the IoT-LAB front-end is reachable via SSH. With
+    `ssh_multiplexer`, the connection stays open for later SSH connections.
+    """
+    user, _ = IoTLABExperiment.api().credentials
     if user is None:
         return False
-    spawn = pexpect.spawnu(f"ssh {user}@{DEFAULT_SITE}.{IOTLAB_DOMAIN} /bin/bash")
-    spawn.sendline("echo $USER")
-    return bool(spawn.expect([pexpect.TIMEOUT, f"{user}"], timeout=5))
+    destination = f"{user}@{DEFAULT_SITE}.{IOTLAB_DOMAIN}"
+    if ssh_multiplexer is not None:
+        return ssh_multiplexer.reachable(destination)
+    return reachable(destination)
 
 
 def check_sudo():
@@ -74,7 +124,7 @@ def check_local(run_local):
     return local_only_mark
 
 
-def check_credentials(run_local):
+def check_credentials(run_local, ssh_multiplexer=None):
     iotlab_creds_mark = None
     if not run_local and not IoTLABExperiment.check_user_credentials():
         iotlab_creds_location = os.path.join(os.environ["HOME"], ".iotlabrc")
@@ -82,7 +132,7 @@ def check_credentials(run_local):
             reason="Test requires IoT-LAB credentials in "
             f"{iotlab_creds_location}. Use `iotlab-auth` to create"
         )
-    elif not run_local and not check_ssh():
+    elif not run_local and not check_ssh(ssh_multiplexer):
         iotlab_creds_mark = pytest.mark.skip(
             reason="Can't access IoT-LAB front-end "
             f"{DEFAULT_SITE}.{IOTLAB_DOMAIN} via SSH. Use key without "
@@ -94,10 +144,7 @@ def check_credentials(run_local):
 
 def check_rc(only_rc_allowed):
     rc_only_mark = None
-    output = subprocess.check_output(
-        ["git", "-C", os.environ["RIOTBASE"], "log", "-1", "--oneline", "--decorate"]
-    ).decode()
-    is_rc = re.search(r"tag:\s\d{4}.\d{2}-RC\d+", output) is not None
+    is_rc = release_candidate(os.environ["RIOTBASE"]) is not None
 
     if only_rc_allowed and not is_rc:
         rc_only_mark = pytest.mark.skip(
@@ -106,6 +153,26 @@ def check_rc(only_rc_allowed):
     return rc_only_mark
 
 
+def check_pan_id(pan_id):
+    """
+    Raises pytest.UsageError if `pan_id`, passed as DEFAULT_PAN_ID to RIOT's
+    build system, is not a decimal or hexadecimal number from 0 to 0xFFFD
+
+    >>> check_pan_id("35")
+    >>> check_pan_id("0x23")
+    """
+    try:
+        # int() also accepts "_" separators, which the compiler does not
+        value = int(pan_id, 0) if "_" not in pan_id else None
+    except ValueError:
+        value = None
+    if value is None or not 0 <= value <= 0xFFFD:
+        raise pytest.UsageError(
+            f"Invalid DEFAULT_PAN_ID {pan_id!r}: expected a number from 0 to "
+            "0xFFFD, e.g. 35 or 0x23"
+        )
+
+
 def get_required_envvar(envvar):
     """
     Returns the value of an environment variable. Raise RuntimeError otherwise.
@@ -0,0 +1,227 @@
+"""
+Local SQLite database of test results, to compare the results of release
+candidates without going through the markdown in the tracking issue
+"""
+
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    release TEXT NOT NULL,
+    spec INTEGER NOT NULL,
+    task INTEGER NOT NULL,
+    params TEXT NOT NULL DEFAULT '',
+    boards TEXT NOT NULL DEFAULT '',
+    outcome TEXT NOT NULL,
+    duration REAL,
+    reruns INTEGER NOT NULL DEFAULT 0,
+    time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_release_task
+    ON results (release, spec, task, params, boards);
+CREATE TABLE IF NOT EXISTS metrics (
+    result_id INTEGER NOT NULL REFERENCES results (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (result_id, name)
+);
+CREATE INDEX IF NOT EXISTS metrics_name ON metrics (name, result_id);
+"""
+# columns a result can be selected by
+KEYS = ("release", "spec", "task", "params", "boards", "outcome")
+# seconds to wait for other processes, e.g. pytest-xdist workers, writing
+BUSY_TIMEOUT = 30
+
+
+def metrics_from_properties(user_properties):
+    """
+    Numeric properties of a test, e.g. recorded with the `record_stats`
+    fixture, as metrics
+
+    >>> metrics_from_properties([("ping6.rtt.min", 1.5), ("ping6.jitter", None),
+    ...                          ("ping6.count", 10), ("node", "m3-1")])
+    {'ping6.rtt.min': 1.5, 'ping6.count': 10.0}
+    """
+    return {
+        name: float(value)
+        for name, value in user_properties
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
+
+
+def _where(**keys):
+    """
+    >>> _where(release="2024.10-RC1", spec=4, task=None)
+    (' WHERE results.release = ? AND results.spec = ?', ['2024.10-RC1', 4])
+    """
+    for key in keys:
+        if key not in KEYS:
+            raise TypeError(f"Unknown key {key!r}")
+    conditions = [(key, value) for key, value in keys.items() if value is not None]
+    if not conditions:
+        return "", []
+    return (
+        " WHERE " + " AND ".join(f"results.{key} = ?" for key, _ in conditions),
+        [value for _, value in conditions],
+    )
+
+
+class ResultsStore:
+    """
+    Results of test runs in the SQLite database at `path`, indexed by
+    release, spec, task, params and boards. Each result has a dict of numeric
+    "metrics", e.g. "ping6.packet_loss" or "pktbuf.drain_time".
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(str(path), timeout=BUSY_TIMEOUT)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(SCHEMA)
+
+    def __repr__(self):
+        return f"<ResultsStore: {self.path}>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    # pylint: disable=too-many-arguments
+    def add(
+        self,
+        release,
+        spec,
+        task,
+        outcome,
+        params=None,
+        boards=(),
+        duration=None,
+        reruns=0,
+        metrics=None,
+    ):
+        """
+        Adds a result
+
+        :param release: Release under test, e.g. "2024.10-RC1"
+        :param boards: The boards the task ran on
+        :param duration: Duration of the test in seconds
+        :param reruns: How often the test was rerun before this result
+        :param metrics: dict of numeric metrics of the result
+        :return: The ID of the result
+        """
+        with self._db:
+            result_id = self._db.execute(
+                "INSERT INTO results (release, spec, task, params, boards, "
+                "outcome, duration, reruns, time) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    release,
+                    spec,
+                    task,
+                    params or "",
+                    ",".join(boards),
+                    outcome,
+                    duration,
+                    reruns,
+                    time.time(),
+                ),
+            ).lastrowid
+            self._db.executemany(
+                "INSERT INTO metrics (result_id, name, value) VALUES (?, ?, ?)",
+                [(result_id, name, value) for name, value in (metrics or {}).items()],
+            )
+        return result_id
+
+    def releases(self):
+        """
+        :return: The releases with results, in the order they were first
+                 tested
+        """
+        return [
+            row["release"]
+            for row in self._db.execute(
+                "SELECT release FROM results GROUP BY release ORDER BY MIN(time)"
+            )
+        ]
+
+    def results(self, **keys):
+        """
+        Results matching `keys`, e.g. `results(release="2024.10-RC1", spec=4)`
+
+        :return: List of dicts of the results, oldest first, with their
+                 "metrics" as a dict
+        """
+        where, args = _where(**keys)
+        rows = self._db.execute(
+            f"SELECT * FROM results{where} ORDER BY time, id", args
+        ).fetchall()
+        res = {row["id"]: dict(row, metrics={}) for row in rows}
+        if not res:
+            return []
+        metrics = self._db.execute(
+            "SELECT metrics.result_id, metrics.name, metrics.value FROM metrics "
+            f"JOIN results ON results.id = metrics.result_id{where}",
+            args,
+        )
+        for result_id, name, value in metrics:
+            res[result_id]["metrics"][name] = value
+        return list(res.values())
+
+    def metric(self, name, **keys):
+        """
+        Statistics of the metric `name` per release, spec, task, params and
+        boards of the results matching `keys`
+
+        :return: List of dicts with the keys of the results, and the "count",
+                 "mean", "min" and "max" of the metric
+        """
+        where, args = _where(**keys)
+        where += " AND " if where else " WHERE "
+        rows = self._db.execute(
+            "SELECT results.release, results.spec, results.task, results.params, "
+            "results.boards, COUNT(*) AS count, AVG(metrics.value) AS mean, "
+            "MIN(metrics.value) AS min, MAX(metrics.value) AS max "
+            "FROM metrics JOIN results ON results.id = metrics.result_id"
+            f"{where}metrics.name = ? "
+            "GROUP BY results.release, results.spec, results.task, "
+            "results.params, results.boards "
+            "ORDER BY results.spec, results.task, results.params, results.boards",
+            args + [name],
+        )
+        return [dict(row) for row in rows]
+
+    def compare(self, name, base, other, **keys):
+        """
+        Compares the mean of the metric `name` between the releases `base` and
+        `other` for each spec, task, params and boards tested in both
+
+        :return: List of dicts with the keys of the results, the "base" and
+                 the "other" mean, and their "diff"
+        """
+        means = {}
+        for row in self.metric(name, **keys):
+            if row["release"] not in (base, other):
+                continue
+            key = (row["spec"], row["task"], row["params"], row["boards"])
+            means.setdefault(key, {})[row["release"]] = row["mean"]
+        return [
+            {
+                "spec": spec,
+                "task": task,
+                "params": params,
+                "boards": boards,
+                "base": mean[base],
+                "other": mean[other],
+                "diff": mean[other] - mean[base],
+            }
+            for (spec, task, params, boards), mean in means.items()
+            if base in mean and other in mean
+        ]
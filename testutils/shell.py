@@ -4,16 +4,21 @@ convenience functions for the use of ShellInteractions and
 ShellInteractionParsers
 """
 
+import logging
 import math
 import re
 import time
 
+from concurrent.futures import ThreadPoolExecutor
+
 import pexpect
 from riotctrl.shell import ShellInteraction, ShellInteractionParser
 
 from riotctrl_shell.gnrc import GNRCICMPv6EchoParser, GNRCPktbufStatsParser
 from riotctrl_shell.netif import IfconfigListParser
 
+logger = logging.getLogger(__name__)
+
 PARSERS = {
     "ping6": GNRCICMPv6EchoParser(),
     "pktbuf": GNRCPktbufStatsParser(),
@@ -73,6 +78,157 @@ class GNRCUDPClientSendParser(ShellInteractionParser):
         return res
 
 
+class GNRCUDPServerOutputParser(ShellInteractionParser):
+    """
+    Line-oriented parser for the output of the UDP server of
+
+    - $RIOTBASE/examples/networking/gnrc/networking
+    - $RIOTBASE/tests/net/gnrc_udp.
+
+    Lines are fed one by one with `feed()`, so each line of output is only
+    looked at once.
+    """
+
+    # (type, size) of the snips of a received UDP packet, None matches any size
+    SNIP_LAYOUT = (
+        ("NETTYPE_UNDEF", None),
+        ("NETTYPE_UDP", None),
+        ("NETTYPE_IPV6", 40),
+        ("NETTYPE_NETIF", None),
+    )
+
+    def __init__(self):
+        self.c_received = re.compile(r"Packets received:\s+\d")
+        self.c_pktdump = re.compile(r"PKTDUMP: data received:")
+        self.c_snip = re.compile(
+            r"~~ SNIP\s+(?P<idx>\d+) - size:\s+(?P<size>\d+) byte, "
+            r"type: (?P<type>\w+) \(-?\d+\)"
+        )
+        self.c_pkt = re.compile(
+            r"~~ PKT\s+-\s+(?P<snips>\d+) snips, total size:\s+(?P<size>\d+) byte"
+        )
+        self.pending = None
+
+    def _has_snip_layout(self, packet):
+        if len(packet["snips"]) != len(self.SNIP_LAYOUT):
+            return False
+        return all(
+            snip["type"] == exp_type and exp_size in (None, snip["size"])
+            for snip, (exp_type, exp_size) in zip(packet["snips"], self.SNIP_LAYOUT)
+        )
+
+    def flush(self):
+        """
+        Ends the packet currently being parsed, e.g. on timeout.
+
+        :return: The unfinished packet record or None if there is none
+        """
+        packet = self.pending
+        self.pending = None
+        if packet is not None:
+            packet["complete"] = False
+        return packet
+
+    def feed(self, line, arrival=None):
+        """
+        Parses a single line of output of the UDP server.
+
+        :param line: A line of output
+        :param arrival: Timestamp of the line, defaults to now
+        :return: List of packet records finished by `line`. A record is a
+                 dict with the "arrival" timestamp of the packet, its total
+                 "size" in bytes, its "snips" as dicts of "type" and "size", and
+                 whether it was "complete"ly received with the expected snips.
+
+        >>> parser = GNRCUDPServerOutputParser()
+        >>> parser.feed("PKTDUMP: data received:", arrival=1.0)
+        []
+        >>> for line in [
+        ...     "~~ SNIP  0 - size:   8 byte, type: NETTYPE_UNDEF (0)",
+        ...     "00000000  41  41  41  41  41  41  41  41",
+        ...     "~~ SNIP  1 - size:   8 byte, type: NETTYPE_UDP (4)",
+        ...     "~~ SNIP  2 - size:  40 byte, type: NETTYPE_IPV6 (2)",
+        ...     "~~ SNIP  3 - size:  20 byte, type: NETTYPE_NETIF (-1)",
+        ... ]:
+        ...     parser.feed(line)
+        []
+        []
+        []
+        []
+        []
+        >>> res = parser.feed("~~ PKT    -  4 snips, total size:  76 byte")
+        >>> len(res)
+        1
+        >>> res[0]["arrival"], res[0]["size"], res[0]["complete"]
+        (1.0, 76, True)
+        >>> [(snip["type"], snip["size"]) for snip in res[0]["snips"]][1:3]
+        [('NETTYPE_UDP', 8), ('NETTYPE_IPV6', 40)]
+        >>> parser.feed("PKTDUMP: data received:", arrival=2.0)
+        []
+        >>> res = parser.feed("Packets received: 1", arrival=3.0)
+        >>> [(r["arrival"], r["size"], r["complete"]) for r in res]
+        [(2.0, None, False), (3.0, None, True)]
+        """
+        res = []
+        if arrival is None:
+            arrival = time.time()
+        received = self.c_received.search(line)
+        if received or self.c_pktdump.search(line):
+            if self.pending is not None:
+                res.append(self.flush())
+            packet = {
+                "arrival": arrival,
+                "size": None,
+                "snips": [],
+                "complete": bool(received),
+            }
+            if received:
+                # no packet dump to follow
+                res.append(packet)
+            else:
+                self.pending = packet
+            return res
+        if self.pending is None:
+            return res
+        m = self.c_snip.search(line)
+        if m is not None:
+            self.pending["snips"].append(
+                {"type": m.group("type"), "size": int(m.group("size"))}
+            )
+            return res
+        m = self.c_pkt.search(line)
+        if m is not None:
+            packet = self.pending
+            self.pending = None
+            packet["size"] = int(m.group("size"))
+            packet["complete"] = int(m.group("snips")) == len(
+                packet["snips"]
+            ) and self._has_snip_layout(packet)
+            res.append(packet)
+        return res
+
+    def parse(self, cmd_output):
+        """
+        Parses the complete output of the UDP server
+
+        >>> parser = GNRCUDPServerOutputParser()
+        >>> res = parser.parse("Packets received: 1\\n"
+        ...                    "PKTDUMP: data received:\\n"
+        ...                    "~~ PKT    -  4 snips, total size:  76 byte\\n"
+        ...                    "PKTDUMP: data received:\\n")
+        >>> [(r["size"], r["complete"]) for r in res]
+        [(None, True), (76, False), (None, False)]
+        """
+        self.pending = None
+        res = []
+        for line in cmd_output.splitlines():
+            res.extend(self.feed(line))
+        packet = self.flush()
+        if packet is not None:
+            res.append(packet)
+        return res
+
+
 class GNRCLoRaWANSend(ShellInteraction):
     """
     Shell interaction for
@@ -116,43 +272,44 @@ class GNRCUDP(ShellInteraction):
     def udp_server_stop(self, timeout=-1, async_=False):
         return self.cmd("udp server stop", timeout=timeout, async_=async_)
 
-    def udp_server_check_output(self, count, delay_ms):
-        packets_lost = 0
+    def udp_server_receive(self, count, delay_ms):
+        """
+        Waits for `count` packets to be received by the UDP server, consuming
+        the output of the server line by line.
+
+        :param count: Number of packets expected
+        :param delay_ms: Delay between the packets in milliseconds
+        :return: List of `count` packet records as returned by
+                 GNRCUDPServerOutputParser.feed() in the order they were
+                 received. Lost packets are None.
+        """
         if delay_ms > 0:
             timeout = (delay_ms / 1000) * 10
         else:
             timeout = 1
-        for _ in range(count):
+        parser = GNRCUDPServerOutputParser()
+        res = []
+        deadline = time.monotonic() + timeout
+        while len(res) < count:
             exp = self.riotctrl.term.expect(
-                [
-                    pexpect.TIMEOUT,
-                    r"Packets received:\s+\d",
-                    r"PKTDUMP: data received:",
-                ],
-                timeout=timeout,
+                [pexpect.TIMEOUT, r"\r?\n"],
+                timeout=max(deadline - time.monotonic(), 0),
             )
             if not exp:  # expect timed out
-                packets_lost += 1
-            if exp < 2:
+                # either the pending packet or the next one is lost
+                parser.flush()
+                res.append(None)
+                deadline = time.monotonic() + timeout
                 continue
-            try:
-                self.riotctrl.term.expect(
-                    r"~~ SNIP  0 - size:\s+\d+ byte, type: NETTYPE_UNDEF \(\d+\)"
-                )
-                self.riotctrl.term.expect(
-                    r"~~ SNIP  1 - size:\s+\d+ byte, type: NETTYPE_UDP \(\d+\)"
-                )
-                self.riotctrl.term.expect(
-                    r"~~ SNIP  2 - size:\s+40 byte, type: NETTYPE_IPV6 \(\d+\)"
-                )
-                self.riotctrl.term.expect(
-                    r"~~ SNIP  3 - size:\s+\d+ byte, type: NETTYPE_NETIF \(-1\)"
-                )
-                self.riotctrl.term.expect(
-                    r"~~ PKT\s+-\s+4 snips, total size:\s+\d+ byte"
-                )
-            except pexpect.TIMEOUT:
-                packets_lost += 1
+            packets = parser.feed(self.riotctrl.term.before)
+            if packets:
+                deadline = time.monotonic() + timeout
+            res.extend(packet if packet["complete"] else None for packet in packets)
+        return res[:count]
+
+    def udp_server_check_output(self, count, delay_ms):
+        packets = self.udp_server_receive(count, delay_ms)
+        packets_lost = sum(packet is None for packet in packets)
         return (packets_lost / count) * 100
 
     # pylint: disable=R0913
@@ -177,6 +334,41 @@ class GNRCUDP(ShellInteraction):
         return res
 
 
+def fan_out(nodes, func, *args, **kwargs):
+    """
+    Runs `func(node, *args, **kwargs)` for all `nodes` concurrently, e.g. to
+    run a shell interaction on multiple nodes in one round trip.
+
+    :return: List of the return values of `func` in the order of `nodes`
+    :raises: The first exception raised by `func`, in the order of `nodes`,
+             once all calls finished
+
+    >>> fan_out(["a", "b", "c"], str.upper)
+    ['A', 'B', 'C']
+    """
+    if not nodes:
+        return []
+    with ThreadPoolExecutor(max_workers=len(nodes)) as executor:
+        futures = [executor.submit(func, node, *args, **kwargs) for node in nodes]
+    return [future.result() for future in futures]
+
+
+def set_channel(nodes, channel, ignore_chan_0=False):
+    """
+    Sets the channel of the first interface of all `nodes` concurrently
+
+    :return: List of tuples of the interface and its link-local address, in
+             the order of `nodes`
+    """
+
+    def _set_channel(node):
+        netif, addr = lladdr(node.ifconfig_list(), ignore_chan_0=ignore_chan_0)
+        node.ifconfig_set(netif, "channel", channel)
+        return netif, addr
+
+    return fan_out(nodes, _set_channel)
+
+
 def ping6(pinger, hostname, count, packet_size, interval):
     out = pinger.ping6(
         hostname, count=count, packet_size=packet_size, interval=interval
@@ -221,11 +413,36 @@ def global_addr(ifconfig_out):
     return first_netif_and_addr_by_scope(ifconfig_out, "global")
 
 
-def check_pktbuf(*nodes, wait=10):
-    if wait:
-        time.sleep(wait)
-    for n in nodes:
-        assert pktbuf(n).is_empty()
+def check_pktbuf(*nodes, wait=10, interval=0.5, backoff=2):
+    """
+    Waits for the packet buffers of all `nodes` to drain. The nodes are queried
+    concurrently until all packet buffers are empty, first right away, then
+    after `interval` seconds, with the interval multiplied by `backoff` after
+    every round.
+
+    :param wait: Deadline in seconds for the packet buffers to be empty. If 0,
+                 the nodes are only queried once.
+    :raises AssertionError: if a packet buffer is not empty after `wait`
+                            seconds
+    :return: Time in seconds it took the packet buffers to drain
+    """
+    start = time.monotonic()
+    deadline = start + wait
+    while True:
+        full = [
+            node
+            for node, res in zip(nodes, fan_out(nodes, pktbuf))
+            if not res.is_empty()
+        ]
+        remaining = deadline - time.monotonic()
+        if not full or remaining <= 0:
+            break
+        time.sleep(min(interval, remaining))
+        interval *= backoff
+    drain_time = time.monotonic() - start
+    assert not full, f"Packet buffer not empty after {drain_time:.1f} s: {full}"
+    logger.info(f"Packet buffers drained after {drain_time:.1f} s")
+    return drain_time
 
 
 def lorawan_netif(node):
@@ -0,0 +1,141 @@
+"""
+Shared SSH connections to the IoT-LAB site front-ends
+"""
+
+import logging
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+
+# seconds to wait for the front-end when checking if it is reachable
+CONNECT_TIMEOUT = 5
+# seconds a master connection stays open after its last client exited
+CONTROL_PERSIST = 600
+
+
+def reachable(destination, command=("ssh",), timeout=CONNECT_TIMEOUT):
+    """
+    Checks if `destination` accepts an SSH login without any interaction,
+    i.e. with a key without password or via `ssh-agent` and a known host key
+
+    :param command: The ssh command line to use, e.g. `SSHMultiplexer.command()`
+    """
+    try:
+        return (
+            subprocess.run(
+                list(command)
+                + [
+                    "-o",
+                    "BatchMode=yes",
+                    "-o",
+                    f"ConnectTimeout={timeout}",
+                    destination,
+                    "true",
+                ],
+                stdin=subprocess.DEVNULL,
+                # a master connection started in the background would keep
+                # pipes open
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=timeout * 2,
+                check=False,
+            ).returncode
+            == 0
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+
+class SSHMultiplexer:
+    """
+    Multiplexes all SSH connections to the same user and host over one master
+    connection, which is set up by the first connection and kept open in the
+    background for `persist` seconds after the last one. The control sockets
+    are kept in `control_dir`, a new temporary directory if not given.
+
+    Tools started by make, e.g. `make term` or the flashers of the IoT-LAB
+    A8 nodes, use the master connections when the `env` they run with is
+    passed through `configure()`.
+    """
+
+    def __init__(self, control_dir=None, persist=CONTROL_PERSIST, ssh=None):
+        self.ssh = ssh or shutil.which("ssh") or "ssh"
+        self.persist = persist
+        self._own_dir = control_dir is None
+        # UNIX socket paths must be short, so not below pytest's basetemp
+        self.control_dir = str(control_dir or tempfile.mkdtemp(prefix="riot-ssh-"))
+        self._bindir = None
+
+    def __repr__(self):
+        return f"<SSHMultiplexer: {self.control_dir}>"
+
+    def options(self):
+        """ssh options to use the master connections"""
+        return [
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            f"ControlPath={os.path.join(self.control_dir, '%r@%h:%p')}",
+            "-o",
+            f"ControlPersist={self.persist}",
+        ]
+
+    def command(self):
+        """ssh command line using the master connections"""
+        return [self.ssh] + self.options()
+
+    def reachable(self, destination, timeout=CONNECT_TIMEOUT):
+        """`reachable()` via the master connection to `destination`, which
+        is set up if it is not open yet"""
+        return reachable(destination, self.command(), timeout)
+
+    @property
+    def bindir(self):
+        """Directory with an `ssh` wrapper that uses the master connections"""
+        if self._bindir is None:
+            bindir = os.path.join(self.control_dir, "bin")
+            os.makedirs(bindir, exist_ok=True)
+            wrapper = os.path.join(bindir, "ssh")
+            with open(wrapper, "w", encoding="utf-8") as file:
+                file.write(f'#!/bin/sh\nexec {shlex.join(self.command())} "$@"\n')
+            os.chmod(wrapper, 0o755)
+            self._bindir = bindir
+        return self._bindir
+
+    def configure(self, env):
+        """Makes `ssh` in PATH of `env` use the master connections"""
+        path = env.get("PATH", os.environ.get("PATH", os.defpath))
+        if not path.startswith(self.bindir + os.pathsep):
+            env["PATH"] = self.bindir + os.pathsep + path
+        return env
+
+    def sockets(self):
+        """Control sockets of the open master connections"""
+        if not os.path.isdir(self.control_dir):
+            return []
+        return sorted(
+            os.path.join(self.control_dir, name)
+            for name in os.listdir(self.control_dir)
+            if "@" in name
+        )
+
+    def close(self):
+        """Closes all master connections"""
+        for socket in self.sockets():
+            # the destination is required, but the socket determines the host
+            try:
+                subprocess.run(
+                    [self.ssh, "-S", socket, "-O", "exit", "front-end"],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=CONNECT_TIMEOUT,
+                    check=False,
+                )
+            except (OSError, subprocess.TimeoutExpired) as exc:
+                logging.warning(f"Unable to close SSH master {socket}: {exc}")
+        if self._own_dir:
+            shutil.rmtree(self.control_dir, ignore_errors=True)
+        self._bindir = None
@@ -0,0 +1,107 @@
+"""
+Statistics over the results of the shell interactions in `testutils.shell`
+"""
+
+import numpy as np
+
+RTT_PERCENTILES = (50, 90, 99)
+
+
+def _loss_bursts(received, count):
+    """
+    Lengths of the runs of consecutive lost packets
+
+    >>> _loss_bursts(np.array([0, 3, 4, 8]), 10).tolist()
+    [2, 3, 1]
+    """
+    lost = np.ones(count, dtype=np.int8)
+    lost[received[(received >= 0) & (received < count)]] = 0
+    edges = np.diff(np.concatenate(([0], lost, [0])))
+    return np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+
+def ping6_stats(ping6_res, count):
+    """
+    Calculates latency and loss statistics of a ping run
+
+    :param ping6_res: Result of `testutils.shell.ping6()`
+    :param count: Number of echo requests sent
+    :return: dict of the statistics. "rtt" has the "min", "mean", "p50",
+             "p90", "p99", and "max" round-trip time in ms, "jitter" is the
+             mean difference in ms between the round-trip times of
+             consecutive replies, "loss_bursts" has the "count" and "max"
+             length of runs of consecutively lost packets, and "reordered" is
+             the number of replies received after a later one.
+
+    >>> stats = ping6_stats({"replies": [
+    ...     {"seq": 0, "rtt": 10.0, "dup": False},
+    ...     {"seq": 2, "rtt": 12.0, "dup": False},
+    ...     {"seq": 1, "rtt": 16.0, "dup": False},
+    ...     {"seq": 1, "rtt": 17.0, "dup": True},
+    ...     {"seq": 5, "rtt": 14.0, "dup": False},
+    ... ]}, count=8)
+    >>> stats["received"], stats["packet_loss"], stats["reordered"]
+    (4, 50.0, 1)
+    >>> stats["rtt"]["min"], stats["rtt"]["p50"], stats["rtt"]["max"]
+    (10.0, 13.0, 16.0)
+    >>> stats["jitter"]
+    4.0
+    >>> stats["loss_bursts"]
+    {'count': 2, 'max': 2}
+    """
+    replies = [reply for reply in ping6_res.get("replies", []) if not reply.get("dup")]
+    seqs = np.array([reply["seq"] for reply in replies], dtype=np.int64)
+    received = np.unique(seqs)
+    bursts = _loss_bursts(received, count)
+    res = {
+        "count": count,
+        "received": len(received),
+        "packet_loss": float(100 * (1 - len(received) / count)),
+        "rtt": {},
+        "jitter": None,
+        "loss_bursts": {
+            "count": len(bursts),
+            "max": int(bursts.max()) if len(bursts) else 0,
+        },
+        # replies arriving after a reply to a later request
+        "reordered": (
+            int(np.count_nonzero(seqs < np.maximum.accumulate(seqs)))
+            if len(seqs)
+            else 0
+        ),
+    }
+    timed = sorted(
+        (reply["seq"], reply["rtt"])
+        for reply in replies
+        if reply.get("rtt") is not None
+    )
+    if not timed:
+        return res
+    rtts = np.array([rtt for _, rtt in timed], dtype=np.float64)
+    percentiles = np.percentile(rtts, RTT_PERCENTILES)
+    res["rtt"] = {
+        "min": float(rtts.min()),
+        "mean": float(rtts.mean()),
+        **{f"p{p}": float(v) for p, v in zip(RTT_PERCENTILES, percentiles)},
+        "max": float(rtts.max()),
+    }
+    if len(rtts) > 1:
+        res["jitter"] = float(np.abs(np.diff(rtts)).mean())
+    return res
+
+
+def flatten(stats, prefix):
+    """
+    Flattens nested statistics to (name, value) pairs, e.g. to record them as
+    properties of a test in the JUnit XML report
+
+    >>> flatten({"rtt": {"min": 1.0, "max": 2.0}, "jitter": None}, "ping6")
+    [('ping6.rtt.min', 1.0), ('ping6.rtt.max', 2.0), ('ping6.jitter', None)]
+    """
+    res = []
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            res.extend(flatten(value, f"{prefix}.{key}"))
+        else:
+            res.append((f"{prefix}.{key}", value))
+    return res
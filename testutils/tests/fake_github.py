@@ -0,0 +1,378 @@
+"""
+Offline stand-in for the parts of the GitHub REST API and of the gist hosting
+that `testutils.github` uses
+"""
+
+import collections
+import hashlib
+import http.server
+import json
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import urllib.parse
+
+import testutils.github
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "Your Name",
+    "GIT_AUTHOR_EMAIL": "you@example.org",
+    "GIT_COMMITTER_NAME": "Your Name",
+    "GIT_COMMITTER_EMAIL": "you@example.org",
+}
+
+
+class FakeGithubStats:
+    """API calls and bytes transferred by a FakeGithub"""
+
+    def __init__(self):
+        self.calls = collections.Counter()
+        self.writes = 0
+        self.not_modified = 0
+        self.git_requests = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+    @property
+    def api_calls(self):
+        return sum(self.calls.values())
+
+    def as_dict(self):
+        return {
+            "api_calls": self.api_calls,
+            "writes": self.writes,
+            "not_modified": self.not_modified,
+            "git_requests": self.git_requests,
+            "bytes_received": self.bytes_received,
+            "bytes_sent": self.bytes_sent,
+        }
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    # (method, route, handler name) of the REST API
+    ROUTES = [
+        ("GET", "/user", "get_user"),
+        ("GET", "/repos/{repo}", "get_repo"),
+        ("GET", "/repos/{repo}/issues", "get_issues"),
+        ("GET", "/repos/{repo}/issues/{number}", "get_issue"),
+        ("PATCH", "/repos/{repo}/issues/{number}", "edit_issue"),
+        ("GET", "/repos/{repo}/issues/{number}/comments", "get_comments"),
+        ("POST", "/repos/{repo}/issues/{number}/comments", "create_comment"),
+        ("PATCH", "/repos/{repo}/issues/comments/{id}", "edit_comment"),
+        ("GET", "/gists", "get_gists"),
+        ("POST", "/gists", "create_gist"),
+    ]
+    GIT_ROUTE = re.compile(
+        r"/gist/(?P<id>[0-9a-f]+)(?P<path>/(info/refs|HEAD|git-[a-z-]+|objects/.+))"
+    )
+
+    server_version = "FakeGithub/1.0"
+
+    def log_message(self, format, *args):  # pylint: disable=W0622
+        pass
+
+    @property
+    def github(self):
+        return self.server.github
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if not size:
+                    self.rfile.readline()
+                    return body
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.github.lock:
+            self.github.stats.bytes_sent += len(body)
+
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj).encode()
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            with self.github.lock:
+                self.github.stats.not_modified += 1
+            self._send(304, headers={"ETag": etag})
+            return
+        self._send(
+            status, body, headers={"Content-Type": "application/json", "ETag": etag}
+        )
+
+    def _handle(self, method):
+        body = self._read_body()
+        with self.github.lock:
+            self.github.stats.bytes_received += len(body)
+        url = urllib.parse.urlsplit(self.path)
+        m = self.GIT_ROUTE.fullmatch(url.path)
+        if m is not None:
+            self._git(method, m["id"], m["path"], url.query, body)
+            return
+        for route_method, route, name in self.ROUTES:
+            pattern = route.format(
+                repo=re.escape(self.github.repo_name),
+                number=r"(?P<number>\d+)",
+                id=r"(?P<id>\d+)",
+            )
+            m = re.fullmatch(pattern, url.path)
+            if route_method == method and m is not None:
+                with self.github.lock:
+                    self.github.stats.calls[f"{method} {route}"] += 1
+                    if method != "GET":
+                        self.github.stats.writes += 1
+                    res = getattr(self.github, name)(
+                        json.loads(body) if body else None, **m.groupdict()
+                    )
+                if res is None:
+                    self._send_json({"message": "Not Found"}, status=404)
+                else:
+                    status, obj = res
+                    self._send_json(obj, status=status)
+                return
+        self._send_json({"message": "Not Found"}, status=404)
+
+    def _git(self, method, gist_id, path, query, body):
+        with self.github.lock:
+            self.github.stats.git_requests += 1
+        env = dict(
+            os.environ,
+            GIT_PROJECT_ROOT=self.github.gistdir,
+            GIT_HTTP_EXPORT_ALL="1",
+            PATH_INFO=f"/{gist_id}{path}",
+            QUERY_STRING=query,
+            REQUEST_METHOD=method,
+            CONTENT_TYPE=self.headers.get("Content-Type", ""),
+            CONTENT_LENGTH=str(len(body)),
+            # allows pushing
+            REMOTE_USER=self.github.user,
+            REMOTE_ADDR=self.client_address[0],
+        )
+        for header in ["Content-Encoding", "Git-Protocol"]:
+            if header in self.headers:
+                env[f"HTTP_{header.upper().replace('-', '_')}"] = self.headers[header]
+        output = subprocess.run(
+            ["git", "http-backend"],
+            input=body,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        ).stdout
+        self._send(*self._parse_cgi_output(output))
+
+    @staticmethod
+    def _parse_cgi_output(output):
+        head, _, content = output.partition(b"\r\n\r\n")
+        status = 200
+        headers = {}
+        for line in head.decode().splitlines():
+            name, _, value = line.partition(":")
+            if name.lower() == "status":
+                status = int(value.split()[0])
+            else:
+                headers[name] = value.strip()
+        return status, content, headers
+
+    def do_GET(self):  # pylint: disable=C0103
+        self._handle("GET")
+
+    def do_POST(self):  # pylint: disable=C0103
+        self._handle("POST")
+
+    def do_PATCH(self):  # pylint: disable=C0103
+        self._handle("PATCH")
+
+
+class FakeGithub:  # pylint: disable=R0902
+    """
+    Serves the issues and comments of one repository and the gists of one
+    user on localhost, including git over HTTP for the gists. Counts the API
+    calls and the bytes transferred in `stats`.
+
+    Use `url` as `testutils.github.API_URL`.
+    """
+
+    def __init__(self, rootdir, user="user", repo_name=testutils.github.REPO_NAME):
+        self.gistdir = os.path.join(str(rootdir), "gists")
+        os.makedirs(self.gistdir, exist_ok=True)
+        self.user = user
+        self.repo_name = repo_name
+        self.issues = {}
+        self.comments = {}
+        self.gists = {}
+        self.stats = FakeGithubStats()
+        self.lock = threading.RLock()
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.github = self
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = FakeGithubStats()
+
+    def _user_json(self):
+        return {
+            "login": self.user,
+            "id": 1,
+            "type": "User",
+            "url": f"{self.url}/users/{self.user}",
+        }
+
+    def _repo_json(self):
+        return {
+            "id": 1,
+            "name": self.repo_name.split("/")[1],
+            "full_name": self.repo_name,
+            "url": f"{self.url}/repos/{self.repo_name}",
+            "html_url": f"{self.url}/{self.repo_name}",
+        }
+
+    def _issue_json(self, number):
+        issue = self.issues[number]
+        return {
+            "id": number,
+            "number": number,
+            "title": issue["title"],
+            "body": issue["body"],
+            "state": "open",
+            "user": self._user_json(),
+            "url": f"{self.url}/repos/{self.repo_name}/issues/{number}",
+            "html_url": f"{self.url}/{self.repo_name}/issues/{number}",
+        }
+
+    def _comment_json(self, comment_id):
+        comment = self.comments[comment_id]
+        return {
+            "id": comment_id,
+            "body": comment["body"],
+            "user": self._user_json(),
+            "url": f"{self.url}/repos/{self.repo_name}/issues/comments/{comment_id}",
+            "html_url": f"{self.url}/{self.repo_name}/issues/{comment['issue']}"
+            f"#issuecomment-{comment_id}",
+        }
+
+    def _gist_json(self, gist_id):
+        gist = self.gists[gist_id]
+        return {
+            "id": gist_id,
+            "description": gist["description"],
+            "public": gist["public"],
+            "owner": self._user_json(),
+            "files": {name: {"filename": name} for name in gist["files"]},
+            "url": f"{self.url}/gists/{gist_id}",
+            "html_url": f"{self.url}/gist/{gist_id}",
+        }
+
+    def add_issue(self, title, body):
+        with self.lock:
+            number = len(self.issues) + 1
+            self.issues[number] = {"title": title, "body": body}
+            return number
+
+    def add_comment(self, number, body):
+        with self.lock:
+            comment_id = len(self.comments) + 1
+            self.comments[comment_id] = {"issue": number, "body": body}
+            return comment_id
+
+    def issue_body(self, number):
+        with self.lock:
+            return self.issues[number]["body"]
+
+    def issue_comments(self, number):
+        with self.lock:
+            return [c["body"] for c in self.comments.values() if c["issue"] == number]
+
+    def gist_repo(self, gist_id):
+        return os.path.join(self.gistdir, gist_id)
+
+    # pylint: disable=W0613
+    def get_user(self, data):
+        return 200, self._user_json()
+
+    def get_repo(self, data):
+        return 200, self._repo_json()
+
+    def get_issues(self, data):
+        return 200, [self._issue_json(number) for number in self.issues]
+
+    def get_issue(self, data, number):
+        if int(number) not in self.issues:
+            return None
+        return 200, self._issue_json(int(number))
+
+    def edit_issue(self, data, number):
+        if int(number) not in self.issues:
+            return None
+        self.issues[int(number)].update(
+            {k: v for k, v in data.items() if k in ["title", "body"]}
+        )
+        return 200, self._issue_json(int(number))
+
+    def get_comments(self, data, number):
+        return 200, [
+            self._comment_json(comment_id)
+            for comment_id, comment in self.comments.items()
+            if comment["issue"] == int(number)
+        ]
+
+    def create_comment(self, data, number):
+        if int(number) not in self.issues:
+            return None
+        return 201, self._comment_json(self.add_comment(int(number), data["body"]))
+
+    def edit_comment(self, data, id):  # pylint: disable=W0622
+        if int(id) not in self.comments:
+            return None
+        self.comments[int(id)]["body"] = data["body"]
+        return 200, self._comment_json(int(id))
+
+    def get_gists(self, data):
+        return 200, [self._gist_json(gist_id) for gist_id in self.gists]
+
+    def create_gist(self, data):
+        gist_id = hashlib.sha1(f"gist-{len(self.gists)}".encode()).hexdigest()[:20]
+        repo = self.gist_repo(gist_id)
+        env = dict(os.environ, **GIT_ENV)
+        subprocess.run(["git", "init", "-q", "--bare", repo], check=True, env=env)
+        with tempfile.TemporaryDirectory() as worktree:
+            for name, file in data["files"].items():
+                with open(os.path.join(worktree, name), "w", encoding="utf-8") as f:
+                    f.write(file["content"])
+            git = ["git", f"--git-dir={repo}", f"--work-tree={worktree}"]
+            subprocess.run(git + ["add", "-A"], check=True, env=env)
+            subprocess.run(git + ["commit", "-q", "-m", "Create"], check=True, env=env)
+        self.gists[gist_id] = {
+            "description": data.get("description"),
+            "public": data.get("public", True),
+            "files": list(data["files"]),
+        }
+        return 201, self._gist_json(gist_id)
@@ -0,0 +1,250 @@
+import importlib.util
+import os
+import re
+import subprocess
+import types
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import testutils.build
+
+TEST_MODULE = """
+APP = 'examples/networking/gnrc/networking'
+MODULES = ["shell_cmd_gnrc_pktbuf"]
+
+
+def fixture_nodes(riot_ctrl):
+    return riot_ctrl(0, APP, Shell, modules="l2filter_whitelist")
+
+
+def test_task01(riot_ctrl):
+    pinger, pinged = (
+        riot_ctrl(0, APP, Shell, modules=MODULES),
+        riot_ctrl(1, 'tests/net/gnrc_udp', Shell, cflags="-DFOOBAR"),
+    )
+
+
+def test_task02(riot_ctrl, fixture_nodes):
+    node = riot_ctrl(1, APP, Shell, port="tap0")
+    others = [riot_ctrl(i, APP, Shell) for i in range(2)]
+    contiki = riot_ctrl(1, APP, Shell, extras={"BINFILE": "contiki.bin"})
+    unknown = riot_ctrl(1, APP, Shell, extras={"FOO": contiki})
+    samr21 = riot_ctrl(0, APP, Shell, board_type="samr21-xpro")
+"""
+
+
+def build_env(board, modules=None, cflags=None, extras=None):
+    env = {"BOARD": board}
+    if modules:
+        env["USEMODULE"] = modules if isinstance(modules, str) else " ".join(modules)
+    if cflags:
+        env["CFLAGS"] = cflags
+    env.update(extras or {})
+    return env
+
+
+@pytest.fixture
+def test_module(tmp_path):
+    filename = tmp_path / "test_module.py"
+    filename.write_text(TEST_MODULE)
+    spec = importlib.util.spec_from_file_location("test_module", filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    yield module
+
+
+@pytest.mark.parametrize(
+    "name,fixturenames,boards,expected",
+    [
+        ("test_task01", ["riot_ctrl"], [], set()),
+        (
+            "test_task01",
+            ["riot_ctrl"],
+            ["iotlab-m3", "samr21-xpro"],
+            {
+                testutils.build.Firmware.create(
+                    "examples/networking/gnrc/networking",
+                    {"BOARD": "iotlab-m3", "USEMODULE": "shell_cmd_gnrc_pktbuf"},
+                ),
+                testutils.build.Firmware.create(
+                    "tests/net/gnrc_udp",
+                    {"BOARD": "samr21-xpro", "CFLAGS": "-DFOOBAR"},
+                ),
+            },
+        ),
+        (
+            "test_task02",
+            ["riot_ctrl", "fixture_nodes"],
+            ["native", "native"],
+            {
+                testutils.build.Firmware.create(
+                    "examples/networking/gnrc/networking",
+                    {"BOARD": "native", "USEMODULE": "l2filter_whitelist"},
+                ),
+                testutils.build.Firmware.create(
+                    "examples/networking/gnrc/networking", {"BOARD": "native"}
+                ),
+                testutils.build.Firmware.create(
+                    "examples/networking/gnrc/networking", {"BOARD": "samr21-xpro"}
+                ),
+            },
+        ),
+        (
+            "test_task02",
+            ["riot_ctrl"],
+            ["native"],
+            {
+                testutils.build.Firmware.create(
+                    "examples/networking/gnrc/networking", {"BOARD": "samr21-xpro"}
+                ),
+            },
+        ),
+    ],
+)
+# pylint: disable=redefined-outer-name
+def test_item_firmwares(test_module, name, fixturenames, boards, expected):
+    item = types.SimpleNamespace(
+        module=test_module, name=name, originalname=name, fixturenames=fixturenames
+    )
+    assert testutils.build.item_firmwares(item, boards, build_env) == expected
+
+
+def test_item_firmwares_no_module():
+    item = types.SimpleNamespace(name="test_foobar")
+    assert not testutils.build.item_firmwares(item, ["native"], build_env)
+
+
+@pytest.mark.parametrize("returncode", [0, 2])
+def test_build(monkeypatch, caplog, returncode):
+    run_args = {}
+
+    def mock_run(cmd, env, **kwargs):
+        run_args.update(kwargs)
+        run_args["cmd"] = cmd
+        run_args["env"] = env
+        return subprocess.CompletedProcess(cmd, returncode, stderr=b"don't panic")
+
+    monkeypatch.setattr(testutils.build.subprocess, "run", mock_run)
+    firmware = testutils.build.Firmware.create(
+        "tests/net/gnrc_udp", {"BOARD": "iotlab-m3"}
+    )
+    assert testutils.build.build(firmware, "/riot", "/bindir") == (
+        firmware,
+        returncode,
+    )
+    assert run_args["cmd"][-2:] == ["/riot/tests/net/gnrc_udp", "all"]
+    assert run_args["env"]["BOARD"] == "iotlab-m3"
+    assert run_args["env"]["BINDIR"] == "/bindir"
+    if returncode:
+        assert "don't panic" in caplog.text
+    else:
+        assert "don't panic" not in caplog.text
+
+
+def test_riot_revision(monkeypatch):
+    monkeypatch.setattr(testutils.build.Git, "head_sha", "abcdef")
+    monkeypatch.setattr(testutils.build.Git, "diff", lambda self, *args: "")
+    assert testutils.build.riot_revision("/riot") == "abcdef"
+    monkeypatch.setattr(testutils.build.Git, "diff", lambda self, *args: "+foobar")
+    assert re.match(r"abcdef-[0-9a-f]{12}$", testutils.build.riot_revision("/riot"))
+
+
+def test_riot_revision_error(caplog, tmp_path):
+    assert testutils.build.riot_revision(tmp_path / "foobar") is None
+    assert "returned non-zero exit status" in caplog.text
+
+
+def test_build_cache(tmp_path):
+    cache = testutils.build.BuildCache(tmp_path, "abcdef")
+    other_cache = testutils.build.BuildCache(tmp_path, "123456")
+    firmware = testutils.build.Firmware.create("foobar", {"BOARD": "native"})
+    assert repr(cache) == f"<BuildCache: {tmp_path}>"
+    assert cache.bindir(firmware) != other_cache.bindir(firmware)
+    assert cache.bindir(firmware).startswith(str(tmp_path))
+    assert cache.lookup(firmware) is None
+    # half-finished build
+    os.makedirs(cache.bindir(firmware))
+    assert cache.lookup(firmware) is None
+    assert cache.add(firmware) == cache.bindir(firmware)
+    assert cache.lookup(firmware) == cache.bindir(firmware)
+    assert other_cache.lookup(firmware) is None
+    # without max size nothing is evicted
+    assert not cache.evict()
+
+
+def test_build_cache_evict(tmp_path):
+    cache = testutils.build.BuildCache(tmp_path, "abcdef", max_size=2500)
+    firmwares = [
+        testutils.build.Firmware.create("foobar", {"BOARD": board})
+        for board in ["native", "iotlab-m3", "samr21-xpro", "nrf52dk"]
+    ]
+    for i, firmware in enumerate(firmwares):
+        bindir = cache.add(firmware)
+        with open(os.path.join(bindir, "firmware.elf"), "wb") as elf:
+            elf.write(b"\0" * 1000)
+        os.utime(os.path.join(bindir, cache.COMPLETE_FILE), (i, i))
+    # incomplete builds are evicted first
+    incomplete = os.path.join(tmp_path, "incomplete")
+    os.makedirs(incomplete)
+    # mark firmwares[0] as recently used
+    assert cache.lookup(firmwares[0])
+    assert cache.evict() == [
+        incomplete,
+        cache.bindir(firmwares[1]),
+        cache.bindir(firmwares[2]),
+    ]
+    assert cache.lookup(firmwares[0])
+    assert not cache.lookup(firmwares[1])
+    assert not cache.lookup(firmwares[2])
+    assert cache.lookup(firmwares[3])
+    assert not cache.evict()
+
+
+def test_build_cache_evict_no_cachedir(tmp_path):
+    cache = testutils.build.BuildCache(tmp_path / "foobar", "abcdef", max_size=0)
+    assert not cache.evict()
+
+
+def test_prebuild(monkeypatch, tmp_path):
+    cache = testutils.build.BuildCache(tmp_path, "abcdef")
+    firmwares = {
+        testutils.build.Firmware.create("foobar", {"BOARD": "native"}),
+        testutils.build.Firmware.create("foobar", {"BOARD": "iotlab-m3"}),
+        testutils.build.Firmware.create("snafu", {"BOARD": "native"}),
+    }
+    cached = testutils.build.Firmware.create("cached", {"BOARD": "native"})
+    cache.add(cached)
+    built = []
+
+    def mock_build(firmware, riotbase, bindir):
+        assert riotbase == "/riot"
+        assert bindir == cache.bindir(firmware)
+        built.append(firmware)
+        return firmware, int(firmware.application_dir == "snafu")
+
+    monkeypatch.setattr(testutils.build, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(testutils.build, "build", mock_build)
+    res = testutils.build.prebuild(firmwares | {cached}, "/riot", cache, jobs=2)
+    assert set(built) == firmwares
+    assert res == {f for f in firmwares if f.application_dir == "foobar"}
+    for firmware in firmwares:
+        if firmware in res:
+            assert cache.lookup(firmware) == cache.bindir(firmware)
+        else:
+            assert cache.lookup(firmware) is None
+
+
+def test_prebuild_empty(tmp_path):
+    cache = testutils.build.BuildCache(tmp_path, "abcdef")
+    assert not testutils.build.prebuild(set(), "/riot", cache)
+
+
+def test_build_cache_lock(tmp_path):
+    cache = testutils.build.BuildCache(tmp_path / "cache", "abcdef")
+    firmware = testutils.build.Firmware.create("foobar", {"BOARD": "native"})
+    with cache.lock(firmware):
+        assert os.path.exists(f"{cache.bindir(firmware)}.lock")
+    # lock files are no cache entries
+    assert not cache._entries()  # pylint: disable=protected-access
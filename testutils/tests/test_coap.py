@@ -0,0 +1,88 @@
+import asyncio
+
+import aiocoap
+import pytest
+
+from aiocoap.numbers import TransportTuning
+
+import testutils.coap
+
+
+class FastRetransmissions(TransportTuning):
+    ACK_TIMEOUT = 0.05
+
+
+class MockServer(asyncio.DatagramProtocol):
+    """Responds to every CoAP request with its block size, ignoring the first
+    transmission of a request if `drop` is set"""
+
+    def __init__(self, drop=False):
+        self.drop = drop
+        self.seen = set()
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        request = aiocoap.Message.decode(data)
+        if self.drop and request.mid not in self.seen:
+            self.seen.add(request.mid)
+            return
+        response = aiocoap.Message(
+            code=aiocoap.CONTENT, payload=str(request.opt.block2.size).encode()
+        )
+        response.mtype = aiocoap.ACK
+        response.mid = request.mid
+        response.token = request.token
+        self.transport.sendto(response.encode(), addr)
+
+
+def run_sweep(drop, block_sizes, concurrency):
+    async def sweep():
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: MockServer(drop), local_addr=("::1", 0)
+        )
+        port = transport.get_extra_info("sockname")[1]
+
+        def request(block_size):
+            # pylint: disable=E1101
+            msg = aiocoap.Message(
+                code=aiocoap.GET,
+                uri=f"coap://[::1]:{port}/riot/ver",
+                transport_tuning=FastRetransmissions(),
+            )
+            # pylint: disable=E0237
+            msg.opt.block2 = aiocoap.optiontypes.BlockOption.BlockwiseTuple(
+                0, 0, testutils.coap.block_exp(block_size)
+            )
+            return msg
+
+        try:
+            async with testutils.coap.client_context(settle_time=0) as context:
+                return await testutils.coap.block_sweep(
+                    context, request, block_sizes, concurrency=concurrency
+                )
+        finally:
+            transport.close()
+
+    return asyncio.run(sweep())
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_block_sweep(concurrency):
+    block_sizes = [16, 32, 64, 128, 256, 512, 1024]
+    results = run_sweep(False, block_sizes, concurrency)
+    assert [res["block_size"] for res in results] == block_sizes
+    for res in results:
+        assert str(res["response"].code) == "2.05 Content"
+        assert res["response"].payload == str(res["block_size"]).encode()
+        assert res["latency"] >= 0
+        assert res["retransmissions"] == 0
+
+
+def test_block_sweep_retransmissions():
+    results = run_sweep(True, [16, 64], 1)
+    assert [res["retransmissions"] for res in results] == [1, 1]
+    assert all(str(res["response"].code) == "2.05 Content" for res in results)
@@ -1,5 +1,6 @@
 import re
 import subprocess
+import time
 
 import pytest
 
@@ -155,3 +156,94 @@ def test_pull(bare_repo, tmp_path):
         git.log()
     git.pull()
     assert git.log() == bare_repo.log()
+
+
+def test_staging_changed_error(tmp_path):
+    with pytest.raises(testutils.git.GitError):
+        testutils.git.Git(tmp_path / 'foobar').staging_changed()
+
+
+def test_commit_files(repo_wo_remote):
+    git = repo_wo_remote
+    assert not git.commit_files([], 'nothing')
+    for name in ['a.txt', 'b.txt']:
+        (git.repodir / name).write_text(name)
+    assert git.commit_files(['a.txt', 'b.txt'], 'Add files')
+    assert git.log('--format=%s', '--name-only').split() == [
+        'Add',
+        'files',
+        'a.txt',
+        'b.txt',
+    ]
+    # unchanged files are not committed again
+    assert not git.commit_files(['a.txt', 'b.txt'], 'Add files again')
+    assert len(git.log('--oneline').splitlines()) == 1
+
+
+BENCHMARK_FILES = 50
+BENCHMARK_FILE_SIZE = 16 * 1024
+
+
+@pytest.fixture
+def git_calls(monkeypatch):
+    """Records the git processes started"""
+    calls = []
+    for name in ['check_output', 'call']:
+
+        def record(cmd, *args, _func=getattr(subprocess, name), **kwargs):
+            calls.append(cmd)
+            return _func(cmd, *args, **kwargs)
+
+        monkeypatch.setattr(subprocess, name, record)
+    yield calls
+
+
+def _write_files(git, prefix):
+    files = [f'{prefix}_{i:03d}.md' for i in range(BENCHMARK_FILES)]
+    for name in files:
+        (git.repodir / name).write_text(f'{name:63}\n' * (BENCHMARK_FILE_SIZE // 64))
+    return files
+
+
+def _benchmark(git_calls, func, *args):
+    calls = len(git_calls)
+    start = time.perf_counter()
+    res = func(*args)
+    return res, {
+        'git_calls': len(git_calls) - calls,
+        'wall_time': time.perf_counter() - start,
+    }
+
+
+def test_benchmark_commit(repo_wo_remote, git_calls, record_stats):
+    git = repo_wo_remote
+
+    def commit_per_file(files):
+        for name in files:
+            git.add(name)
+            if git.staging_changed():
+                git.commit('-m', f'Add {name}')
+
+    _, per_file = _benchmark(git_calls, commit_per_file, _write_files(git, 'a'))
+    res, batched = _benchmark(
+        git_calls, git.commit_files, _write_files(git, 'b'), 'Add results'
+    )
+    record_stats('git_benchmark.commit_per_file', per_file)
+    record_stats('git_benchmark.commit_files', batched)
+    assert res
+    assert len(git.log('--oneline').splitlines()) == BENCHMARK_FILES + 1
+    assert per_file['git_calls'] == 3 * BENCHMARK_FILES
+    # add, check staging area, commit
+    assert batched['git_calls'] == 3
+
+
+def test_benchmark_staging_changed(repo_wo_remote, git_calls, record_stats):
+    git = repo_wo_remote
+    git.add(*_write_files(git, 'a'))
+    diff, full_diff = _benchmark(git_calls, git.diff, '--cached')
+    full_diff['bytes'] = len(diff)
+    changed, quiet = _benchmark(git_calls, git.staging_changed)
+    record_stats('git_benchmark.staging_diff', full_diff)
+    record_stats('git_benchmark.staging_changed', quiet)
+    assert changed
+    assert full_diff['bytes'] > BENCHMARK_FILES * BENCHMARK_FILE_SIZE
@@ -1,6 +1,8 @@
+import gzip
 import logging
 import re
 import subprocess
+import threading
 
 import pytest
 
@@ -13,6 +15,13 @@ from .test_git import config_repo
 # pylint: disable=too-many-lines
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    testutils.github.clear_caches()
+    yield
+    testutils.github.clear_caches()
+
+
 @pytest.mark.parametrize(
     "output,expected",
     [
@@ -332,6 +341,58 @@ def test_find_task_text4():
     assert task is None
 
 
+TASK_INDEX_BODY = (
+    "- [ ] [01-spec](http://example.org/01)\r\n"
+    "  - [ ] [Task #01 - first](http://example.org/01#task-01)\r\n"
+    "  - [x] [Task #02 - second](http://example.org/01#task-02)\r\n"
+    "  - [ ] [Task #03 - third](http://example.org/01#task-03)\r\n"
+    "- [ ] [02-spec](http://example.org/02)\r\n"
+    "  - [ ] [Task #01 - first](http://example.org/02#task-01)\r\n"
+    "  - [ ] [Task #01 - duplicate](http://example.org/02#task-01)\r\n"
+)
+
+
+def test_task_index():
+    index = testutils.github.task_index(TASK_INDEX_BODY)
+    assert testutils.github.task_index(TASK_INDEX_BODY) is index
+    assert len(index) == 4
+    task_line, task = index.find({"spec": 2, "task": 1, "params": "nodes0-foo"})
+    # the first line of a task counts
+    assert task_line == "  - [ ] [Task #01 - first](http://example.org/02#task-01)"
+    assert task["name"] == "Task 01 - first"
+    assert task["spec"]["spec"] == 2
+    assert task["params"] == "foo"
+    assert index.find({"spec": 3, "task": 1}) == (None, None)
+    for spec, task in [(1, 1), (1, 2), (2, 1)]:
+        assert index.find({"spec": spec, "task": task}) == (
+            testutils.github.find_task_text(
+                TASK_INDEX_BODY.replace("\r\n", "\n"), {"spec": spec, "task": task}
+            )
+        )
+
+
+def test_task_index_mark_done():
+    index = testutils.github.task_index(TASK_INDEX_BODY)
+    tasks = [
+        {"spec": 1, "task": 1},
+        {"spec": 1, "task": 2},
+        {"spec": 2, "task": 1},
+        {"spec": 2, "task": 1},
+        {"spec": 5, "task": 1},
+    ]
+    body = index.mark_done(tasks, "user", "https://example.org/comment")
+    assert body == TASK_INDEX_BODY.replace(
+        "  - [ ] [Task #01 - first](http://example.org/01#task-01)",
+        "  - [x] [Task #01 - first](http://example.org/01#task-01) "
+        "@user (see https://example.org/comment) ",
+    ).replace(
+        "  - [ ] [Task #01 - first](http://example.org/02#task-01)",
+        "  - [x] [Task #01 - first](http://example.org/02#task-01) "
+        "@user (see https://example.org/comment) ",
+    )
+    assert index.mark_done([{"spec": 1, "task": 2}], "user") == TASK_INDEX_BODY
+
+
 class MockComment:
     def __eq__(self, other):
         return self._body == other.body
@@ -401,20 +462,14 @@ def test_create_comment(monkeypatch, caplog):
         comment = testutils.github.create_comment(_github(), MockIssue())
     assert caplog.text == ""
     assert comment is not None
-    assert (
-        comment.body
-        == "<h1>Test Report</h1>\n\n"
+    results = {"user": "user", "run_url": None, "tasks": {}}
+    assert comment.body == testutils.github.render_comment(results)
+    assert comment.body.startswith(
+        "<h1>Test Report</h1>\n\n"
         + testutils.github.STICKY_COMMENT_COMMENT.format(user="user")
-        + """
-<table>
-  <thead>
-    <tr><th></th><th>Task</th><th>Outcome</th></tr>
-  </thead>
-  <tbody>
-  </tbody>
-</table>
-"""
     )
+    assert "<tbody>\n  </tbody>" in comment.body
+    assert testutils.github.comment_results(comment) == results
 
 
 def test_create_comment_error(caplog):
@@ -428,99 +483,66 @@ def test_create_comment_error(caplog):
     assert comment is None
 
 
-# SimpleBeautifulSoup
-class SBS4(BeautifulSoup):  # pylint: disable=W0223
-    def __init__(self, soup):
-        super().__init__(soup, "html.parser")
-
-
 @pytest.mark.parametrize(
-    "tbody,task,exp,exp_errs",
+    "tbody,exp_tasks,exp_errs",
     [
-        (
-            "",
-            {
-                "title": " foobar",
-                "url": "http://example.org",
-                "emoji": ":-)",
-                "outcome": SBS4("blafoo"),
-            },
-            [("foobar", "http://example.org", ":-)", SBS4("blafoo"))],
-            None,
-        ),
-        (
-            "<tr></tr>",
-            {
-                "title": " foobar",
-                "url": "http://example.org",
-                "emoji": ":-)",
-                "outcome": SBS4("blafoo"),
-            },
-            [("foobar", "http://example.org", ":-)", SBS4("blafoo"))],
-            ["Unexpected table format in "],
-        ),
+        ("", {}, None),
+        ("<tr></tr>", {}, ["Unexpected table format in "]),
         (
             "<tr><td>:-(</td><td>test</td><td>snafoo</td></tr>",
-            {
-                "title": " foobar",
-                "url": "http://example.org",
-                "emoji": ":-)",
-                "outcome": SBS4("blafoo"),
-            },
-            [
-                ("foobar", "http://example.org", ":-)", SBS4("blafoo")),
-            ],
+            {},
             ["Unexpected table format in "],
         ),
         (
             "<tr><td>:-(</td><td><a>test</a></td><td>snafoo</td></tr>",
-            {
-                "title": " foobar",
-                "url": "http://example.org",
-                "emoji": ":-)",
-                "outcome": SBS4("blafoo"),
-            },
-            [
-                ("foobar", "http://example.org", ":-)", SBS4("blafoo")),
-            ],
+            {},
             ["Unexpected table format in "],
         ),
         (
             "<tr><td>:-(</td><td><a href='https://example.org/2'>test</a></td>"
             + "<td>snafoo</td></tr>",
             {
-                "title": " foobar",
-                "url": "http://example.org",
-                "emoji": ":-)",
-                "outcome": SBS4("blafoo"),
+                "test": {
+                    "emoji": ":-(",
+                    "url": "https://example.org/2",
+                    "outcome": "snafoo",
+                    "outcome_url": None,
+                }
             },
-            [
-                ("foobar", "http://example.org", ":-)", SBS4("blafoo")),
-                ("test", "https://example.org/2", ":-(", SBS4("snafoo")),
-            ],
             None,
         ),
         (
-            "<tr><td>:-(</td><td><a href='https://example.org/2'>foobar</a>"
-            + "</td><td>snafoo</td></tr>",
+            "<tr>\n <td>\n  ✔\n </td>\n <td>\n  <a href='https://example.org/2'>\n"
+            "   01. foobar\n  </a>\n </td>\n <td>\n  <strong>\n"
+            "   <a href='https://example.org/log'>\n    PASSED\n   </a>\n"
+            "  </strong>\n </td>\n</tr>",
             {
-                "title": " foobar",
-                "url": "http://example.org",
-                "emoji": ":-)",
-                "outcome": SBS4("blafoo"),
+                "01. foobar": {
+                    "emoji": "✔",
+                    "url": "https://example.org/2",
+                    "outcome": "passed",
+                    "outcome_url": "https://example.org/log",
+                }
             },
-            [
-                ("foobar", "http://example.org", ":-)", SBS4("blafoo")),
-            ],
             None,
         ),
     ],
 )
-def test_get_tasks(caplog, tbody, task, exp, exp_errs):
-    tbody = SBS4(f'<table><tbody>{tbody}</tbody></table>').find('tbody')
+def test_comment_results_legacy(caplog, tbody, exp_tasks, exp_errs):
+    comment = MockComment(
+        '<!-- gist-id:0123abcd -->\n<h1><a href="https://example.org/run">'
+        "Test Report</a></h1>"
+        + testutils.github.STICKY_COMMENT_COMMENT.format(user="user")
+        + f"<table><tbody>{tbody}</tbody></table>"
+    )
     with caplog.at_level(logging.ERROR):
-        tasks = testutils.github.get_tasks(MockComment("foobar"), tbody, task)
-    assert exp == tasks
+        results = testutils.github.comment_results(comment)
+    assert results == {
+        "user": "user",
+        "run_url": "https://example.org/run",
+        "gist_id": "0123abcd",
+        "tasks": exp_tasks,
+    }
     if exp_errs:
         for exp_err in exp_errs:
             assert exp_err in caplog.text
@@ -528,6 +550,38 @@ def test_get_tasks(caplog, tbody, task, exp, exp_errs):
         assert caplog.text == ""
 
 
+def test_comment_results(caplog):
+    results = {
+        "user": "user",
+        "run_url": None,
+        "tasks": {
+            "01. foo <bar>": {
+                "emoji": "✖",
+                "url": "https://example.org/?a=1&b=2",
+                "outcome": "failed",
+                "outcome_url": "https://example.org/log",
+            }
+        },
+    }
+    body = testutils.github.render_comment(results)
+    assert "01. foo &lt;bar&gt;" in body
+    assert 'href="https://example.org/?a=1&amp;b=2"' in body
+    # results are read from the results block, not the table
+    body = body.replace("01. foo &lt;bar&gt;", "02. snafu")
+    assert testutils.github.comment_results(MockComment(body)) == results
+    # broken results block falls back to parsing the table
+    body = re.sub(
+        testutils.github.RESULTS_COMMENT_PATTERN,
+        testutils.github.RESULTS_COMMENT_FMT.format(results="bm90IHpsaWI="),
+        body,
+    )
+    with caplog.at_level(logging.WARNING):
+        results = testutils.github.comment_results(MockComment(body))
+    assert "Unable to decode results block" in caplog.text
+    assert list(results["tasks"]) == ["02. snafu"]
+    assert results["tasks"]["02. snafu"]["outcome_url"] == "https://example.org/log"
+
+
 def _get_mock_report(outcome, longrepr=None, sections=None, when=None):
     class MockReport:
         @property
@@ -553,64 +607,32 @@ def _get_mock_report(outcome, longrepr=None, sections=None, when=None):
     return MockReport()
 
 
+TASK_FOOBAR_PASSED = {
+    "01. foobar": {
+        "emoji": "✔",
+        "url": "http://example.org",
+        "outcome": "passed",
+        "outcome_url": None,
+    }
+}
+
+
 @pytest.mark.parametrize(
-    'comment_body,env,gist_id,exp_body,exp_errs',
+    'comment_body,env,gist_id,exp_results,exp_errs',
     [
         (
             "<tbody></tbody>",
             {},
             None,
-            """<tbody>
- <tr>
-  <td>
-   ✔
-  </td>
-  <td>
-   <a href="http://example.org">
-    01. foobar
-   </a>
-  </td>
-  <td>
-   <strong>
-    PASSED
-   </strong>
-  </td>
- </tr>
-</tbody>""",
+            {"tasks": TASK_FOOBAR_PASSED},
             None,
         ),
         (
             "<table></table>",
             {},
             None,
-            "<table></table>",
-            "Unable to find table body in ",
-        ),
-        (
-            "<h1>The title</h1><tbody></tbody>",
-            {},
-            None,
-            """<h1>
- The title
-</h1>
-<tbody>
- <tr>
-  <td>
-   ✔
-  </td>
-  <td>
-   <a href="http://example.org">
-    01. foobar
-   </a>
-  </td>
-  <td>
-   <strong>
-    PASSED
-   </strong>
-  </td>
- </tr>
-</tbody>""",
             None,
+            "Unable to find table body in ",
         ),
         (
             "<h1>The title</h1><tbody></tbody>",
@@ -620,58 +642,64 @@ def _get_mock_report(outcome, longrepr=None, sections=None, when=None):
                 "GITHUB_SERVER_URL": "https://example.org",
             },
             None,
-            """<h1>
- <a href="https://example.org/test/foobar/actions/runs/1275479086">
-  The title
- </a>
-</h1>
-<tbody>
- <tr>
-  <td>
-   ✔
-  </td>
-  <td>
-   <a href="http://example.org">
-    01. foobar
-   </a>
-  </td>
-  <td>
-   <strong>
-    PASSED
-   </strong>
-  </td>
- </tr>
-</tbody>""",
+            {
+                "run_url": "https://example.org/test/foobar/actions/runs/1275479086",
+                "tasks": TASK_FOOBAR_PASSED,
+            },
             None,
         ),
         (
             "<tbody></tbody>",
             {},
             '663209485c1e2a39fb8fb4ab9fcd51ac',
-            """<!-- gist-id:663209485c1e2a39fb8fb4ab9fcd51ac -->
-<tbody>
- <tr>
-  <td>
-   ✔
-  </td>
-  <td>
-   <a href="http://example.org">
-    01. foobar
-   </a>
-  </td>
-  <td>
-   <strong>
-    PASSED
-   </strong>
-  </td>
- </tr>
-</tbody>""",
+            {
+                "gist_id": "663209485c1e2a39fb8fb4ab9fcd51ac",
+                "tasks": TASK_FOOBAR_PASSED,
+            },
+            None,
+        ),
+        (
+            testutils.github.render_comment(
+                {
+                    "user": "user",
+                    "gist_id": "0123abcd",
+                    "run_url": "https://example.org/run",
+                    "tasks": {
+                        "01. foobar": {
+                            "emoji": "✖",
+                            "url": "http://example.org",
+                            "outcome": "failed",
+                            "outcome_url": "http://example.org/log",
+                        },
+                        "02. snafu": {
+                            "emoji": "✔",
+                            "url": "http://example.org/2",
+                            "outcome": "passed",
+                        },
+                    },
+                }
+            ),
+            {},
+            None,
+            {
+                "user": "user",
+                "gist_id": "0123abcd",
+                "run_url": "https://example.org/run",
+                "tasks": {
+                    **TASK_FOOBAR_PASSED,
+                    "02. snafu": {
+                        "emoji": "✔",
+                        "url": "http://example.org/2",
+                        "outcome": "passed",
+                    },
+                },
+            },
             None,
         ),
     ],
 )
 def test_update_comment(
-    monkeypatch, caplog, comment_body, env, gist_id, exp_body, exp_errs
+    monkeypatch, caplog, comment_body, env, gist_id, exp_results, exp_errs
 ):
     # pylint: disable=R0913
     # patch environment variables to not include run URL when run in Github
@@ -683,7 +711,11 @@ def test_update_comment(
         if gist_id is not None:
             task['gist_id'] = gist_id
         testutils.github.update_comment(_get_mock_report("passed"), comment, task)
-    assert comment.body.strip() == exp_body.strip()
+    if exp_results is None:
+        assert comment.body == comment_body
+    else:
+        assert comment.body == testutils.github.render_comment(exp_results)
+        assert testutils.github.comment_results(comment) == exp_results
     if exp_errs:
         for exp_err in exp_errs:
             assert exp_err in caplog.text
@@ -723,6 +755,7 @@ def test_github_file_url_non_github_url():
         (False, {}, False),
         (True, {'test.txt': 'foobar'}, True),
         (True, {'test.txt': 'foobar', 'abcd.txt': 'snafu'}, False),
+        (True, {'test.md': 'foobar', 'test.log.gz': gzip.compress(b'snafu')}, True),
     ],
 )
 def test_upload_result_content(
@@ -759,14 +792,55 @@ def test_upload_result_content(
             output = repo.log('--format=%H', '--name-only', '--', filename)
             assert filename in output
             assert (tmp_path / filename).exists()
-            with (tmp_path / filename).open() as f:
-                assert f.read() == content[filename]
-        assert len(repo.log('--oneline').strip().split('\n')) == len(content)
+            if isinstance(content[filename], bytes):
+                assert (tmp_path / filename).read_bytes() == content[filename]
+            else:
+                assert (tmp_path / filename).read_text() == content[filename]
+        # one commit for all files
+        assert len(repo.log('--oneline').strip().split('\n')) == 1
     else:
         with pytest.raises(testutils.git.GitError):
             repo.log()
 
 
+def test_result_uploader(monkeypatch, tmp_path):
+    origin = testutils.git.Git(tmp_path / "origin")
+    origin.repodir.mkdir()
+    origin.cmd("init", "--bare")
+    repo = testutils.git.Git.clone(str(origin.repodir), str(tmp_path / "results"))
+    config_repo(repo)
+    repo.commit("--allow-empty", "-m", "Initial commit")
+    repo.push("-u", "origin", "HEAD")
+    monkeypatch.setenv("RESULT_OUTPUT_DIR", repo.repodir)
+    monkeypatch.setenv("RESULT_OUTPUT_URL", "https://github.com/RIOT-OS/results")
+    uploader = testutils.github.ResultUploader(tmp_path / "clones")
+    tasks = [
+        {"spec": {"spec": 4}, "task": task, "name": f"Task #{task:02d}"}
+        for task in range(1, 4)
+    ]
+    for task in tasks:
+        uploader.stage(_get_mock_report("passed"), task)
+    uploader.stage(_get_mock_report("skipped"), {"spec": {"spec": 4}, "task": 4})
+    assert len(uploader) == 3
+    uploader.upload(None, _github(), {"release": "2020.07", "candidate": "RC1"})
+    assert not uploader
+    head = origin.head_sha
+    # one commit for all results
+    assert origin.log("--format=%s").splitlines() == [
+        "Add 3 results",
+        "Initial commit",
+    ]
+    for task in tasks:
+        filename = f"task_04.{task['task']:02d}_result.md"
+        assert filename in origin.cmd("ls-tree", "--name-only", "HEAD")
+        assert task["outcome_url"] == (
+            f"https://github.com/RIOT-OS/results/blob/{head}/{filename}"
+        )
+    # nothing staged, nothing uploaded
+    uploader.upload(None, _github(), {"release": "2020.07", "candidate": "RC1"})
+    assert origin.head_sha == head
+
+
 def test_upload_result_content_error(monkeypatch, caplog, tmp_path):
     def mock_exists(self):
         raise testutils.github.GitError(returncode=42, cmd=["exists"])
@@ -843,6 +917,8 @@ def test_get_results_gist(  # noqa: C901
         def create_gist(self, *args, **kwargs):
             if error_create:
                 raise testutils.github.GithubException(400, "Nope", None)
+            # binary files are pushed later
+            assert list(kwargs["files"]) == ["test.md"]
             return MockGist(gist_id)
 
     with caplog.at_level(logging.ERROR):
@@ -855,7 +931,7 @@ def test_get_results_gist(  # noqa: C901
             _github(MockGistUser),
             {'release': '2021.05', 'candidate': 'RC6'},
             tmp_path,
-            {},
+            {'test.md': 'foobar', 'test.log.gz': gzip.compress(b'snafu')},
         )
     assert len(res) == 3
     if in_comment and gist_id in gist_ids:
@@ -917,6 +993,29 @@ def test_generate_outcome_content(params, outcome, longrepr, sections):
         assert not content
 
 
+def test_generate_outcome_content_huge_section():
+    lines = [f"{i} packets transmitted, {i} packets received" for i in range(10000)]
+    report = _get_mock_report(
+        "passed", longrepr=None, sections=[("Captured log call", "\n".join(lines))]
+    )
+    task = {'spec': {'spec': 3}, 'task': 1, 'name': 'foobar'}
+    content = testutils.github.generate_outcome_content(report, task)
+    assert list(content) == ['task_03.01_result.md', 'task_03.01_result.log.gz']
+    result = content['task_03.01_result.md']
+    assert len(result) < 2 * testutils.github.RESULT_SECTION_HEAD_SIZE + 1024
+    assert result.startswith("# 03. foobar [PASSED]\n## Captured log call\n")
+    assert lines[0] in result
+    assert lines[-1] in result
+    assert lines[5000] not in result
+    omitted = int(re.search(r"\[\.\.\. (\d+) lines omitted \.\.\.\]", result)[1])
+    assert sum(line in result for line in lines) + omitted == len(lines)
+    assert "[task_03.01_result.log.gz](task_03.01_result.log.gz)" in result
+    log = gzip.decompress(content['task_03.01_result.log.gz']).decode()
+    assert log == "## Captured log call\n\n{}\n\n".format("\n".join(lines))
+    # reproducible, so an unchanged log is not uploaded again
+    assert testutils.github.generate_outcome_content(report, task) == content
+
+
 @pytest.mark.parametrize(
     "env,content_generated,gist_created,head,outcome_url",
     [
@@ -1497,3 +1596,458 @@ def test_update_issue(
     else:
         assert not caplog.text
     assert task_marked_done == exp_marked
+
+
+SESSION_ISSUE_BODY = """
+- [ ] [04-single-hop-6lowpan-icmp](https://example.org/04)
+  - [ ] [Task #01 - ICMPv6 echo](https://example.org/04#task-01)
+  - [ ] [Task #02 - ICMPv6 echo stress](https://example.org/04#task-02)
+  - [x] [Task #03 - ICMPv6 echo once more](https://example.org/04#task-03)
+"""
+
+
+class MockSessionIssue:
+    def __init__(self, body, comments=()):
+        self.body = body
+        self.comments = list(comments)
+        self.title = "Release 2020.07 - RC1"
+        self.url = "https://api.example.org/issues/1"
+        self.edits = 0
+        self.updates = 0
+        self.errors = []
+
+    def __str__(self):
+        return "Mock issue"
+
+    def _maybe_raise(self):
+        if self.errors:
+            raise self.errors.pop(0)
+
+    def update(self):
+        self._maybe_raise()
+        self.updates += 1
+
+    def edit(self, body):
+        self._maybe_raise()
+        self.edits += 1
+        self.body = body
+
+    def get_comments(self):
+        return self.comments
+
+    def create_comment(self, body):
+        comment = MockSessionComment(body)
+        self.comments.append(comment)
+        return comment
+
+
+class MockSessionComment(MockComment):
+    html_url = "https://example.org/comment"
+
+    def __init__(self, body):
+        super().__init__(body)
+        self.edits = 0
+
+    def edit(self, body):
+        self.edits += 1
+        super().edit(body)
+
+
+def _session_github(issue):
+    # pylint: disable=R0903
+    class MockRepo:
+        def get_issues(self, state):
+            assert state == "open"
+            return [issue]
+
+    class MockGithub(type(_github())):
+        def get_repo(self, name):
+            assert name == testutils.github.REPO_NAME
+            return MockRepo()
+
+    return MockGithub()
+
+
+def _session_report(nodeid, outcome, when="call"):
+    return type(
+        "MockReport",
+        (),
+        {
+            "nodeid": nodeid,
+            "outcome": outcome,
+            "when": when,
+            "longrepr": None,
+            "sections": [],
+        },
+    )()
+
+
+@pytest.fixture
+def session_issue(monkeypatch):
+    issue = MockSessionIssue(SESSION_ISSUE_BODY)
+    github = _session_github(issue)
+    monkeypatch.setattr(
+        testutils.github,
+        "get_rc",
+        lambda: {"release": "2020.07", "candidate": "RC1"},
+    )
+    monkeypatch.setattr(testutils.github, "get_github", lambda: github)
+    monkeypatch.setattr(testutils.github.ResultUploader, "upload", lambda *args: None)
+    monkeypatch.setattr(testutils.github.time, "sleep", lambda secs: None)
+    monkeypatch.setattr(testutils.github.os, "environ", {})
+    yield issue
+
+
+# pylint: disable=redefined-outer-name
+def test_session_reporter(monkeypatch, caplog, tmpdir, session_issue):
+    lookups = []
+    find_rc_tracking_issue = testutils.github.find_rc_tracking_issue
+
+    def count_lookup(*args):
+        lookups.append(args)
+        return find_rc_tracking_issue(*args)
+
+    monkeypatch.setattr(testutils.github, "find_rc_tracking_issue", count_lookup)
+    reporter = testutils.github.SessionReporter(tmpdir)
+    spec = "04-single-hop-6lowpan-icmp/test_spec04.py"
+    for report in [
+        _session_report(f"{spec}::test_task01[nodes0]", "passed", when="setup"),
+        _session_report(f"{spec}::test_task01[nodes0]", "passed"),
+        _session_report(f"{spec}::test_task01[nodes0]", "passed", when="teardown"),
+        _session_report(f"{spec}::test_task02[nodes0]", "failed"),
+        _session_report(f"{spec}::test_task03[nodes0]", "passed"),
+        _session_report(f"{spec}::test_task04[nodes0]", "skipped", when="setup"),
+        _session_report(f"{spec}::test_foobar", "passed"),
+    ]:
+        reporter.add(report)
+    assert len(reporter.results) == 4
+    with caplog.at_level(logging.INFO):
+        reporter.flush()
+    assert not reporter.results
+    assert "Unable to find task 4.4 in the tracking issue" in caplog.text
+    assert "Task 4.3 is already marked done in the tracking issue" in caplog.text
+    assert len(lookups) == 1
+    # once to find the tasks, once right before marking them done
+    assert session_issue.updates == 2
+    assert session_issue.edits == 1
+    assert (
+        "- [x] [Task #01 - ICMPv6 echo](https://example.org/04#task-01) "
+        "@user (see https://example.org/comment) " in session_issue.body
+    )
+    assert "- [ ] [Task #02" in session_issue.body
+    (comment,) = session_issue.comments
+    assert comment.edits == 1
+    soup = BeautifulSoup(comment.body, "html.parser")
+    rows = [
+        [td.get_text().strip() for td in tr.find_all("td")]
+        for tr in soup.find("tbody").find_all("tr")
+    ]
+    assert rows == [
+        ["✔", "04. Task 01 - ICMPv6 echo", "PASSED"],
+        ["✖", "04. Task 02 - ICMPv6 echo stress", "FAILED"],
+        ["✔", "04. Task 03 - ICMPv6 echo once more", "PASSED"],
+    ]
+    # nothing new to report
+    reporter.flush()
+    assert len(lookups) == 1
+    assert session_issue.updates == 2
+    # only looked up once per session
+    reporter.add(_session_report(f"{spec}::test_task02[nodes0]", "passed"))
+    reporter.flush()
+    assert len(lookups) == 1
+    assert session_issue.updates == 4
+    assert session_issue.edits == 2
+    assert comment.edits == 2
+    assert "- [ ] [Task #02" not in session_issue.body
+
+
+def test_session_reporter_concurrent_edit(monkeypatch, tmpdir, session_issue):
+    other_body = SESSION_ISSUE_BODY.replace(
+        "- [ ] [Task #02 - ICMPv6 echo stress](https://example.org/04#task-02)",
+        "- [x] [Task #02 - ICMPv6 echo stress](https://example.org/04#task-02) "
+        "@other",
+    )
+
+    def upload(*_args):
+        # another tester marks a task done while the results are uploaded
+        session_issue.body = other_body
+
+    monkeypatch.setattr(testutils.github.ResultUploader, "upload", upload)
+    reporter = testutils.github.SessionReporter(tmpdir)
+    reporter.add(
+        _session_report(
+            "04-single-hop-6lowpan-icmp/test_spec04.py::test_task01[nodes0]",
+            "passed",
+        )
+    )
+    reporter.flush()
+    assert session_issue.edits == 1
+    assert "- [x] [Task #01" in session_issue.body
+    assert "https://example.org/04#task-02) @other" in session_issue.body
+
+
+@pytest.mark.parametrize("flush_interval,flushes", [(None, 0), (0, 2), (3600, 0)])
+def test_session_reporter_flush_interval(
+    monkeypatch, tmpdir, session_issue, flush_interval, flushes
+):
+    flushed = []
+    monkeypatch.setattr(
+        testutils.github.SessionReporter,
+        "flush",
+        lambda self: flushed.append(len(self.results)),
+    )
+    reporter = testutils.github.SessionReporter(tmpdir, flush_interval=flush_interval)
+    spec = "04-single-hop-6lowpan-icmp/test_spec04.py"
+    reporter.add(_session_report(f"{spec}::test_task01[nodes0]", "passed"))
+    reporter.add(_session_report(f"{spec}::test_task02[nodes0]", "passed"))
+    assert flushed == [1, 2][:flushes]
+    assert session_issue.edits == 0
+
+
+def test_session_reporter_rate_limit(caplog, tmpdir, session_issue):
+    reporter = testutils.github.SessionReporter(tmpdir)
+    reporter.add(
+        _session_report(
+            "04-single-hop-6lowpan-icmp/test_spec04.py::test_task01[nodes0]",
+            "passed",
+        )
+    )
+    session_issue.errors = [
+        testutils.github.RateLimitExceededException(403, "Slow down", {}),
+        testutils.github.RateLimitExceededException(
+            429, "Slow down", {"retry-after": "1"}
+        ),
+    ]
+    reporter.flush()
+    assert caplog.text.count("GitHub rate limit exceeded") == 2
+    assert session_issue.edits == 1
+    assert "- [x] [Task #01" in session_issue.body
+
+
+def test_session_reporter_rate_limit_exhausted(monkeypatch, caplog, tmpdir):
+    issue = MockSessionIssue(SESSION_ISSUE_BODY)
+    monkeypatch.setattr(testutils.github, "RATE_LIMIT_RETRIES", 2)
+    monkeypatch.setattr(
+        testutils.github,
+        "get_rc",
+        lambda: {"release": "2020.07", "candidate": "RC1"},
+    )
+    monkeypatch.setattr(testutils.github, "get_github", lambda: _session_github(issue))
+    sleeps = []
+    monkeypatch.setattr(testutils.github.time, "sleep", sleeps.append)
+    reporter = testutils.github.SessionReporter(tmpdir)
+    reporter.add(
+        _session_report(
+            "04-single-hop-6lowpan-icmp/test_spec04.py::test_task01[nodes0]",
+            "passed",
+        )
+    )
+    issue.errors = [
+        testutils.github.RateLimitExceededException(403, "Slow down", {})
+    ] * 3
+    reporter.flush()
+    assert sleeps == [2, 4]
+    assert "Unable to get issue text of Mock issue" in caplog.text
+    assert issue.edits == 0
+
+
+@pytest.mark.parametrize("rc,github", [(None, True), (True, None)])
+def test_session_reporter_unresolved(monkeypatch, tmpdir, rc, github):
+    monkeypatch.setattr(
+        testutils.github,
+        "get_rc",
+        lambda: rc and {"release": "2020.07", "candidate": "RC1"},
+    )
+    monkeypatch.setattr(
+        testutils.github,
+        "get_github",
+        lambda: github and _session_github(MockSessionIssue("")),
+    )
+    reporter = testutils.github.SessionReporter(tmpdir)
+    reporter.add(
+        _session_report(
+            "04-single-hop-6lowpan-icmp/test_spec04.py::test_task01[nodes0]",
+            "passed",
+        )
+    )
+    reporter.flush()
+    assert not reporter.results
+    assert reporter.issue is None
+
+
+def test_session_reporter_no_issue(monkeypatch, caplog, tmpdir):
+    issue = MockSessionIssue(SESSION_ISSUE_BODY)
+    issue.title = "Release 2020.04 - RC1"
+    monkeypatch.setattr(
+        testutils.github,
+        "get_rc",
+        lambda: {"release": "2020.07", "candidate": "RC1"},
+    )
+    monkeypatch.setattr(testutils.github, "get_github", lambda: _session_github(issue))
+    reporter = testutils.github.SessionReporter(tmpdir)
+    reporter.add(
+        _session_report(
+            "04-single-hop-6lowpan-icmp/test_spec04.py::test_task01[nodes0]",
+            "passed",
+        )
+    )
+    reporter.flush()
+    assert "No tracking issue found for 2020.07-RC1" in caplog.text
+    assert issue.edits == 0
+
+
+class MockWorkerReporter:
+    def __init__(self, blocked=None):
+        self.results = []
+        self.flushes = 0
+        self.threads = set()
+        self.blocked = blocked
+
+    def add(self, pytest_report):
+        self.threads.add(threading.current_thread().name)
+        if self.blocked is not None:
+            self.blocked.wait()
+        if pytest_report.outcome == "error":
+            raise RuntimeError("Oops")
+        if pytest_report.when == "call":
+            self.results.append(pytest_report)
+
+    def flush(self):
+        self.threads.add(threading.current_thread().name)
+        self.flushes += 1
+        self.results = []
+
+
+def test_report_worker(caplog):
+    blocked = threading.Event()
+    reporter = MockWorkerReporter(blocked)
+    worker = testutils.github.ReportWorker(reporter, maxsize=2)
+    reports = [
+        _session_report("test_spec04.py::test_task01", "passed", when="setup"),
+        _session_report("test_spec04.py::test_task01", "passed"),
+        _session_report("test_spec04.py::test_task02", "error"),
+        _session_report("test_spec04.py::test_task02", "failed"),
+    ]
+    # does not wait for the reporter
+    for report in reports[:2]:
+        worker.put(report)
+    assert not reporter.results
+    blocked.set()
+    for report in reports[2:]:
+        worker.put(report)
+    with caplog.at_level(logging.ERROR):
+        worker.close()
+    assert "Unable to report" in caplog.text
+    assert reporter.threads == {"github-report-worker"}
+    assert reporter.flushes == 1
+    stats = worker.stats()
+    assert stats["results"] == 2
+    assert stats["queue_depth"] == 0
+    assert 1 <= stats["max_queue_depth"] <= 2
+    assert stats["upload_latency"]["max"] >= stats["upload_latency"]["mean"] > 0
+    assert re.fullmatch(
+        r"Reported 2 results to the tracking issue, max\. queue depth: [12], "
+        r"upload latency: \d+\.\ds mean, \d+\.\ds max",
+        worker.summary(),
+    )
+    # closing again does not flush again
+    worker.close()
+    assert reporter.flushes == 1
+    worker.put(reports[1])
+    assert "after closing" in caplog.text
+    assert worker.stats()["results"] == 2
+
+
+def test_report_worker_nothing_reported():
+    reporter = MockWorkerReporter()
+    worker = testutils.github.ReportWorker(reporter)
+    worker.close()
+    assert reporter.flushes == 1
+    assert reporter.threads == {threading.current_thread().name}
+    assert worker.stats()["upload_latency"] == {"mean": None, "max": None}
+    assert worker.summary() == (
+        "Reported 0 results to the tracking issue, max. queue depth: 0, "
+        "upload latency: n/a"
+    )
+
+
+def test_report_worker_flush_error(caplog):
+    class FailingReporter(MockWorkerReporter):
+        def flush(self):
+            super().flush()
+            raise ConnectionError("Connection reset by peer")
+
+    reporter = FailingReporter()
+    worker = testutils.github.ReportWorker(reporter)
+    worker.put(_session_report("test_spec04.py::test_task01", "passed"))
+    with caplog.at_level(logging.ERROR):
+        worker.close()
+    assert "Unable to flush results" in caplog.text
+    assert "Connection reset by peer" in caplog.text
+    assert "TypeError" not in caplog.text
+    assert reporter.flushes == 1
+    assert reporter.threads == {"github-report-worker"}
+    assert worker.stats()["results"] == 0
+    assert worker.stats()["queue_depth"] == 0
+    # printed if the reporter found the tracking issue before failing
+    assert worker.summary().startswith("Reported 0 results to the tracking issue")
+    assert worker.summary().endswith("upload latency: n/a")
+
+
+def test_report_worker_session_reporter(tmpdir, session_issue):
+    worker = testutils.github.ReportWorker(
+        testutils.github.SessionReporter(tmpdir, flush_interval=0)
+    )
+    spec = "04-single-hop-6lowpan-icmp/test_spec04.py"
+    worker.put(_session_report(f"{spec}::test_task01[nodes0]", "passed"))
+    worker.put(_session_report(f"{spec}::test_task02[nodes0]", "passed"))
+    worker.close()
+    assert worker.stats()["results"] == 2
+    # flushed with every result
+    assert session_issue.edits == 2
+    assert "- [ ] [Task #0" not in session_issue.body
+
+
+def test_github_cache(monkeypatch):
+    issue = MockSessionIssue(SESSION_ISSUE_BODY)
+    requests = []
+
+    class MockUser:  # pylint: disable=R0903
+        @property
+        def login(self):
+            requests.append("user")
+            return "user"
+
+    github = _session_github(issue)
+    monkeypatch.setattr(github, "get_user", MockUser)
+    monkeypatch.setattr(testutils.github, "get_github", lambda: github)
+    monkeypatch.setattr(testutils.github.os, "environ", {})
+    find_rc_tracking_issue = testutils.github.find_rc_tracking_issue
+
+    def count_lookup(*args):
+        requests.append("issue")
+        return find_rc_tracking_issue(*args)
+
+    monkeypatch.setattr(testutils.github, "find_rc_tracking_issue", count_lookup)
+    cache = testutils.github.get_github_cache()
+    assert cache is testutils.github.get_github_cache()
+    assert repr(cache) == "<GithubCache: 0 objects>"
+    rc = {"release": "2020.07", "candidate": "RC1"}
+    for _ in range(3):
+        assert cache.user == "user"
+        assert cache.tracking_issue(rc) is issue
+        comment = cache.sticky_comment(issue)
+    # comment was created once and is found from now on
+    assert issue.comments == [comment]
+    assert requests == ["user", "issue"]
+    assert cache.tracking_issue({"release": "2020.07", "candidate": "RC2"}) is None
+    # not found is not cached
+    assert requests == ["user", "issue", "issue"]
+    assert repr(cache) == "<GithubCache: 5 objects>"
+    cache.refresh(issue)
+    assert issue.updates == 1
+
+
+def test_github_cache_no_token(monkeypatch):
+    monkeypatch.setattr(testutils.github, "get_github", lambda: None)
+    assert testutils.github.get_github_cache() is None
@@ -0,0 +1,289 @@
+"""
+Benchmarks of reporting to a tracking issue of realistic size, run against an
+offline stand-in for GitHub. API calls, bytes transferred and wall time per
+reported test result are recorded as properties of each benchmark in the
+JUnit XML report.
+
+PyGithub waits a second between write requests to respect GitHub's secondary
+rate limit. This is disabled for the benchmarks, so add a second of wall time
+per write to estimate the time against GitHub.
+"""
+
+import functools
+import logging
+import re
+import time
+
+import pytest
+
+from bs4 import BeautifulSoup
+
+import testutils.git
+import testutils.github
+
+from .fake_github import FakeGithub, GIT_ENV
+from .test_git import config_repo
+
+# pylint: disable=redefined-outer-name
+
+# tasks in the tracking issue and rows in the sticky comment
+BENCHMARK_TASKS = 150
+BENCHMARK_SPECS = 10
+# test results reported per benchmark
+BENCHMARK_RESULTS = 10
+RC = {"release": "2020.07", "candidate": "RC1"}
+
+logger = logging.getLogger(__name__)
+
+
+def _tasks():
+    per_spec = BENCHMARK_TASKS // BENCHMARK_SPECS
+    for spec in range(1, BENCHMARK_SPECS + 1):
+        for task in range(1, per_spec + 1):
+            yield spec, task
+
+
+def _task_title(spec, task):
+    return f"Task #{task:02d} - Task {task} of spec {spec}"
+
+
+def tracking_issue_body():
+    lines = ["## Specs", ""]
+    for spec, task in _tasks():
+        if task == 1:
+            lines.append(
+                f"- [ ] [{spec:02d}-spec-{spec}](https://example.org/{spec:02d})"
+            )
+        lines.append(
+            f"  - [ ] [{_task_title(spec, task)}]"
+            f"(https://example.org/{spec:02d}#task-{task:02d})"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def sticky_comment_body():
+    rows = "".join(
+        "<tr><td>✖</td><td><a href=\"https://example.org/{spec:02d}#task-{task:02d}\">"
+        "{spec:02d}. {title}</a></td><td><strong>FAILED</strong></td></tr>\n".format(
+            spec=spec, task=task, title=_task_title(spec, task).replace("#", "")
+        )
+        for spec, task in _tasks()
+    )
+    return (
+        "<h1>Test Report</h1>\n\n"
+        + testutils.github.STICKY_COMMENT_COMMENT.format(user="user")
+        + "\n<table>\n<thead>\n"
+        + "<tr><th></th><th>Task</th><th>Outcome</th></tr>\n"
+        + f"</thead>\n<tbody>\n{rows}</tbody>\n</table>\n"
+    )
+
+
+class BenchmarkReport:  # pylint: disable=R0903
+    def __init__(self, spec, task, outcome="passed"):
+        self.nodeid = (
+            f"{spec:02d}-spec-{spec}/test_spec{spec:02d}.py::"
+            f"test_task{task:02d}[nodes0]"
+        )
+        self.outcome = outcome
+        self.when = "call"
+        self.longrepr = None
+        # a realistic amount of captured node output
+        self.sections = [
+            (
+                "Captured log call",
+                "".join(
+                    f"INFO     testutils.shell:shell.py:42 > ping6 fe80::{i:x} "
+                    f"-c 100 -i 10 -s 1024\n{i} packets transmitted, {i} "
+                    "packets received, 0% packet loss\n"
+                    for i in range(50)
+                ),
+            )
+        ]
+
+
+def benchmark_reports():
+    """Evenly spread over the tracking issue"""
+    tasks = list(_tasks())
+    step = len(tasks) // BENCHMARK_RESULTS
+    return [BenchmarkReport(*tasks[i * step]) for i in range(BENCHMARK_RESULTS)]
+
+
+@pytest.fixture
+def fake_github(monkeypatch, tmp_path):
+    riotbase = testutils.git.Git(tmp_path / "riot")
+    riotbase.repodir.mkdir()
+    riotbase.cmd("init")
+    config_repo(riotbase)
+    riotbase.commit("--allow-empty", "-m", "Release")
+    riotbase.cmd("tag", f"{RC['release']}-{RC['candidate']}")
+    (tmp_path / testutils.github.GITHUBTOKEN_FILE).write_text("the-token\n")
+    monkeypatch.setenv("RIOTBASE", str(riotbase.repodir))
+    monkeypatch.setenv("HOME", str(tmp_path))
+    for name, value in GIT_ENV.items():
+        monkeypatch.setenv(name, value)
+    for name in [
+        "GITHUB_RUN_ID",
+        "GITHUB_REPOSITORY",
+        "GITHUB_SERVER_URL",
+        "RESULT_OUTPUT_DIR",
+        "RESULT_OUTPUT_URL",
+    ]:
+        monkeypatch.delenv(name, raising=False)
+    with FakeGithub(tmp_path / "github") as github:
+        number = github.add_issue(
+            f"Release {RC['release']} - {RC['candidate']}", tracking_issue_body()
+        )
+        github.add_comment(number, sticky_comment_body())
+        monkeypatch.setattr(testutils.github, "API_URL", github.url)
+        monkeypatch.setattr(
+            testutils.github,
+            "Github",
+            functools.partial(
+                testutils.github.Github,
+                seconds_between_requests=None,
+                seconds_between_writes=None,
+            ),
+        )
+        testutils.github.clear_caches()
+        yield github
+        testutils.github.clear_caches()
+
+
+def benchmark(fake_github, record_stats, name, report, results):
+    """
+    Report each of `results` with `report` and record the API calls, bytes
+    transferred and wall time per result
+    """
+    fake_github.reset_stats()
+    start = time.perf_counter()
+    for result in results:
+        report(result)
+    wall_time = time.perf_counter() - start
+    stats = {"results": len(results), "wall_time": wall_time / len(results)}
+    stats.update(
+        {
+            key: value / len(results)
+            for key, value in fake_github.stats.as_dict().items()
+        }
+    )
+    record_stats(f"github_benchmark.{name}", stats)
+    logger.info(f"{name}: {stats}")
+    return stats
+
+
+def _comment_rows(fake_github):
+    (comment,) = fake_github.issue_comments(1)
+    soup = BeautifulSoup(comment, "html.parser")
+    return [
+        [td.get_text().strip() for td in row.find_all("td")]
+        for row in soup.find("tbody").find_all("tr")
+    ]
+
+
+def _assert_reported(fake_github, reports):
+    body = fake_github.issue_body(1)
+    rows = _comment_rows(fake_github)
+    assert len(rows) == BENCHMARK_TASKS
+    passed = [row[1] for row in rows if row[2] == "PASSED"]
+    assert len(passed) == len(reports)
+    for report in reports:
+        spec, task = map(
+            int, re.search(r"(\d+)\.py::test_task(\d+)", report.nodeid).groups()
+        )
+        assert f"- [x] [{_task_title(spec, task)}]" in body
+        assert f"{spec:02d}. {_task_title(spec, task).replace('#', '')}" in passed
+
+
+def _gist_files(fake_github):
+    (gist_id,) = fake_github.gists
+    return (
+        testutils.git.Git(fake_github.gist_repo(gist_id))
+        .cmd("ls-tree", "--name-only", "HEAD")
+        .split()
+    )
+
+
+def test_benchmark_update_issue(fake_github, record_stats, tmp_path):
+    reports = benchmark_reports()
+    stats = benchmark(
+        fake_github,
+        record_stats,
+        "update_issue",
+        lambda report: testutils.github.update_issue(report, tmp_path / "results"),
+        reports,
+    )
+    _assert_reported(fake_github, reports)
+    assert len(_gist_files(fake_github)) == len(reports)
+    assert stats["git_requests"] > 0
+
+
+def test_benchmark_session_reporter(fake_github, record_stats, tmp_path):
+    reports = benchmark_reports()
+    reporter = testutils.github.SessionReporter(tmp_path / "results")
+
+    def report(pytest_report):
+        reporter.add(pytest_report)
+        if len(reporter.results) == len(reports):
+            reporter.flush()
+
+    benchmark(fake_github, record_stats, "session_reporter", report, reports)
+    _assert_reported(fake_github, reports)
+    assert len(_gist_files(fake_github)) == len(reports)
+    # one edit of the issue and the comment for all results
+    assert fake_github.stats.calls["PATCH /repos/{repo}/issues/{number}"] == 1
+    assert fake_github.stats.calls["PATCH /repos/{repo}/issues/comments/{id}"] == 1
+
+
+@pytest.fixture
+def github_objects(fake_github):  # pylint: disable=W0613
+    github = testutils.github.get_github()
+    issue = testutils.github.get_rc_tracking_issue(
+        testutils.github.get_repo(github), RC
+    )
+    comment = testutils.github.find_previous_comment(github, issue)
+    yield github, issue, comment
+
+
+def test_benchmark_update_comment(fake_github, record_stats, github_objects):
+    _, issue, comment = github_objects
+    reports = benchmark_reports()
+
+    def report(pytest_report):
+        _, task = testutils.github.find_task_text(
+            issue.body, testutils.github.get_task(pytest_report.nodeid)
+        )
+        testutils.github.update_comment(pytest_report, comment, task)
+
+    stats = benchmark(fake_github, record_stats, "update_comment", report, reports)
+    assert stats["api_calls"] == 1
+    rows = _comment_rows(fake_github)
+    assert len(rows) == BENCHMARK_TASKS
+    assert len([row for row in rows if row[2] == "PASSED"]) == len(reports)
+
+
+def test_benchmark_upload_results(fake_github, record_stats, github_objects, tmp_path):
+    github, issue, comment = github_objects
+    reports = benchmark_reports()
+    # first upload creates the gist, which is then found by its ID in the
+    # comment
+    first = reports.pop(0)
+    _, task = testutils.github.find_task_text(
+        issue.body, testutils.github.get_task(first.nodeid)
+    )
+    testutils.github.upload_results(
+        first, comment, task, github, RC, tmp_path / "results"
+    )
+    testutils.github.update_comment(first, comment, task)
+
+    def report(pytest_report):
+        _, task = testutils.github.find_task_text(
+            issue.body, testutils.github.get_task(pytest_report.nodeid)
+        )
+        testutils.github.upload_results(
+            pytest_report, comment, task, github, RC, tmp_path / "results"
+        )
+        assert "outcome_url" in task
+
+    stats = benchmark(fake_github, record_stats, "upload_results", report, reports)
+    assert stats["bytes_received"] > 0
+    assert len(_gist_files(fake_github)) == len(reports) + 1
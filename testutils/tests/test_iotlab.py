@@ -1,6 +1,15 @@
+import http.server
+import json
+import os
+import threading
+
 import pytest
 
 import testutils.iotlab
+import testutils.lease
+
+# nodes of the saclay site as returned by the IoT-LAB REST API
+TOPOLOGY_FILE = os.path.join(os.path.dirname(__file__), "iotlab_nodes_saclay.json")
 
 
 # pylint: disable=R0903
@@ -12,6 +21,13 @@ class MockRIOTCtrl:
         return self.env.get("BOARD")
 
 
+@pytest.fixture(autouse=True)
+def iotlab_api():
+    testutils.iotlab.IoTLABExperiment.close_api()
+    yield
+    testutils.iotlab.IoTLABExperiment.close_api()
+
+
 @pytest.mark.parametrize(
     "iotlab_node,expected",
     [
@@ -45,6 +61,73 @@ def test_board_from_iotlab_node_invalid():
         testutils.iotlab.IoTLABExperiment.board_from_iotlab_node("foobar")
 
 
+def test_board_from_iotlab_node_unknown():
+    with pytest.raises(ValueError):
+        testutils.iotlab.IoTLABExperiment.board_from_iotlab_node(
+            "go5wxbp-124.saclay.iot-lab.info"
+        )
+
+
+@pytest.mark.parametrize(
+    "board,expected",
+    [("iotlab-m3", "m3:at86rf231"), ("openmote-b", "openmoteb")],
+)
+def test_archi_from_board(board, expected):
+    # pylint: disable=W0212
+    assert testutils.iotlab.IoTLABExperiment._archi_from_board(board) == expected
+
+
+def test_map_iotlab_nodes_to_riot_ctrl():
+    ctrls = [
+        MockRIOTCtrl({"BOARD": "iotlab-m3"}),
+        MockRIOTCtrl({"BOARD": "samr21-xpro"}),
+        # must not be taken by the first ctrl
+        MockRIOTCtrl({"BOARD": "iotlab-m3", "IOTLAB_NODE": "m3-1.saclay.iot-lab.info"}),
+        MockRIOTCtrl({"BOARD": "iotlab-m3"}),
+    ]
+    exp = testutils.iotlab.IoTLABExperiment("test", ctrls)
+    exp.exp_id = 12345
+    # pylint: disable=W0212
+    exp._map_iotlab_nodes_to_riot_ctrl(
+        [
+            "m3-1.saclay.iot-lab.info",
+            "samr21-7.saclay.iot-lab.info",
+            "m3-2.saclay.iot-lab.info",
+            "m3-3.saclay.iot-lab.info",
+        ]
+    )
+    assert [ctrl.env["IOTLAB_NODE"] for ctrl in ctrls] == [
+        "m3-2.saclay.iot-lab.info",
+        "samr21-7.saclay.iot-lab.info",
+        "m3-1.saclay.iot-lab.info",
+        "m3-3.saclay.iot-lab.info",
+    ]
+    assert all(ctrl.env["IOTLAB_EXP_ID"] == "12345" for ctrl in ctrls)
+
+
+def test_map_iotlab_nodes_to_riot_ctrl_large():
+    boards = list(testutils.iotlab.IoTLABExperiment.BOARD_ARCHI_MAP)
+    ctrls = [MockRIOTCtrl({"BOARD": boards[i % len(boards)]}) for i in range(1000)]
+    exp = testutils.iotlab.IoTLABExperiment("test", ctrls)
+    iotlab_nodes = [
+        "{}-{}.saclay.iot-lab.info".format(  # pylint: disable=C0209
+            testutils.iotlab.IoTLABExperiment.BOARD_ARCHI_MAP[ctrl.board()]["name"],
+            i,
+        )
+        for i, ctrl in enumerate(reversed(ctrls))
+    ]
+    # pylint: disable=W0212
+    exp._map_iotlab_nodes_to_riot_ctrl(iotlab_nodes)
+    assert sorted(ctrl.env["IOTLAB_NODE"] for ctrl in ctrls) == sorted(iotlab_nodes)
+    assert all(
+        testutils.iotlab.IoTLABExperiment.board_from_iotlab_node(
+            ctrl.env["IOTLAB_NODE"]
+        )
+        == ctrl.board()
+        for ctrl in ctrls
+    )
+
+
 def test_valid_board():
     assert testutils.iotlab.IoTLABExperiment.valid_board(
         next(iter(testutils.iotlab.IoTLABExperiment.BOARD_ARCHI_MAP))
@@ -100,6 +183,88 @@ def test_check_user_credentials_unset(monkeypatch):
     assert not testutils.iotlab.IoTLABExperiment.check_user_credentials()
 
 
+def test_api_shared(monkeypatch):
+    reads = []
+
+    def get_user_credentials():
+        reads.append(1)
+        return ("user", "password")
+
+    monkeypatch.setattr(testutils.iotlab, "get_user_credentials", get_user_credentials)
+    assert testutils.iotlab.IoTLABExperiment.api_calls() == 0
+    assert not reads
+    api = testutils.iotlab.IoTLABExperiment.api()
+    assert api.credentials == ("user", "password")
+    assert testutils.iotlab.IoTLABExperiment.check_user_credentials()
+    assert testutils.iotlab.IoTLABExperiment.api() is api
+    assert len(reads) == 1
+    testutils.iotlab.IoTLABExperiment.close_api()
+    assert testutils.iotlab.IoTLABExperiment.api() is not api
+    assert len(reads) == 2
+
+
+class _APIHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def log_message(self, format, *args):  # pylint: disable=W0622
+        pass
+
+    def do_GET(self):  # pylint: disable=C0103
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def api_server(monkeypatch):
+    _APIHandler.connections = 0
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _APIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(
+        testutils.iotlab.IoTLABApi,
+        "url",
+        "http://{}:{}/api/".format(*server.server_address[:2]),
+    )
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+# pylint: disable=redefined-outer-name,unused-argument
+def test_api_keep_alive(api_server):
+    api = testutils.iotlab.IoTLABApi("user", "password")
+    for exp_id in range(5):
+        assert api.get_experiment_info(exp_id) == {"path": f"/api/experiments/{exp_id}"}
+    assert api.calls == 5
+    # one connection for all requests of a thread
+    assert _APIHandler.connections == 1
+    thread = threading.Thread(target=api.get_experiment_info, args=(42,))
+    thread.start()
+    thread.join()
+    assert api.calls == 6
+    assert _APIHandler.connections == 2
+    api.close()
+
+
+def test_api_error(monkeypatch):
+    api = testutils.iotlab.IoTLABApi("user", "password")
+    monkeypatch.setattr(api, "url", "http://127.0.0.1:0/api/")
+    with pytest.raises(RuntimeError):
+        api.get_experiment_info(1)
+    assert api.calls == 1
+    api.close()
+
+
 @pytest.mark.parametrize(
     "ctrl_envs,args,exp_boards",
     [
@@ -159,11 +324,8 @@ def test_init_value_error(ctrl_envs, args):
 @pytest.mark.parametrize("exp_id,expected", [(None, None), (1234, "This is a test")])
 def test_stop(monkeypatch, exp_id, expected):
     monkeypatch.setattr(
-        testutils.iotlab.IoTLABExperiment,
-        "user_credentials",
-        lambda cls: ("user", "password"),
+        testutils.iotlab, "get_user_credentials", lambda: ("user", "password")
     )
-    monkeypatch.setattr(testutils.iotlab, "Api", lambda user, password: None)
     monkeypatch.setattr(
         testutils.iotlab, "stop_experiment", lambda api, exp_id: expected
     )
@@ -185,11 +347,8 @@ def test_stop(monkeypatch, exp_id, expected):
 )
 def test_start(monkeypatch, ctrl_envs, exp_nodes):
     monkeypatch.setattr(
-        testutils.iotlab.IoTLABExperiment,
-        "user_credentials",
-        lambda cls: ("user", "password"),
+        testutils.iotlab, "get_user_credentials", lambda: ("user", "password")
     )
-    monkeypatch.setattr(testutils.iotlab, "Api", lambda user, password: None)
     monkeypatch.setattr(testutils.iotlab, "exp_resources", lambda arg: arg)
     monkeypatch.setattr(
         testutils.iotlab,
@@ -208,13 +367,391 @@ def test_start(monkeypatch, ctrl_envs, exp_nodes):
 
 def test_start_error(monkeypatch):
     monkeypatch.setattr(
-        testutils.iotlab.IoTLABExperiment,
-        "user_credentials",
-        lambda cls: ("user", "password"),
+        testutils.iotlab, "get_user_credentials", lambda: ("user", "password")
     )
-    monkeypatch.setattr(testutils.iotlab, "Api", lambda user, password: None)
     ctrls = [MockRIOTCtrl({'BOARD': 'iotlab-m3'})]
     exp = testutils.iotlab.IoTLABExperiment("test", ctrls)
     ctrls[0].env.pop("BOARD")
     with pytest.raises(ValueError):
         exp.start()
+
+
+class MockTopologyApi:
+    """Serves the recorded nodes of the saclay site"""
+
+    def __init__(self):
+        with open(TOPOLOGY_FILE, encoding="utf-8") as file:
+            self.nodes = json.load(file)
+        self.calls = 0
+
+    def get_nodes(self, site):
+        assert site == "saclay"
+        self.calls += 1
+        return self.nodes
+
+
+@pytest.fixture
+def topology_api(monkeypatch):
+    testutils.iotlab.IoTLABTopology.clear_cache()
+    api = MockTopologyApi()
+    monkeypatch.setattr(
+        testutils.iotlab.IoTLABExperiment, "api", classmethod(lambda cls: api)
+    )
+    yield api
+    testutils.iotlab.IoTLABTopology.clear_cache()
+
+
+# pylint: disable=redefined-outer-name
+def test_topology(topology_api):
+    topology = testutils.iotlab.IoTLABTopology.get(topology_api, "saclay")
+    # the mobile node and the node without position are ignored
+    assert len(topology) == len(topology_api.nodes["items"]) - 2
+    assert repr(topology) == "<IoTLABTopology: saclay (25 idle)>"
+    assert testutils.iotlab.IoTLABTopology.get(topology_api, "saclay") is topology
+    assert topology_api.calls == 1
+    assert (
+        testutils.iotlab.IoTLABTopology.get(topology_api, "saclay", max_age=-1)
+        is not topology
+    )
+    assert topology_api.calls == 2
+    assert topology.idle("samr21:at86rf233") == [
+        "samr21-2.saclay.iot-lab.info",
+        "samr21-3.saclay.iot-lab.info",
+        "samr21-4.saclay.iot-lab.info",
+        "samr21-5.saclay.iot-lab.info",
+    ]
+    assert topology.distance(
+        "m3-1.saclay.iot-lab.info", "m3-13.saclay.iot-lab.info"
+    ) == pytest.approx(7.3)
+
+
+def _spread(topology, nodes):
+    return max(topology.distance(a, b) for a in nodes for b in nodes)
+
+
+# pylint: disable=redefined-outer-name
+@pytest.mark.parametrize(
+    "archis,spread",
+    [
+        (["m3:at86rf231", "m3:at86rf231"], 0.6),
+        (["m3:at86rf231", "m3:at86rf231", "m3:at86rf231"], 1.2),
+        (["m3:at86rf231", "samr21:at86rf233"], 0.5),
+        (["samr21:at86rf233", "m3:at86rf231", "samr21:at86rf233"], 2.4),
+    ],
+)
+def test_topology_select(topology_api, archis, spread):
+    topology = testutils.iotlab.IoTLABTopology.get(topology_api, "saclay")
+    idle = {archi: topology.idle(archi) for archi in archis}
+    nodes = topology.select(archis)
+    assert len(set(nodes)) == len(archis)
+    for archi, node in zip(archis, nodes):
+        assert node in idle[archi]
+        # reserved for the experiment
+        assert node not in topology.idle(archi)
+    assert _spread(topology, nodes) == pytest.approx(spread, abs=0.01)
+
+
+# pylint: disable=redefined-outer-name
+def test_topology_select_not_enough(topology_api):
+    topology = testutils.iotlab.IoTLABTopology.get(topology_api, "saclay")
+    assert topology.select(["samr21:at86rf233"] * 5) is None
+    assert topology.select(["a8:at86rf231", "nrf52dk:ble"]) is None
+    assert len(topology.idle("samr21:at86rf233")) == 4
+    assert len(topology.idle("a8:at86rf231")) == 3
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    resources = []
+
+    def submit_experiment(api, name, duration, res):
+        resources.extend(res)
+        return {"id": 12345}
+
+    monkeypatch.setattr(testutils.iotlab, "submit_experiment", submit_experiment)
+    yield resources
+
+
+# pylint: disable=redefined-outer-name,unused-argument
+@pytest.mark.parametrize(
+    "ctrl_envs,selected",
+    [
+        ([{"BOARD": "iotlab-m3"}, {"BOARD": "iotlab-m3"}], True),
+        ([{"BOARD": "iotlab-m3"}], False),
+        (
+            [
+                {"BOARD": "iotlab-m3"},
+                {"BOARD": "iotlab-m3", "IOTLAB_NODE": "m3-1.saclay.iot-lab.info"},
+            ],
+            False,
+        ),
+    ],
+)
+def test_submit_select_nodes(topology_api, submitted, ctrl_envs, selected):
+    ctrls = [MockRIOTCtrl(env) for env in ctrl_envs]
+    exp = testutils.iotlab.IoTLABExperiment("test", ctrls, select_nodes=True)
+    # pylint: disable=W0212
+    assert exp._submit("saclay", 20) == 12345
+    if selected:
+        (resources,) = submitted
+        assert resources["type"] == "physical"
+        assert len(resources["nodes"]) == len(ctrls)
+        assert all(node.startswith("m3-") for node in resources["nodes"])
+    else:
+        assert len(submitted) == len(ctrls)
+        assert topology_api.calls == 0
+
+
+# pylint: disable=redefined-outer-name,unused-argument
+def test_submit_select_nodes_error(monkeypatch, caplog, topology_api, submitted):
+    def get_nodes(site):
+        raise testutils.iotlab.HTTPError("url", 500, "don't panic", None, None)
+
+    monkeypatch.setattr(topology_api, "get_nodes", get_nodes)
+    ctrls = [MockRIOTCtrl({"BOARD": "iotlab-m3"}), MockRIOTCtrl({"BOARD": "nrf52dk"})]
+    exp = testutils.iotlab.IoTLABExperiment("test", ctrls, select_nodes=True)
+    # pylint: disable=W0212
+    exp._submit("saclay", 20)
+    assert "Unable to get topology of saclay" in caplog.text
+    # IoT-LAB chooses
+    assert [res["type"] for res in submitted] == ["alias", "alias"]
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(
+        testutils.iotlab, "get_user_credentials", lambda: ("user", "password")
+    )
+    monkeypatch.setattr(testutils.iotlab, "exp_resources", lambda arg: arg)
+    monkeypatch.setattr(
+        testutils.iotlab,
+        "submit_experiment",
+        lambda api, name, duration, resources: {"id": 12345},
+    )
+    monkeypatch.setattr(
+        testutils.iotlab,
+        "get_experiment",
+        lambda api, exp_id: {
+            "nodes": [
+                "m3-1.saclay.iot-lab.info",
+                "m3-2.saclay.iot-lab.info",
+                "samr21-3.saclay.iot-lab.info",
+            ]
+        },
+    )
+    monkeypatch.setattr(testutils.iotlab, "wait_experiment", lambda api, exp_id: {})
+    monkeypatch.setattr(testutils.iotlab, "stop_experiment", lambda api, exp_id: {})
+    yield testutils.iotlab.IoTLABExperimentPool(
+        "test", {"iotlab-m3": 2, "samr21-xpro": 1}, duration=42
+    )
+
+
+# pylint: disable=redefined-outer-name
+def test_pool_start_stop(pool):
+    assert pool.site == "saclay"
+    assert pool.exp_id is None
+    assert not pool.free_nodes()
+    assert not pool.lease([MockRIOTCtrl({"BOARD": "iotlab-m3"})])
+    pool.start()
+    assert pool.exp_id == 12345
+    assert repr(pool) == "<IoTLABExperimentPool: test (12345)>"
+    assert sorted(pool.free_nodes()) == [
+        "m3-1.saclay.iot-lab.info",
+        "m3-2.saclay.iot-lab.info",
+        "samr21-3.saclay.iot-lab.info",
+    ]
+    assert pool.free_nodes("samr21-xpro") == ["samr21-3.saclay.iot-lab.info"]
+    pool.stop()
+    assert pool.exp_id is None
+    assert not pool.free_nodes()
+
+
+# pylint: disable=redefined-outer-name
+def test_pool_lease_release(monkeypatch, pool):
+    reset = []
+    monkeypatch.setattr(
+        testutils.iotlab,
+        "node_command",
+        lambda api, cmd, exp_id, nodes: reset.extend(nodes),
+    )
+    pool.start()
+    ctrls = [
+        MockRIOTCtrl({"BOARD": "iotlab-m3"}),
+        MockRIOTCtrl({"BOARD": "samr21-xpro"}),
+    ]
+    assert pool.lease(ctrls)
+    assert ctrls[0].env["IOTLAB_NODE"].startswith("m3-")
+    assert ctrls[1].env["IOTLAB_NODE"] == "samr21-3.saclay.iot-lab.info"
+    assert all(ctrl.env["IOTLAB_EXP_ID"] == "12345" for ctrl in ctrls)
+    assert len(pool.free_nodes("iotlab-m3")) == 1
+    assert not pool.free_nodes("samr21-xpro")
+    # not enough nodes left, so nothing is leased
+    others = [MockRIOTCtrl({"BOARD": "iotlab-m3"}), MockRIOTCtrl({"BOARD": "nrf52dk"})]
+    assert not pool.lease(others)
+    assert not any("IOTLAB_NODE" in ctrl.env for ctrl in others)
+    assert len(pool.free_nodes("iotlab-m3")) == 1
+    pool.release(ctrls)
+    assert sorted(reset) == sorted(ctrl.env["IOTLAB_NODE"] for ctrl in ctrls)
+    assert len(pool.free_nodes()) == 3
+
+
+# pylint: disable=redefined-outer-name
+def test_pool_lease_iotlab_node(pool):
+    pool.start()
+    ctrl = MockRIOTCtrl(
+        {"BOARD": "iotlab-m3", "IOTLAB_NODE": "m3-2.saclay.iot-lab.info"}
+    )
+    assert pool.lease([ctrl])
+    assert pool.free_nodes("iotlab-m3") == ["m3-1.saclay.iot-lab.info"]
+    ctrl = MockRIOTCtrl(
+        {"BOARD": "iotlab-m3", "IOTLAB_NODE": "m3-2.saclay.iot-lab.info"}
+    )
+    assert not pool.lease([ctrl])
+
+
+# pylint: disable=redefined-outer-name
+def test_pool_release_error(monkeypatch, caplog, pool):
+    def node_command(*args, **kwargs):
+        raise testutils.iotlab.HTTPError("url", 500, "don't panic", None, None)
+
+    monkeypatch.setattr(testutils.iotlab, "node_command", node_command)
+    pool.start()
+    ctrls = [MockRIOTCtrl({"BOARD": "iotlab-m3"})]
+    assert pool.lease(ctrls)
+    pool.release(ctrls)
+    assert "Unable to reset" in caplog.text
+    assert len(pool.free_nodes()) == 3
+
+
+# pylint: disable=redefined-outer-name,unused-argument
+def test_pool_shared_broker(monkeypatch, tmp_path, pool):
+    # the `pool` fixture is only used for mocking the IoT-LAB API
+    submitted = []
+    stopped = []
+    monkeypatch.setattr(
+        testutils.iotlab,
+        "submit_experiment",
+        lambda api, name, duration, resources: submitted.append(name) or {"id": 12345},
+    )
+    monkeypatch.setattr(
+        testutils.iotlab,
+        "stop_experiment",
+        lambda api, exp_id: stopped.append(exp_id) or {},
+    )
+    monkeypatch.setattr(testutils.iotlab, "node_command", lambda *args: {})
+    broker = testutils.lease.LeaseBroker(tmp_path / "leases.json")
+    pools = [
+        testutils.iotlab.IoTLABExperimentPool(
+            "test", {"iotlab-m3": 2}, broker=broker, owner=owner
+        )
+        for owner in ["gw0", "gw1"]
+    ]
+    for worker_pool in pools:
+        worker_pool.start()
+    # only one experiment for all workers
+    assert len(submitted) == 1
+    assert pools[0].exp_id == pools[1].exp_id == 12345
+    ctrls = [[MockRIOTCtrl({"BOARD": "iotlab-m3"})] for _ in pools]
+    assert pools[0].lease(ctrls[0])
+    assert pools[1].lease(ctrls[1])
+    assert ctrls[0][0].env["IOTLAB_NODE"] != ctrls[1][0].env["IOTLAB_NODE"]
+    assert not pools[1].lease([MockRIOTCtrl({"BOARD": "iotlab-m3"})])
+    pools[0].release(ctrls[0])
+    assert pools[1].free_nodes("iotlab-m3") == [ctrls[0][0].env["IOTLAB_NODE"]]
+    testutils.iotlab.IoTLABExperimentPool.stop_all(broker)
+    assert stopped == [12345]
+    # nothing left to stop
+    testutils.iotlab.IoTLABExperimentPool.stop_all(broker)
+    assert stopped == [12345]
+
+
+@pytest.fixture
+def prefetcher(monkeypatch, pool):  # pylint: disable=W0613
+    # the `pool` fixture is only used for mocking the IoT-LAB API
+    submitted = []
+    stopped = []
+
+    def submit_experiment(api, name, duration, resources):
+        submitted.append(name)
+        return {"id": len(submitted)}
+
+    def stop_experiment(api, exp_id):
+        stopped.append(exp_id)
+
+    monkeypatch.setattr(testutils.iotlab, "submit_experiment", submit_experiment)
+    monkeypatch.setattr(testutils.iotlab, "stop_experiment", stop_experiment)
+    prefetcher = testutils.iotlab.IoTLABExperimentPrefetcher(
+        [
+            ("test_task01", "task01", ["iotlab-m3", "iotlab-m3"], "saclay"),
+            ("test_task02", "task02", ["iotlab-m3", "samr21-xpro"], "saclay"),
+            ("test_task03", "task03", ["iotlab-m3"], "saclay"),
+            ("test_task04", "task04", ["samr21-xpro"], "saclay"),
+        ],
+        duration=42,
+    )
+    prefetcher.submitted = submitted
+    prefetcher.stopped = stopped
+    yield prefetcher
+
+
+def test_prefetcher(prefetcher):
+    ctrls = [
+        MockRIOTCtrl({"BOARD": "iotlab-m3"}),
+        MockRIOTCtrl({"BOARD": "samr21-xpro"}),
+    ]
+    # nothing prefetched for the first test
+    prefetcher.prefetch_next("test_task01")
+    assert prefetcher.take("test_task01", []) is None
+    # does not prefetch more than once
+    prefetcher.prefetch_next("test_task01")
+    assert repr(prefetcher) == "<IoTLABExperimentPrefetcher: 1 prefetched>"
+    exp = prefetcher.take("test_task02", ctrls)
+    prefetcher.prefetch_next("test_task02")
+    assert exp.name == "task02"
+    assert exp.ctrls == ctrls
+    assert [ctrl.env["IOTLAB_NODE"] for ctrl in ctrls] == [
+        "m3-1.saclay.iot-lab.info",
+        "samr21-3.saclay.iot-lab.info",
+    ]
+    assert all(ctrl.env["IOTLAB_EXP_ID"] == str(exp.exp_id) for ctrl in ctrls)
+    assert prefetcher.submitted == ["task02", "task03"]
+    # test_task03 was skipped, so its experiment is stopped
+    exp = prefetcher.take("test_task04", [MockRIOTCtrl({"BOARD": "samr21-xpro"})])
+    assert exp is None
+    assert prefetcher.stopped == [2]
+    prefetcher.stop()
+    assert prefetcher.stopped == [2]
+
+
+def test_prefetcher_stop(prefetcher):
+    prefetcher.prefetch_next("test_task02")
+    prefetcher.stop()
+    assert prefetcher.stopped == [1]
+    assert (
+        prefetcher.take("test_task03", [MockRIOTCtrl({"BOARD": "iotlab-m3"})]) is None
+    )
+
+
+def test_prefetcher_error(monkeypatch, caplog, prefetcher):
+    def wait_experiment(api, exp_id):
+        raise RuntimeError("Experiment failed")
+
+    monkeypatch.setattr(testutils.iotlab, "wait_experiment", wait_experiment)
+    prefetcher.prefetch_next("test_task01")
+    ctrls = [
+        MockRIOTCtrl({"BOARD": "iotlab-m3"}),
+        MockRIOTCtrl({"BOARD": "samr21-xpro"}),
+    ]
+    assert prefetcher.take("test_task02", ctrls) is None
+    assert "Prefetched experiment for test_task02 failed" in caplog.text
+    assert prefetcher.stopped == [1]
+    assert "IOTLAB_NODE" not in ctrls[0].env
+
+
+def test_prefetcher_other_boards(caplog, prefetcher):
+    prefetcher.prefetch_next("test_task01")
+    assert (
+        prefetcher.take("test_task02", [MockRIOTCtrl({"BOARD": "iotlab-m3"})]) is None
+    )
+    assert "has other nodes" in caplog.text
+    assert prefetcher.stopped == [1]
@@ -0,0 +1,146 @@
+import os
+import threading
+
+import pytest
+
+import testutils.lease
+
+
+@pytest.fixture(params=["memory", "file"])
+def broker(request, tmp_path):
+    if request.param == "memory":
+        yield testutils.lease.LeaseBroker()
+    else:
+        yield testutils.lease.LeaseBroker(tmp_path / "leases.json")
+
+
+# pylint: disable=redefined-outer-name
+def test_setdefault_pop(broker):
+    calls = []
+
+    def factory():
+        calls.append(True)
+        return {"exp_id": 12345}
+
+    assert broker.setdefault("foobar", factory) == {"exp_id": 12345}
+    assert broker.setdefault("foobar", factory) == {"exp_id": 12345}
+    assert len(calls) == 1
+    assert broker.pop("foobar") == {"exp_id": 12345}
+    assert broker.pop("foobar") is None
+    assert broker.pop("foobar", 42) == 42
+
+
+# pylint: disable=redefined-outer-name
+def test_setdefault_concurrent(broker):
+    started = threading.Event()
+    leased = threading.Event()
+    results = []
+
+    def factory():
+        started.set()
+        # others can lease while the value is created
+        assert leased.wait(timeout=5)
+        return {"exp_id": 12345}
+
+    def lease():
+        started.wait(timeout=5)
+        results.append(broker.lease("channels", [26], "gw1"))
+        leased.set()
+        # waits for the value being created
+        results.append(broker.setdefault("foobar", lambda: {"exp_id": 42}))
+
+    thread = threading.Thread(target=lease)
+    thread.start()
+    assert broker.setdefault("foobar", factory) == {"exp_id": 12345}
+    thread.join()
+    assert results == [[26], {"exp_id": 12345}]
+
+
+# pylint: disable=redefined-outer-name
+def test_lease_release(broker):
+    assert broker.lease("channels", [26, 25, 24], "gw0") == [26]
+    assert broker.lease("channels", [26, 25, 24], "gw1", count=2) == [25, 24]
+    assert broker.lease("channels", [26, 25, 24], "gw2") is None
+    assert broker.leased("channels") == {"26": "gw0", "25": "gw1", "24": "gw1"}
+    broker.release("channels", "gw1", [25])
+    assert broker.leased("channels") == {"26": "gw0", "24": "gw1"}
+    # not leased to gw0, so nothing happens
+    broker.release("channels", "gw0", [24])
+    assert broker.lease("channels", [26, 25, 24], "gw2") == [25]
+    broker.release("channels", "gw1")
+    broker.release("channels", "gw2")
+    assert broker.leased("channels") == {"26": "gw0"}
+    assert not broker.leased("nodes")
+
+
+# pylint: disable=redefined-outer-name
+def test_lease_each(broker):
+    # the most constrained list is served first, even if it comes last
+    assert broker.lease_each("nodes", [["m3-1", "m3-2"], ["m3-1"]], "gw0") == [
+        "m3-2",
+        "m3-1",
+    ]
+    # all or nothing
+    assert broker.lease_each("nodes", [["m3-3"], ["m3-1", "m3-2"]], "gw1") is None
+    assert broker.leased("nodes") == {"m3-1": "gw0", "m3-2": "gw0"}
+
+
+# pylint: disable=redefined-outer-name
+def test_wait_lease(broker):
+    assert broker.wait_lease("channels", [17], "gw0") == [17]
+    timer = threading.Timer(0.2, broker.release, args=("channels", "gw0"))
+    timer.start()
+    assert broker.wait_lease("channels", [17], "gw1", interval=0.05) == [17]
+    timer.join()
+    assert broker.leased("channels") == {"17": "gw1"}
+
+
+# pylint: disable=redefined-outer-name
+def test_wait_lease_timeout(broker):
+    assert broker.lease("channels", [17, 26], "test_task01") == [17]
+    with pytest.raises(TimeoutError) as error:
+        broker.wait_lease("channels", [26, 17], "test_task02", count=2, timeout=0.1)
+    assert str(error.value) == "channels still leased after 0.1s: 17 to test_task01"
+    # nothing leased while waiting
+    assert broker.leased("channels") == {"17": "test_task01"}
+
+
+def test_release_worker(tmp_path):
+    broker = testutils.lease.LeaseBroker(tmp_path / "leases.json", worker="gw0")
+    crashed = testutils.lease.LeaseBroker(tmp_path / "leases.json", worker="gw1")
+    assert testutils.lease.LeaseBroker().worker == str(os.getpid())
+    assert broker.lease("channels", [26, 25], "test_task01") == [26]
+    assert crashed.lease("channels", [26, 25], "test_task02") == [25]
+    assert crashed.lease("nodes", ["m3-1"], "gw1") == ["m3-1"]
+    assert broker.release_worker("gw1") == {"channels": ["25"], "nodes": ["m3-1"]}
+    assert broker.leased("channels") == {"26": "test_task01"}
+    assert not broker.leased("nodes")
+    assert not broker.release_worker("gw1")
+
+
+def test_shared_statefile(tmp_path):
+    broker = testutils.lease.LeaseBroker(tmp_path / "leases.json")
+    other = testutils.lease.LeaseBroker(tmp_path / "leases.json")
+    assert repr(broker) == f"<LeaseBroker: {tmp_path / 'leases.json'}>"
+    assert broker.lease("channels", [26, 25], "gw0") == [26]
+    assert other.lease("channels", [26, 25], "gw1") == [25]
+    assert other.leased("channels") == broker.leased("channels")
+
+
+def test_file_lock(tmp_path):
+    lock_file = tmp_path / "test.lock"
+    events = []
+
+    def locker():
+        with testutils.lease.file_lock(lock_file):
+            events.append("thread")
+
+    with testutils.lease.file_lock(lock_file):
+        thread = threading.Thread(target=locker)
+        thread.start()
+        thread.join(0.2)
+        # blocked by the lock held here
+        assert thread.is_alive()
+        events.append("main")
+    thread.join()
+    assert events == ["main", "thread"]
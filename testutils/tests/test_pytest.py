@@ -1,23 +1,19 @@
 import os
+import subprocess
+import types
 import pytest
 
+import testutils.github
+import testutils.lease
 import testutils.pytest
 
 
-class MockSpawn:
-    expect_ret = None
-
-    # pylint: disable=W0613
-    def __init__(self, cmd, *args, **kwargs):
-        self.cmd = cmd
-
-    # pylint: disable=W0613
-    def sendline(self, *args, **kwargs):
-        pass
-
-    # pylint: disable=W0613
-    def expect(self, *args, **kwargs):
-        return self.expect_ret
+@pytest.fixture(autouse=True)
+def iotlab_api():
+    # credentials are read when the shared API client is created
+    testutils.pytest.IoTLABExperiment.close_api()
+    yield
+    testutils.pytest.IoTLABExperiment.close_api()
 
 
 @pytest.mark.parametrize(
@@ -33,9 +29,29 @@ def test_check_ssh_creds(monkeypatch, iotlab_creds, expect_ret, expect_func):
     monkeypatch.setattr(
         testutils.pytest.IoTLABExperiment, "user_credentials", lambda: iotlab_creds
     )
-    monkeypatch.setattr(testutils.pytest.pexpect, "spawnu", MockSpawn)
-    MockSpawn.expect_ret = expect_ret
+    destinations = []
+    monkeypatch.setattr(
+        testutils.pytest,
+        "reachable",
+        lambda destination: destinations.append(destination) or bool(expect_ret),
+    )
     assert expect_func(testutils.pytest.check_ssh())
+    if iotlab_creds[0] is not None:
+        assert destinations == ["test@saclay.iot-lab.info"]
+    else:
+        assert not destinations
+
+
+def test_check_ssh_multiplexer(monkeypatch):
+    destinations = []
+    multiplexer = types.SimpleNamespace(
+        reachable=lambda destination: destinations.append(destination) or True
+    )
+    monkeypatch.setattr(
+        testutils.pytest.IoTLABExperiment, "user_credentials", lambda: ("test", None)
+    )
+    assert testutils.pytest.check_credentials(False, multiplexer) is None
+    assert destinations == ["test@saclay.iot-lab.info"]
 
 
 @pytest.mark.parametrize(
@@ -55,8 +71,12 @@ def test_check_credentials(
     monkeypatch.setattr(
         testutils.pytest.IoTLABExperiment, "user_credentials", lambda: iotlab_creds
     )
-    monkeypatch.setattr(testutils.pytest.pexpect, "spawnu", MockSpawn)
-    MockSpawn.expect_ret = expect_ret
+    destinations = []
+    monkeypatch.setattr(
+        testutils.pytest,
+        "reachable",
+        lambda destination: destinations.append(destination) or bool(expect_ret),
+    )
     assert expect_func(testutils.pytest.check_credentials(run_local))
 
 
@@ -70,10 +90,34 @@ def test_check_credentials(
     ],
 )
 def test_check_rc(monkeypatch, output, only_rc_allowed, expect_func):
-    monkeypatch.setattr(
-        testutils.pytest.subprocess, "check_output", lambda *args, **kwargs: output
-    )
+    calls = []
+
+    # pylint: disable=W0613
+    def check_output(*args, **kwargs):
+        calls.append(args)
+        return output
+
+    monkeypatch.setattr(subprocess, "check_output", check_output)
+    testutils.github.clear_caches()
     assert expect_func(testutils.pytest.check_rc(only_rc_allowed))
+    # the RC is only looked up once per session
+    testutils.github.get_rc()
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("pan_id", ["0", "35", "0x23", "0XFFFD"])
+def test_check_pan_id(pan_id):
+    testutils.pytest.check_pan_id(pan_id)
+
+
+@pytest.mark.parametrize("pan_id", ["", "foo", "0xFFFE", "-1", "1_000", "023"])
+def test_check_pan_id_invalid(pan_id):
+    with pytest.raises(pytest.UsageError) as error:
+        testutils.pytest.check_pan_id(pan_id)
+    assert str(error.value) == (
+        f"Invalid DEFAULT_PAN_ID {pan_id!r}: expected a number from 0 to 0xFFFD, "
+        "e.g. 35 or 0x23"
+    )
 
 
 def test_get_required_envvar():
@@ -83,3 +127,52 @@ def test_get_required_envvar():
     with pytest.raises(RuntimeError) as error:
         testutils.pytest.get_required_envvar('foo')
     assert str(error.value) == "Missing foo env variable"
+
+
+@pytest.mark.parametrize(
+    "workerinput,exp_id,exp_count",
+    [
+        (None, None, 1),
+        ({"workerid": "gw1", "workercount": 4}, "gw1", 4),
+    ],
+)
+def test_xdist_worker(workerinput, exp_id, exp_count):
+    config = types.SimpleNamespace()
+    if workerinput is not None:
+        config.workerinput = workerinput
+    assert testutils.pytest.xdist_worker_id(config) == exp_id
+    assert testutils.pytest.xdist_worker_count(config) == exp_count
+
+
+def test_lease():
+    broker = testutils.lease.LeaseBroker()
+    finalizers = []
+
+    def request(nodeid):
+        return types.SimpleNamespace(
+            node=types.SimpleNamespace(nodeid=nodeid),
+            addfinalizer=finalizers.append,
+        )
+
+    assert testutils.pytest.lease(None, request("test_task01"), "ttn", ["dev"]) is None
+    assert not finalizers
+    assert testutils.pytest.lease(broker, request("test_task01"), "ttn", ["dev"]) == (
+        "dev"
+    )
+    with pytest.raises(pytest.fail.Exception) as error:
+        testutils.pytest.lease(broker, request("test_task02"), "ttn", ["dev"], 0.1)
+    assert str(error.value) == (
+        "Unable to lease ttn: ttn still leased after 0.1s: dev to test_task01"
+    )
+    # released when the test is done
+    assert len(finalizers) == 1
+    finalizers[0]()
+    assert not broker.leased("ttn")
+
+
+@pytest.mark.parametrize("plugins,expected", [((), False), (("dsession",), True)])
+def test_is_xdist_controller(plugins, expected):
+    config = types.SimpleNamespace(
+        pluginmanager=types.SimpleNamespace(has_plugin=lambda name: name in plugins)
+    )
+    assert testutils.pytest.is_xdist_controller(config) == expected
@@ -0,0 +1,121 @@
+import sqlite3
+
+import pytest
+
+import testutils.results
+
+# pylint: disable=redefined-outer-name
+
+
+@pytest.fixture
+def store(tmp_path):
+    with testutils.results.ResultsStore(tmp_path / "results.db") as store:
+        yield store
+
+
+def _add_results(store):
+    for release, loss in [("2024.10-RC1", [2.0, 4.0]), ("2025.01-RC2", [1.0])]:
+        for value in loss:
+            store.add(
+                release,
+                4,
+                4,
+                "passed",
+                boards=["samr21-xpro", "iotlab-m3"],
+                duration=900.0,
+                metrics={"ping6.packet_loss": value, "pktbuf.drain_time": 0.5},
+            )
+    store.add("2024.10-RC1", 4, 1, "failed", params="foo", reruns=3)
+    store.add("2025.01-RC2", 4, 1, "passed", params="foo", metrics={"ping6.count": 10})
+
+
+def test_repr(tmp_path):
+    with testutils.results.ResultsStore(tmp_path / "results.db") as store:
+        assert repr(store) == f"<ResultsStore: {tmp_path / 'results.db'}>"
+
+
+def test_results(store):
+    _add_results(store)
+    assert store.releases() == ["2024.10-RC1", "2025.01-RC2"]
+    results = store.results(release="2024.10-RC1", spec=4, task=4)
+    assert len(results) == 2
+    assert results[0]["boards"] == "samr21-xpro,iotlab-m3"
+    assert results[0]["params"] == ""
+    assert results[0]["duration"] == 900.0
+    assert results[0]["metrics"] == {
+        "ping6.packet_loss": 2.0,
+        "pktbuf.drain_time": 0.5,
+    }
+    (result,) = store.results(outcome="failed")
+    assert result["params"] == "foo"
+    assert result["reruns"] == 3
+    assert result["metrics"] == {}
+    assert len(store.results()) == 5
+    assert not store.results(spec=5)
+    with pytest.raises(TypeError):
+        store.results(foobar=4)
+
+
+def test_metric(store):
+    _add_results(store)
+    stats = store.metric("ping6.packet_loss", spec=4)
+    assert stats == [
+        {
+            "release": "2024.10-RC1",
+            "spec": 4,
+            "task": 4,
+            "params": "",
+            "boards": "samr21-xpro,iotlab-m3",
+            "count": 2,
+            "mean": 3.0,
+            "min": 2.0,
+            "max": 4.0,
+        },
+        {
+            "release": "2025.01-RC2",
+            "spec": 4,
+            "task": 4,
+            "params": "",
+            "boards": "samr21-xpro,iotlab-m3",
+            "count": 1,
+            "mean": 1.0,
+            "min": 1.0,
+            "max": 1.0,
+        },
+    ]
+    assert not store.metric("foobar")
+
+
+def test_compare(store):
+    _add_results(store)
+    assert store.compare("ping6.packet_loss", "2024.10-RC1", "2025.01-RC2") == [
+        {
+            "spec": 4,
+            "task": 4,
+            "params": "",
+            "boards": "samr21-xpro,iotlab-m3",
+            "base": 3.0,
+            "other": 1.0,
+            "diff": -2.0,
+        }
+    ]
+    # only tested in one release
+    assert not store.compare("ping6.count", "2024.10-RC1", "2025.01-RC2")
+
+
+def test_persistent(tmp_path):
+    with testutils.results.ResultsStore(tmp_path / "results.db") as store:
+        _add_results(store)
+    with testutils.results.ResultsStore(tmp_path / "results.db") as store:
+        assert len(store.results()) == 5
+    # queries are served by the indexes
+    with sqlite3.connect(tmp_path / "results.db") as db:
+        plan = " ".join(
+            row[-1]
+            for row in db.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM results "
+                "WHERE release = ? AND spec = ? AND task = ?",
+                ("2024.10-RC1", 4, 4),
+            )
+        )
+    assert "USING INDEX results_release_task" in plan
@@ -6,6 +6,8 @@
 #
 # Distributed under terms of the MIT license.
 
+import threading
+
 import pexpect
 import pytest
 
@@ -22,6 +24,16 @@ packet buffer: first byte: 0x5660dce0, last byte: 0x5660fce0 (size: 8192)
 ~ unused: 0x5660dce0 (next: (nil), size: 8192) ~
 """
 
+PKTDUMP_LINES = [
+    "PKTDUMP: data received:",
+    "~~ SNIP  0 - size:   8 byte, type: NETTYPE_UNDEF (0)",
+    "00000000  41  41  41  41  41  41  41  41",
+    "~~ SNIP  1 - size:   8 byte, type: NETTYPE_UDP (4)",
+    "~~ SNIP  2 - size:  40 byte, type: NETTYPE_IPV6 (2)",
+    "~~ SNIP  3 - size:  20 byte, type: NETTYPE_NETIF (-1)",
+    "~~ PKT    -  4 snips, total size:  76 byte",
+]
+
 STRING_PKTBUF_NOT_EMPTY = """
 packet buffer: first byte: 0x5660dce0, last byte: 0x5660fce0 (size: 8192)
   position of last byte used: 1792
@@ -52,6 +64,10 @@ class ExpectMockSpawn(riotctrl_shell.tests.common.MockSpawn):
             if res is pexpect.TIMEOUT:
                 raise pexpect.TIMEOUT("")
             self._count += 1
+            if isinstance(res, str):
+                # line matched by a line-oriented expect
+                self.before = res
+                return 1
             return res
         raise RuntimeError("State error")
 
@@ -89,12 +105,13 @@ def test_udp_server_stop():
     "expect_sequence,count,delay,expected",
     [
         ([0, 0, 0, 0, 0], 5, 10, 100.0),
-        ([1, 1, 1, 1, 1], 5, 10, 0.0),
-        ([1, 1, 1, 1, 0], 5, 0, 20.0),
-        ([1] + ([0] * 9), 10, 10, 90.0),
-        ([2] + ([0] * 5), 1, 10, 0.0),
-        ([2] + ([0] * 5) + [2, 0, 0, pexpect.TIMEOUT], 2, 10, 50.0),
-        ([2] + ([0] * 5) + [2, pexpect.TIMEOUT], 2, 10, 50.0),
+        (["Packets received: 1"] * 5, 5, 10, 0.0),
+        (["Packets received: 1"] * 4 + [0], 5, 0, 20.0),
+        (["Packets received: 1"] + ([0] * 9), 10, 10, 90.0),
+        (PKTDUMP_LINES, 1, 10, 0.0),
+        (PKTDUMP_LINES + PKTDUMP_LINES[:3] + [0], 2, 10, 50.0),
+        (PKTDUMP_LINES[:1] + PKTDUMP_LINES, 2, 10, 50.0),
+        (PKTDUMP_LINES[:4] + PKTDUMP_LINES[5:] + [0], 1, 10, 100.0),
     ],
 )
 def test_udp_server_check_output(expect_sequence, count, delay, expected):
@@ -106,6 +123,25 @@ def test_udp_server_check_output(expect_sequence, count, delay, expected):
     ctrl.stop_term()
 
 
+def test_udp_server_receive():
+    ctrl = ExpectMockRIOTCtrl("foobar", env={"BOARD": "native"})
+    shell = testutils.shell.GNRCUDP(ctrl)
+    ctrl.start_term()
+    ctrl.term.expect_sequence = ["foobar"] + PKTDUMP_LINES + [0]
+    res = shell.udp_server_receive(2, 10)
+    assert len(res) == 2
+    assert res[0]["size"] == 76
+    assert res[0]["complete"]
+    assert [snip["type"] for snip in res[0]["snips"]] == [
+        "NETTYPE_UNDEF",
+        "NETTYPE_UDP",
+        "NETTYPE_IPV6",
+        "NETTYPE_NETIF",
+    ]
+    assert res[1] is None
+    ctrl.stop_term()
+
+
 @pytest.mark.parametrize(
     "dest_addr,port,payload,count,delay_ms,expected",
     [
@@ -224,12 +260,35 @@ Iface  6  HWaddr: 6A:2E:4F:3D:DF:CB
             """)
 
 
-def test_check_pktbuf_empty(monkeypatch):
+class PktbufStatsSequence:
+    # pylint: disable=R0903
+    def __init__(self, *outputs):
+        self.outputs = list(outputs)
+
+    def pktbuf_stats(self):
+        if len(self.outputs) > 1:
+            return self.outputs.pop(0)
+        return self.outputs[0]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Mocks time.sleep() and time.monotonic() with a fake clock"""
     requested_secs = []
-    nodes = []
+    now = [1000.0]
 
     def sleep(secs):
         requested_secs.append(secs)
+        now[0] += secs
+
+    monkeypatch.setattr("time.sleep", sleep)
+    monkeypatch.setattr("time.monotonic", lambda: now[0])
+    yield requested_secs
+
+
+# pylint: disable=W0621
+def test_check_pktbuf_empty(clock):
+    nodes = []
 
     ctrl = init_ctrl(output=STRING_PKTBUF_EMPTY)
     nodes.append(riotctrl_shell.gnrc.GNRCPktbufStats(ctrl))
@@ -237,18 +296,92 @@ def test_check_pktbuf_empty(monkeypatch):
     ctrl = init_ctrl(output=STRING_PKTBUF_NOT_EMPTY)
     nodes.append(riotctrl_shell.gnrc.GNRCPktbufStats(ctrl))
 
-    monkeypatch.setattr("time.sleep", sleep)
-    testutils.shell.check_pktbuf(nodes[0], wait=10)
-
-    assert len(requested_secs) == 1
-    assert requested_secs.pop() == 10
+    # empty right away, so no need to wait
+    assert testutils.shell.check_pktbuf(nodes[0], wait=10) == 0
+    assert len(clock) == 0
 
     testutils.shell.check_pktbuf(nodes[0], nodes[0], wait=0)
+    assert len(clock) == 0
 
-    assert len(requested_secs) == 0
+    with pytest.raises(AssertionError):
+        testutils.shell.check_pktbuf(*nodes, wait=0)
+    assert len(clock) == 0
 
     with pytest.raises(AssertionError):
-        testutils.shell.check_pktbuf(*nodes)
+        testutils.shell.check_pktbuf(*nodes, wait=10)
+    # exponential backoff up to the deadline
+    assert clock == [0.5, 1, 2, 4, 2.5]
+
+
+# pylint: disable=W0621
+def test_check_pktbuf_drain(clock):
+    nodes = [
+        PktbufStatsSequence(STRING_PKTBUF_EMPTY),
+        PktbufStatsSequence(
+            STRING_PKTBUF_NOT_EMPTY, STRING_PKTBUF_NOT_EMPTY, STRING_PKTBUF_EMPTY
+        ),
+    ]
+    assert testutils.shell.check_pktbuf(*nodes, wait=10, interval=1) == 3
+    assert clock == [1, 2]
+
+
+def test_fan_out():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def func(node, suffix):
+        # only passes if all nodes are handled concurrently
+        barrier.wait()
+        return node + suffix
+
+    assert testutils.shell.fan_out(["a", "b", "c"], func, suffix="!") == [
+        "a!",
+        "b!",
+        "c!",
+    ]
+    assert testutils.shell.fan_out([], func, "!") == []
+
+
+def test_fan_out_error():
+    handled = []
+
+    def func(node):
+        handled.append(node)
+        if node != "a":
+            raise RuntimeError(node)
+        return node
+
+    with pytest.raises(RuntimeError, match="b"):
+        testutils.shell.fan_out(["a", "b", "c"], func)
+    assert sorted(handled) == ["a", "b", "c"]
+
+
+def test_set_channel():
+    class IfconfigMock:
+        def __init__(self, lladdr):
+            self.lladdr = lladdr
+            self.channel = None
+
+        def ifconfig_list(self):
+            return f"""
+Iface  6  HWaddr: 6A:2E:4F:3D:DF:CB
+          L2-PDU:1500  MTU:1500  HL:64  RTR
+          Source address length: 6
+          Link type: wired
+          inet6 addr: {self.lladdr}  scope: link  VAL
+          inet6 group: ff02::1
+            """
+
+        def ifconfig_set(self, netif, key, value):
+            assert netif == "6"
+            assert key == "channel"
+            self.channel = value
+
+    nodes = [IfconfigMock("fe80::1"), IfconfigMock("fe80::2")]
+    assert testutils.shell.set_channel(nodes, 17) == [
+        ("6", "fe80::1"),
+        ("6", "fe80::2"),
+    ]
+    assert [node.channel for node in nodes] == [17, 17]
 
 
 def test_ifconfig():
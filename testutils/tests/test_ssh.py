@@ -0,0 +1,84 @@
+import os
+import pathlib
+import subprocess
+import types
+
+import pytest
+
+import testutils.ssh
+
+
+# pylint: disable=redefined-outer-name
+@pytest.fixture
+def fake_ssh(tmp_path):
+    """ssh that logs its arguments and exits with $FAKE_SSH_EXIT"""
+    log = tmp_path / "ssh.log"
+    ssh = tmp_path / "fake-ssh"
+    ssh.write_text(
+        "#!/bin/sh\n"
+        f"echo \"$@\" >> {log}\n"
+        "sleep \"${FAKE_SSH_SLEEP:-0}\"\n"
+        "exit \"${FAKE_SSH_EXIT:-0}\"\n"
+    )
+    ssh.chmod(0o755)
+
+    def calls():
+        if not log.exists():
+            return []
+        return log.read_text().splitlines()
+
+    yield types.SimpleNamespace(path=str(ssh), calls=calls)
+
+
+@pytest.mark.parametrize("exit_code,expected", [(0, True), (255, False)])
+def test_reachable(monkeypatch, fake_ssh, exit_code, expected):
+    monkeypatch.setenv("FAKE_SSH_EXIT", str(exit_code))
+    assert testutils.ssh.reachable("user@saclay", [fake_ssh.path]) == expected
+    assert fake_ssh.calls() == ["-o BatchMode=yes -o ConnectTimeout=5 user@saclay true"]
+
+
+def test_reachable_timeout(monkeypatch, fake_ssh):
+    monkeypatch.setenv("FAKE_SSH_SLEEP", "2")
+    assert not testutils.ssh.reachable("user@saclay", [fake_ssh.path], timeout=0.1)
+
+
+def test_reachable_no_ssh(tmp_path):
+    assert not testutils.ssh.reachable("user@saclay", [str(tmp_path / "no-ssh")])
+
+
+def test_multiplexer(fake_ssh):
+    multiplexer = testutils.ssh.SSHMultiplexer(ssh=fake_ssh.path, persist=42)
+    control_dir = multiplexer.control_dir
+    assert repr(multiplexer) == f"<SSHMultiplexer: {control_dir}>"
+    control_path = os.path.join(control_dir, "%r@%h:%p")
+    options = (
+        f"-o ControlMaster=auto -o ControlPath={control_path} -o ControlPersist=42"
+    )
+    assert multiplexer.reachable("user@saclay")
+    # make and the tools it runs find the wrapper in PATH
+    env = multiplexer.configure({"PATH": os.environ["PATH"]})
+    assert env["PATH"].startswith(multiplexer.bindir + os.pathsep)
+    assert multiplexer.configure(dict(env)) == env
+    subprocess.run(["ssh", "-t", "user@saclay", "socat -"], env=env, check=True)
+    assert fake_ssh.calls() == [
+        f"{options} -o BatchMode=yes -o ConnectTimeout=5 user@saclay true",
+        f"{options} -t user@saclay socat -",
+    ]
+    # a master connection to a front-end is open
+    pathlib.Path(control_dir, "user@saclay:22").touch()
+    assert multiplexer.sockets() == [os.path.join(control_dir, "user@saclay:22")]
+    multiplexer.close()
+    assert fake_ssh.calls()[-1] == (
+        f"-S {os.path.join(control_dir, 'user@saclay:22')} -O exit front-end"
+    )
+    assert not os.path.exists(control_dir)
+    assert not multiplexer.sockets()
+
+
+def test_multiplexer_control_dir(tmp_path, fake_ssh):
+    multiplexer = testutils.ssh.SSHMultiplexer(tmp_path / "ssh", ssh=fake_ssh.path)
+    (tmp_path / "ssh").mkdir()
+    multiplexer.close()
+    # not created by the multiplexer, so it is kept
+    assert (tmp_path / "ssh").is_dir()
+    assert not fake_ssh.calls()
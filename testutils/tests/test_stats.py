@@ -0,0 +1,56 @@
+import pytest
+
+import testutils.stats
+
+
+def replies(*seq_rtts):
+    return {
+        "replies": [
+            {"seq": seq, "ttl": 64, "rtt": rtt, "dup": False} for seq, rtt in seq_rtts
+        ]
+    }
+
+
+def test_ping6_stats():
+    count = 1000
+    stats = testutils.stats.ping6_stats(
+        replies(*((i, float(i % 100)) for i in range(count))), count
+    )
+    assert stats["received"] == count
+    assert stats["packet_loss"] == 0.0
+    assert stats["rtt"]["min"] == 0.0
+    assert stats["rtt"]["p50"] == pytest.approx(49.5)
+    assert stats["rtt"]["p90"] == pytest.approx(89.1)
+    assert stats["rtt"]["p99"] == pytest.approx(98.01)
+    assert stats["rtt"]["max"] == 99.0
+    assert stats["loss_bursts"] == {"count": 0, "max": 0}
+    assert stats["reordered"] == 0
+
+
+@pytest.mark.parametrize("ping6_res", [{}, replies()])
+def test_ping6_stats_no_replies(ping6_res):
+    stats = testutils.stats.ping6_stats(ping6_res, 10)
+    assert stats["received"] == 0
+    assert stats["packet_loss"] == 100.0
+    assert not stats["rtt"]
+    assert stats["jitter"] is None
+    assert stats["loss_bursts"] == {"count": 1, "max": 10}
+    assert stats["reordered"] == 0
+
+
+def test_ping6_stats_no_rtt():
+    stats = testutils.stats.ping6_stats(replies((0, None), (1, 3.0)), 3)
+    assert stats["received"] == 2
+    assert stats["rtt"]["min"] == stats["rtt"]["max"] == 3.0
+    # a single round-trip time has no jitter
+    assert stats["jitter"] is None
+    assert stats["loss_bursts"] == {"count": 1, "max": 1}
+
+
+def test_ping6_stats_reordered():
+    stats = testutils.stats.ping6_stats(
+        replies((3, 1.0), (0, 1.0), (1, 1.0), (5, 1.0), (4, 1.0), (9, 1.0)), 10
+    )
+    assert stats["reordered"] == 3
+    assert stats["jitter"] == 0.0
+    assert stats["loss_bursts"] == {"count": 2, "max": 3}